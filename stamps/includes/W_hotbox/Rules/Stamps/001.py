@@ -7,7 +7,8 @@
 #
 #----------------------------------------------------------------------------------------------------------
 
-ns = [n for n in nuke.selectedNodes() if n.knob("identifier")]
+import stamps
+ns = stamps.StampQuery().wireds().selected().nodes()
 for n in ns:
     try:
         n["reconnect_by_title_this"].execute()
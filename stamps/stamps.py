@@ -49,6 +49,8 @@ InputIgnoreClasses = ["NoOp", "Dot", "Reformat", "DeepReformat", "Crop"]
 TitleIgnoreClasses = ["NoOp", "Dot", "Reformat", "DeepReformat", "Crop"]
 TagsIgnoreClasses = ["NoOp", "Dot", "Reformat", "DeepReformat", "Crop"]
 
+NodeClassSizes = {"Dot": (12, 12), "default": (80, 18)}  # Sizes of classes not seen yet, see nodeClassSize.
+
 AnchorClassColors = {"Camera": int('%02x%02x%02x%02x' % (255, 255, 255, 1), 16)}
 WiredClassColors = {"Camera": int('%02x%02x%02x%02x' % (51, 0, 0, 1), 16)}
 
@@ -56,6 +58,18 @@ STAMPS_HELP = "Stamps by Adrian Pueyo and Alexey Kuchinski.\nUpdated " + date
 VERSION_TOOLTIP = "Stamps by Adrian Pueyo and Alexey Kuchinski.\nUpdated " + date + "."
 STAMPS_SHORTCUT = "F8"
 KEEP_ORIGINAL_TAGS = True
+STAMPS_USAGE_FILE = "~/.nuke/stamps_usage.json"  # Per-user Anchor usage statistics. None: don't persist them.
+STAMPS_USAGE_HALF_LIFE = 14  # Days after which a past use of an Anchor counts half for the "popular" ranking.
+STAMPS_USAGE_MAX_ANCHORS = 500  # Anchors remembered per script.
+STAMPS_USAGE_MAX_SCRIPTS = 200  # Scripts remembered in the usage file.
+STAMPS_ROW_LENGTH = 10  # Stamps per row when many are created at once.
+STAMPS_JOB_BUDGET = 0.05  # Seconds of work per UI tick for long operations, see StampJob.
+STAMPS_CONFIRM_COST = 100  # Bulk operations estimated to cost more than this many node creations ask first.
+STAMPS_CLASSIFICATION_CACHE = True  # Memoize node types per class and stamp roles per node. False: recompute them (debugging).
+STAMPS_TELEMETRY = False  # Record how long Stamps' callbacks take, see telemetryCall.
+STAMPS_CALLBACK_BUDGET = 0.05  # Seconds a recorded callback may take before a warning is logged. None: don't warn.
+STAMPS_PASTE_SUMMARY = False  # Summarize stamps that pasting reconnects to another Anchor or can't reconnect.
+STAMPS_NODE_TEMPLATES = True  # Create stamps by pasting a precompiled node script. False: build their knobs one by one.
 
 # Global variables to track state.
 if 'Stamps_LastCreated' not in globals():
@@ -64,7 +78,28 @@ if 'Stamps_LastCreated' not in globals():
 if 'Stamps_MenusLoaded' not in globals():
     Stamps_MenusLoaded = False
 
+if 'Stamps_CallbacksLoaded' not in globals():
+    Stamps_CallbacksLoaded = False
+
 Stamps_LockCallbacks = False
+Stamps_Batch = None  # The active StampBatch, see batch()
+Stamps_Jobs = []  # StampJobs, the first one running and the rest queued
+Stamps_BrokenColor = 4278190335  # note_font_color of broken wired stamps, see wiredStyle
+Stamps_Registries = {}  # {node graph context: StampRegistry}
+Stamps_Usage = None  # {script: {anchor key: [frecency score, last use time]}}, loaded on demand
+Stamps_UsageDirty = False
+Stamps_NodeTypeCache = {}  # {node class: nodeType}
+Stamps_RoleCache = {}  # {node: "anchor", "wired" or None}
+Stamps_InputMemo = None  # {(node, mode, stopOnLabel): realInput result} during a multi-node operation
+Stamps_NodeSizes = {}  # {node class: (width, height)} of new nodes, see nodeClassSize
+Stamps_TagsGeneration = 0  # Bumped when Anchor tags or backdrops change, see tagsChanged
+Stamps_TagsCache = {}  # {anchor: ((generation, xpos, ypos), (tags, backdrops))}, see anchorTagsDisplay
+Stamps_Telemetry = {}  # {(callback, knob name): CallbackStats}, see telemetryCall
+Stamps_CallbackDepth = {}  # {callback: calls running}
+Stamps_Pasted = {}  # {wired stamp: None} pasted in the current event loop turn, see queuePastedStamp
+Stamps_ScriptPaste = False  # True while Stamps itself pastes nodes, see nodesFromScript
+Stamps_Loading = None  # Stamps created while a script loads, see stampLoadBegin. None: not loading.
+Stamps_Templates = {}  # {(role, node type): template or None if it can't be pasted}, see stampTemplate
 
 import nuke
 import nukescripts
@@ -72,6 +107,13 @@ import re
 from functools import partial
 import sys
 import os
+import uuid
+import json
+import math
+import bisect
+import collections
+import tempfile
+import time
 
 # Python 3 compatibility: define 'unicode' if running in Python 3.
 if sys.version_info[0] >= 3:
@@ -112,9 +154,9 @@ def wiredShowAnchor():
     If the anchor node does not exist, show the first input node (if available).
     """
     n = nuke.thisNode()
-    a_name = n.knob("anchor").value()
-    if nuke.exists(a_name):
-        nuke.show(nuke.toNode(a_name))
+    a = wiredAnchor(n)
+    if a is not None:
+        nuke.show(a)
     elif n.inputs():
         nuke.show(n.input(0))
 
@@ -125,9 +167,8 @@ def wiredZoomAnchor():
     If the anchor does not exist, zoom to the first input node (if available).
     """
     n = nuke.thisNode()
-    a_name = n.knob("anchor").value()
-    if nuke.exists(a_name):
-        a = nuke.toNode(a_name)
+    a = wiredAnchor(n)
+    if a is not None:
         # Optionally show the node (line commented out in original code)
         # nuke.show(a)
         center = [a.xpos() + a.screenWidth() / 2, a.ypos() + a.screenHeight() / 2]
@@ -163,7 +204,7 @@ def wiredStyle(n, style=0):
         n["note_font"].setValue(nf)
     elif style == 1:  # BROKEN
         n["note_font_size"].setValue(size * 2)
-        n["note_font_color"].setValue(4278190335)
+        n["note_font_color"].setValue(Stamps_BrokenColor)
         n["note_font"].setValue(nf + " Bold")
 
 
@@ -176,186 +217,355 @@ def wiredGetStyle(n):
     """
     if not isWired(n):
         return False
-    if not n.inputs():
-        wiredStyle(n, 1)
-    elif not isAnchor(n.input(0)):
-        wiredStyle(n, 1)
-    elif n["anchor"].value() != n.input(0).name():
+    if Stamps_Batch is not None:
+        Stamps_Batch.wireds[n] = None  # Restyled once, when the batch ends.
+        return
+    if wiredIsBroken(n):
         wiredStyle(n, 1)
     else:
+        if n["anchor"].value() != n.input(0).name():
+            n["anchor"].setValue(n.input(0).name())  # The Anchor was renamed; refresh the displayed name.
         wiredStyle(n, 0)
 
 
-def wiredTagsAndBackdrops(n, updateSimilar=False):
+def wiredIsBroken(n):
+    """
+    Check whether a wired stamp is disconnected, or connected to something else than the Anchor it's linked to.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+
+    Returns:
+        bool: True if the stamp is broken.
+    """
+    a = n.input(0)
+    return not isAnchor(a) or not wiredLinkedTo(n, a)
+
+
+def wiredTagsAndBackdrops(n):
     """
-    Update the tags and backdrop information of wired stamps based on the anchor node.
+    Show the tags and backdrop labels of a wired stamp's Anchor on its panel. Called when the panel is shown,
+    as they aren't stored on the wired stamps (their knobs are DO_NOT_WRITE).
 
     Args:
         n: The current node.
-        updateSimilar: If True, update all wired nodes sharing the same anchor.
     """
     try:
         a = n.input(0)
-        if not a:
-            return
-        a_tags = a["tags"].value().strip().strip(",")
-        a_bd = backdropTags(a)
-        an = n.knob("anchor").value()
-        ns = [i for i in allWireds() if i.knob("anchor").value() == an] if updateSimilar else [n]
-
-        for node in ns:
-            try:
-                tags_knob = node.knob("tags")
-                bd_knob = node.knob("backdrops")
-                # Initially hide the knobs.
-                for knob in (tags_knob, bd_knob):
-                    knob.setVisible(False)
-                if a_tags:
-                    tags_knob.setValue("<i>{}</i>".format(a_tags))
-                    tags_knob.setVisible(True)
-                if a_bd and len(a_bd):
-                    bd_knob.setValue("<i>{}</i>".format(",".join(a_bd)))
-                    bd_knob.setVisible(True)
-            except Exception:
-                pass
+        a_tags, a_bd = anchorTagsDisplay(a) if isAnchor(a) else ("", "")
+        wiredSetDisplay(n, [("tags", a_tags), ("backdrops", a_bd)])
     except Exception:
-        try:
-            for knob in (tags_knob, bd_knob):
-                knob.setVisible(False)
-        except Exception:
-            pass
+        pass
+
+
+def wiredSetDisplay(n, values):
+    """
+    Set the display-only knobs of a wired stamp, without adding undo steps or marking the script as modified.
+
+    Args:
+        n: The wired stamp.
+        values (list): (knob name, value) pairs. Knobs with an empty value get hidden.
+    """
+    modified = nuke.root().modified()
+    nuke.Undo.disable()
+    try:
+        for kn, value in values:
+            knob = n.knob(kn)
+            if knob is None:
+                continue
+            knob.setFlag(nuke.DO_NOT_WRITE)
+            if knob.value() != (value or " "):
+                knob.setValue(value or " ")
+            knob.setVisible(bool(value))
+    finally:
+        nuke.Undo.enable()
+        nuke.root().setModified(modified)
+
+
+def anchorTagsDisplay(a):
+    """
+    Return an Anchor's tags and the labels of the backdrops that contain it, as shown on its wired stamps.
+
+    They're cached per Anchor until any tags or backdrops change (see tagsChanged) or the Anchor moves.
+
+    Args:
+        a (nuke.Node): The Anchor.
+
+    Returns:
+        tuple: (tags, backdrops) as HTML, or "" for none.
+    """
+    key = (Stamps_TagsGeneration, a.xpos(), a.ypos())
+    cached = Stamps_TagsCache.get(a)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    a_tags = a["tags"].value().strip().strip(",")
+    a_bd = backdropTags(a)
+    display = ("<i>{}</i>".format(a_tags) if a_tags else "", "<i>{}</i>".format(",".join(a_bd)) if a_bd else "")
+    Stamps_TagsCache[a] = (key, display)
+    return display
+
+
+def tagsChanged():
+    """
+    Note that Anchor tags or backdrops changed, so the ones shown on wired stamps get recomputed when next shown.
+    """
+    global Stamps_TagsGeneration
+    Stamps_TagsGeneration += 1
+    Stamps_TagsCache.clear()
 
 
 def wiredKnobChanged():
     """
     Callback for when a knob value changes on a wired stamp node.
 
-    Handles reconnection, style updates, and title changes.
+    Handles reconnection, style updates, and title changes, through WIRED_KNOB_HANDLERS.
+    Changes to the knobs it maps to None (position...) return right away, and changes to knobs
+    it doesn't list check the stamp's input, see _wiredOtherKnobChanged.
     """
-    global Stamps_LockCallbacks
     k = nuke.thisKnob()
-    kn = k.name()
-    # Ignore position changes and specific selection reconnection knobs.
-    if kn in ["xpos", "ypos", "reconnect_by_selection_this", "reconnect_by_selection_similar"]:
-        return
-    n = nuke.thisNode()
+    handler = WIRED_KNOB_HANDLERS.get(k.name(), _wiredOtherKnobChanged)
+    if STAMPS_TELEMETRY:
+        telemetryCall("wiredKnobChanged", k.name(), handler, nuke.thisNode(), k)
+    elif handler is not None:
+        handler(nuke.thisNode(), k)
+
+
+def _wiredLocked(n):
+    """
+    Return True while callbacks are locked, remembering the stamp for the running batch to restyle.
+    """
     if Stamps_LockCallbacks:
-        return
-    ni = n.inputs()
-
-    if n.knob("toReconnect") and n.knob("toReconnect").value() and nuke.GUI:
-        if not ni:
-            if n.knob("auto_reconnect_by_title") and n.knob("auto_reconnect_by_title").value() and n.knob("title"):
-                n.knob("auto_reconnect_by_title").setValue(0)
-                for a in allAnchors():
-                    if a.knob("title") and a["title"].value() == n["title"].value():
-                        n.knob("auto_reconnect_by_title").setValue(False)
-                        nuke.thisNode().setInput(0, a)
-                        n["anchor"].setValue(a.name())
-                        wiredStyle(n)
-                        return
-            try:
-                inp = n.knob("anchor").value()
-                a = nuke.toNode(inp)
+        if Stamps_Batch is not None:
+            Stamps_Batch.wireds[n] = None
+        return True
+    return False
+
+
+def _wiredPendingReconnect(n):
+    """
+    Reconnect a stamp flagged with toReconnect, i.e. copied, on its first knob change.
+
+    Returns:
+        bool: True if a reconnection was pending, so the knob change needs no further handling.
+    """
+    k = n.knob("toReconnect")
+    if k is None or not k.value() or not nuke.GUI:
+        return False
+    if n in Stamps_Pasted:
+        return True  # Reconnected along with the rest of the paste, see stampPasteEnd.
+    if not n.inputs():
+        if n.knob("auto_reconnect_by_title") and n.knob("auto_reconnect_by_title").value() and n.knob("title"):
+            n.knob("auto_reconnect_by_title").setValue(0)
+            for a in stampRegistry(n).anchorsByTitle(n["title"].value())[:1]:
+                n.knob("auto_reconnect_by_title").setValue(False)
+                n.setInput(0, a)
+                wiredSetAnchor(n, a)
+                wiredStyle(n)
+                return True
+        try:
+            a = wiredAnchor(n)
+            if a.knob("title") and n.knob("title") and a["title"].value() == n["title"].value():
+                n.setInput(0, a)
+                wiredStyle(n)
+            else:
+                wiredStyle(n, 1)
+        except Exception:
+            wiredGetStyle(n)
+    else:
+        try:
+            a = n.input(0)
+            if isAnchor(a):
                 if a.knob("title") and n.knob("title") and a["title"].value() == n["title"].value():
-                    nuke.thisNode().setInput(0, a)
-                    wiredStyle(n)
+                    wiredSetAnchor(n, a)
+            else:
+                a = wiredAnchor(n)
+                if a.knob("title") and n.knob("title") and a["title"].value() == n["title"].value():
+                    n.setInput(0, a)
                 else:
                     wiredStyle(n, 1)
-            except Exception:
-                wiredGetStyle(n)
-        else:
-            try:
-                a = n.input(0)
-                if isAnchor(a):
-                    if a.knob("title") and n.knob("title") and a["title"].value() == n["title"].value():
-                        n.knob("anchor").setValue(a.name())
-                else:
-                    inp = n.knob("anchor").value()
-                    a = nuke.toNode(inp)
-                    if a.knob("title") and n.knob("title") and a["title"].value() == n["title"].value():
-                        nuke.thisNode().setInput(0, a)
-                    else:
-                        wiredStyle(n, 1)
-                        n.setInput(0, None)
-            except Exception:
-                pass
-        n.knob("toReconnect").setValue(False)
-    elif not ni:
-        if nodeType(n) == "Particle" and not nuke.env["nukex"]:
-            return
+                    n.setInput(0, None)
+        except Exception:
+            pass
+    k.setValue(False)
+    return True
+
+
+def _wiredReady(n):
+    """
+    Return True if a knob change should be handled: callbacks aren't locked, no reconnection was pending,
+    and the stamp is connected. Disconnected stamps get styled as broken instead.
+    """
+    if _wiredLocked(n) or _wiredPendingReconnect(n):
+        return False
+    if not n.inputs():
+        _wiredStyleDisconnected(n)
+        return False
+    return True
+
+
+def _wiredStyleDisconnected(n):
+    """Style a stamp without inputs as broken, unless it's a Particle stamp outside NukeX."""
+    if nodeType(n) == "Particle" and not nuke.env["nukex"]:
+        return
+    if n["note_font_color"].value() != Stamps_BrokenColor:
         wiredStyle(n, 1)
+
+
+def _wiredIdentifierChanged(n, k):
+    forgetStampRole(n)
+    stampRegistry(n).invalidate()
+
+
+def _wiredAnchorChanged(n, k):
+    # The stored name was edited by hand: it takes over the stored id.
+    a = nuke.toNode(k.value())
+    if isAnchor(a):
+        if wiredLinkKey(n) != anchorId(a):
+            wiredSetAnchor(n, a)
+    elif n.knob("anchor_id"):
+        n["anchor_id"].setValue("")
+    registerStamp(n)
+    _wiredOtherKnobChanged(n, k)
+
+
+def _wiredNameChanged(n, k):
+    registry = stampRegistry(n)
+    if not registry.stale:
+        registry.renameWired(n)
+    _wiredOtherKnobChanged(n, k)
+
+
+def _wiredSelected(n, k):
+    _wiredReady(n)
+
+
+def _wiredInputChanged(n, k):
+    if _wiredReady(n):
+        wiredGetStyle(n)
+
+
+def _wiredPostageStampChanged(n, k):
+    if not _wiredReady(n):
         return
-    elif kn == "selected":
-        # First activation for the 'selected' knob; ignore subsequent changes.
+    n["postageStamp_show"].setVisible(True)
+    n["postageStamp_show"].setValue(k.value())
+
+
+def _wiredPostageStampShowChanged(n, k):
+    if not _wiredReady(n):
         return
-    elif kn == "inputChange":
-        wiredGetStyle(n)
-    elif kn == "postage_stamp":
-        n["postageStamp_show"].setVisible(True)
-        n["postageStamp_show"].setValue(k.value())
-    elif kn == "postageStamp_show":
-        try:
-            n["postage_stamp"].setValue(k.value())
-        except Exception:
-            n["postageStamp_show"].setVisible(False)
-    elif kn == "title":
-        kv = k.value()
-        if titleIsLegal(kv):
-            if nuke.ask("Do you want to update the linked stamps' title?"):
-                a = retitleAnchor(n)  # Retitle anchor.
-                retitleWired(a)  # Retitle wired stamps linked to the anchor.
-                return
-        else:
-            nuke.message("Please set a valid title.")
-        try:
-            n["title"].setValue(n["prev_title"].value())
-        except Exception:
-            pass
+    try:
+        n["postage_stamp"].setValue(k.value())
+    except Exception:
+        n["postageStamp_show"].setVisible(False)
+
+
+def _wiredTitleChanged(n, k):
+    if not _wiredReady(n):
+        return
+    kv = k.value()
+    if titleIsLegal(kv):
+        if nuke.ask("Do you want to update the linked stamps' title?"):
+            a = retitleAnchor(n)  # Retitle anchor.
+            retitleWired(a)  # Retitle wired stamps linked to the anchor.
+            return
     else:
-        try:
-            n.knob("toReconnect").setValue(False)
-            if ni:
-                if isAnchor(n.input(0)):
-                    if n.knob("title").value() == n.input(0).knob("title").value():
-                        n.knob("anchor").setValue(n.input(0).name())
-                    elif nuke.ask("Do you want to change the anchor for the current stamp?"):
-                        n.knob("anchor").setValue(n.input(0).name())
-                        new_title = n.input(0).knob("title").value()
-                        n.knob("title").setValue(new_title)
-                        n.knob("prev_title").setValue(new_title)
-                    else:
-                        n.setInput(0, None)
-                        try:
-                            n.setInput(0, nuke.toNode(n.knob("anchor").value()))
-                        except Exception:
-                            pass
-            wiredGetStyle(n)
-        except Exception:
-            pass
+        nuke.message("Please set a valid title.")
+    try:
+        n["title"].setValue(n["prev_title"].value())
+    except Exception:
+        pass
+
+
+def _wiredCheckInput(n):
+    """
+    Check whether the stamp was plugged into another Anchor by hand, and ask whether to follow it.
+    """
+    try:
+        ni = n.input(0)
+        if isAnchor(ni):
+            if n.knob("title").value() == ni.knob("title").value():
+                wiredSetAnchor(n, ni)
+            elif nuke.ask("Do you want to change the anchor for the current stamp?"):
+                wiredSetAnchor(n, ni)
+                new_title = ni.knob("title").value()
+                n.knob("title").setValue(new_title)
+                n.knob("prev_title").setValue(new_title)
+            else:
+                n.setInput(0, None)
+                try:
+                    n.setInput(0, wiredAnchor(n))
+                except Exception:
+                    pass
+        wiredGetStyle(n)
+    except Exception:
+        pass
 
-    if kn == "showPanel":
-        wiredTagsAndBackdrops(n)
+
+def _wiredOtherKnobChanged(n, k):
+    """Handle a change to any knob without its own handler: check whether the stamp was plugged into another Anchor."""
+    if _wiredReady(n):
+        _wiredCheckInput(n)
+
+
+def _wiredPanelShown(n, k):
+    stampLoadCheck()
+    _wiredOtherKnobChanged(n, k)
+    wiredTagsAndBackdrops(n)
+
+
+# The knobs wiredKnobChanged handles on their own: {knob name: handler(node, knob), or None to ignore it}
+WIRED_KNOB_HANDLERS = {
+    "xpos": None,
+    "ypos": None,
+    "reconnect_by_selection_this": None,
+    "reconnect_by_selection_similar": None,
+    "identifier": _wiredIdentifierChanged,
+    "anchor": _wiredAnchorChanged,
+    "name": _wiredNameChanged,
+    "selected": _wiredSelected,
+    "inputChange": _wiredInputChanged,
+    "postage_stamp": _wiredPostageStampChanged,
+    "postageStamp_show": _wiredPostageStampShowChanged,
+    "title": _wiredTitleChanged,
+    "showPanel": _wiredPanelShown,
+    "hidePanel": _wiredOtherKnobChanged,
+}
 
 
 def wiredOnCreate():
     """
     Initialization function for a wired stamp node upon creation.
 
-    Sets the 'toReconnect' knob and adjusts flags on non-essential knobs.
+    Registers it and adjusts flags on non-essential knobs. If the user pasted it, sets its 'toReconnect'
+    knob and queues it to be reconnected with the rest of the paste.
     """
-    n = nuke.thisNode()
+    if STAMPS_TELEMETRY:
+        telemetryCall("wiredOnCreate", "", _wiredOnCreate, nuke.thisNode())
+    else:
+        _wiredOnCreate(nuke.thisNode())
+
+
+def _wiredOnCreate(n):
+    if Stamps_Loading is not None:
+        Stamps_Loading.append(n)  # Initialized with the rest once the script is loaded, see stampLoadEnd.
+        return
+    registerStamp(n)
+    hideBuiltinKnobs(n, WIRED_KNOBS)
+    if Stamps_ScriptPaste:
+        return  # Created by Stamps, which connects it: not pasted by the user.
     n.knob("toReconnect").setValue(1)
-    protected_knobs = [
-        'wired_tab', 'identifier', 'lockCallbacks', 'toReconnect', 'title', 'prev_title',
-        'tags', 'backdrops', 'anchor', 'line1', 'anchor_label', 'show_anchor', 'zoom_anchor',
-        'stamps_label', 'zoomNext', 'selectSimilar', 'space_1', 'reconnect_label', 'reconnect_this',
-        'reconnect_similar', 'reconnect_all', 'space_2', 'advanced_reconnection',
-        'reconnect_by_title_label', 'reconnect_by_title_this', 'reconnect_by_title_similar',
-        'reconnect_by_title_selected', 'reconnect_by_selection_label', 'reconnect_by_selection_this',
-        'reconnect_by_selection_similar', 'reconnect_by_selection_selected', 'auto_reconnect_by_title',
-        'advanced_reconnection', 'line2', 'buttonHelp', 'version', 'postageStamp_show'
-    ]
+    queuePastedStamp(n)
+
+
+def hideBuiltinKnobs(n, protected_knobs):
+    """
+    Hide every knob of a stamp but its own ones, as the hidden state isn't saved with the script.
+
+    Args:
+        n (nuke.Node): The stamp node.
+        protected_knobs (set): Names of the knobs to leave alone.
+    """
     for k in n.allKnobs():
         if k.name() not in protected_knobs:
             k.setFlag(0x0000000000000400)
@@ -365,38 +575,121 @@ def anchorKnobChanged():
     """
     Callback for when a knob value changes on an anchor node.
 
-    Handles title updates, name changes, and propagates tag changes to linked wired stamps.
+    Handles title updates, name changes, and propagates tag changes to linked wired stamps, through
+    ANCHOR_KNOB_HANDLERS. Changes to any other knob return right away.
     """
     k = nuke.thisKnob()
-    kn = k.name()
-    if kn in ["xpos", "ypos"]:
-        return
-    n = nuke.thisNode()
-    if kn == "title":
-        kv = k.value()
-        if titleIsLegal(kv):
-            if nuke.ask("Do you want to update the linked stamps' title?"):
-                retitleWired(n)  # Retitle wired stamps linked to the anchor.
-                return
-        else:
-            nuke.message("Please set a valid title.")
-        try:
-            n["title"].setValue(n["prev_title"].value())
-        except Exception:
-            pass
-    elif kn == "name":
-        try:
-            nn = anchor["prev_name"].value()
-        except Exception:
-            nn = anchor.name()
-        for child in anchorWireds(n):
-            child.knob("anchor").setValue(nn)
-        n["prev_name"].setValue(n.name())
-    elif kn == "tags":
-        for ni in allWireds():
-            if ni.knob("anchor").value() == n.name():
-                wiredTagsAndBackdrops(ni, updateSimilar=True)
-                return
+    handler = ANCHOR_KNOB_HANDLERS.get(k.name())
+    if STAMPS_TELEMETRY:
+        telemetryCall("anchorKnobChanged", k.name(), handler, nuke.thisNode(), k)
+    elif handler is not None:
+        handler(nuke.thisNode(), k)
+
+
+def _anchorPanelShown(n, k):
+    stampLoadCheck()
+
+
+def _anchorIdentifierChanged(n, k):
+    forgetStampRole(n)
+    stampRegistry(n).invalidate()
+
+
+def _anchorTitleChanged(n, k):
+    kv = k.value()
+    if titleIsLegal(kv):
+        if nuke.ask("Do you want to update the linked stamps' title?"):
+            registerStamp(n)
+            retitleWired(n)  # Retitle wired stamps linked to the anchor.
+            return
+    else:
+        nuke.message("Please set a valid title.")
+    try:
+        n["title"].setValue(n["prev_title"].value())
+    except Exception:
+        pass
+    registerStamp(n)
+
+
+def _anchorNameChanged(n, k):
+    try:
+        nn = n["prev_name"].value()
+    except Exception:
+        nn = n.name()
+    stampRegistry(n).renameAnchor(nn, n)
+    # Stamps that reference the Anchor's id follow the rename by themselves, but keep its name
+    # up to date too, for the reconnect button's fallback and older versions of Stamps.
+    for child in anchorWireds(n):
+        if child["anchor"].value() != n.name():
+            wiredSetAnchor(child, n)
+    n["prev_name"].setValue(n.name())
+
+
+def _anchorTagsChanged(n, k):
+    registerStamp(n)
+    tagsChanged()
+
+
+# The knobs anchorKnobChanged reacts to: {knob name: handler(node, knob)}
+ANCHOR_KNOB_HANDLERS = {
+    "showPanel": _anchorPanelShown,
+    "identifier": _anchorIdentifierChanged,
+    "title": _anchorTitleChanged,
+    "name": _anchorNameChanged,
+    "tags": _anchorTagsChanged,
+}
+
+
+def benchmarkKnobChanged(count=1000):
+    """
+    Time the knobChanged work of a drag-select and a move of many wired stamps, and count how many
+    of those knob changes reach a handler instead of returning right away.
+
+    The stamps are created for the benchmark, linked to a new Anchor, and deleted afterwards,
+    leaving the usage statistics as they were.
+
+    Args:
+        count (int): Wired stamps to create.
+
+    Returns:
+        dict: {"stamps", "events", "handled", "seconds"}
+    """
+    global Stamps_LastCreated
+    last_created = Stamps_LastCreated
+    script = _usageScript()
+    usage = dict(usageLoad().get(script, {}))
+    selection = nuke.selectedNodes()
+    for i in selection:
+        i.setSelected(False)
+    with batch("Benchmark"):
+        a = anchor(title="benchmark_knobChanged")
+        a.setSelected(False)
+        ns = [wired(a, place=False) for i in range(count)]
+    events = 0
+    handled = 0
+    try:
+        start = time.time()
+        for n in ns:
+            for kn in ["selected", "xpos", "ypos"]:
+                k = n.knob(kn)
+                handler = WIRED_KNOB_HANDLERS.get(kn, _wiredOtherKnobChanged)
+                events += 1
+                if handler is not None:
+                    handled += 1
+                    handler(n, k)
+        results = {"stamps": len(ns), "events": events, "handled": handled, "seconds": time.time() - start}
+    finally:
+        with batch("Benchmark"):
+            for n in ns + [a]:
+                nuke.delete(n)
+        Stamps_LastCreated = last_created
+        if script:
+            usageLoad()[script] = usage
+        for i in selection:
+            i.setSelected(True)
+    nuke.tprint("Stamps knobChanged benchmark, {stamps} stamps selected and moved: {events} knob changes, "
+                "{handled} handled, {seconds:.4f} s".format(**results))
+    return results
 
 
 def anchorOnCreate():
@@ -408,23 +701,22 @@ def anchorOnCreate():
     Returns:
         None
     """
-    n = nuke.thisNode()
-    protected_knobs = [
-        'anchor_tab', 'identifier', 'title', 'prev_title', 'prev_name', 'showing',
-        'tags', 'stamps_label', 'selectStamps', 'reconnectStamps', 'zoomNext',
-        'createStamp', 'buttonHelp', 'line1', 'line2', 'version'
-    ]
-    for k in n.allKnobs():
-        if k.name() not in protected_knobs:
-            k.setFlag(0x0000000000000400)
-    try:
-        nn = n["prev_name"].value()
-    except Exception:
-        nn = n.name()
-    for child in anchorWireds(n):
-        child.knob("anchor").setValue(nn)
+    if STAMPS_TELEMETRY:
+        telemetryCall("anchorOnCreate", "", _anchorOnCreate, nuke.thisNode())
+    else:
+        _anchorOnCreate(nuke.thisNode())
+
+
+def _anchorOnCreate(n):
+    if Stamps_Loading is not None:
+        Stamps_Loading.append(n)  # Initialized with the rest once the script is loaded, see stampLoadEnd.
+        return
+    hideBuiltinKnobs(n, ANCHOR_KNOBS)
+    # A pasted copy of an Anchor that still exists gets a new id, so the original keeps its Stamps.
+    checkAnchorId(n)
+    registerStamp(n)
     n["prev_name"].setValue(n.name())
-    return
+
 
 def retitleAnchor(ref=""):
     """
@@ -441,10 +733,10 @@ def retitleAnchor(ref=""):
     try:
         ref_title = ref["title"].value().strip()
         if ref_title:
-            ref_anchor = ref["anchor"].value()
-            na = nuke.toNode(ref_anchor)
+            na = wiredAnchor(ref)
             for kn in ["title", "prev_title"]:
                 na[kn].setValue(ref_title)
+            registerStamp(na)
             ref["prev_title"].setValue(ref_title)
             return na
     except Exception:
@@ -465,11 +757,9 @@ def retitleWired(anchor=""):
         return False
     try:
         anchor_title = anchor["title"].value()
-        anchor_name = anchor.name()
-        for nw in allWireds():
-            if nw["anchor"].value() == anchor_name:
-                nw["title"].setValue(anchor_title)
-                nw["prev_title"].setValue(anchor_title)
+        for nw in anchorWireds(anchor):
+            nw["title"].setValue(anchor_title)
+            nw["prev_title"].setValue(anchor_title)
         return True
     except Exception:
         return False
@@ -483,10 +773,9 @@ def wiredSelectSimilar(anchor_name=""):
         anchor_name (str): The anchor node name. Defaults to the current node's anchor value if not provided.
     """
     if anchor_name == "":
-        anchor_name = nuke.thisNode().knob("anchor").value()
-    for node in allWireds():
-        if node.knob("anchor").value() == anchor_name:
-            node.setSelected(True)
+        anchor_name = wiredAnchorName(nuke.thisNode())
+    for node in wiredsByAnchorName(anchor_name):
+        node.setSelected(True)
 
 
 def wiredReconnect(n=""):
@@ -503,7 +792,7 @@ def wiredReconnect(n=""):
     if n == "":
         n = nuke.thisNode()
     try:
-        anchor = nuke.toNode(n.knob("anchor").value())
+        anchor = wiredAnchor(n)
         if not anchor:
             succeeded = False
         n.setInput(0, anchor)
@@ -516,51 +805,348 @@ def wiredReconnect(n=""):
     return succeeded
 
 
-def wiredReconnectSimilar(anchor_name=""):
+def planReconnect(ns=None, strategy="name", anchor=None):
     """
-    Reconnect similar wired nodes that share the same anchor.
+    Work out how wired stamps would be reconnected, without touching the Node Graph.
+
+    Strategies:
+      - "name": to their stored Anchor, by stored anchor id first and then by stored anchor name.
+      - "title": to the only Anchor with their title, or to the given anchor if several share it.
+      - "selection": to the given anchor.
 
     Args:
-        anchor_name (str): The anchor node name. Defaults to the current node's anchor value if not provided.
+        ns (list): The wired stamps. Defaults to all the wired stamps in the current context.
+        strategy (str): "name", "title" or "selection".
+        anchor (nuke.Node): The Anchor picked by the user, for the "title" and "selection" strategies.
+
+    Returns:
+        list: One dict per stamp that would change, with the keys "wired", "current" (its input),
+              "target" (the Anchor, or None if it can't be reconnected), "strategy" and "reason".
     """
-    if anchor_name == "":
-        anchor_name = nuke.thisNode().knob("anchor").value()
-    for node in nuke.allNodes():
-        if isWired(node) and node.knob("anchor").value() == anchor_name:
-            reconnectErrors = 0
-            try:
-                node.knob("reconnect_this").execute()
-            except Exception:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
-            wiredGetStyle(node)
+    if ns is None:
+        ns = allWireds()
+    plan = []
+    if not ns:
+        return plan
+    registry = stampRegistry(ns[0])
+    anchors = dict((n.name(), n) for n in registry.allAnchors())
+    ids = dict((a_id, anchors[name]) for a_id, name in registry.ids.items() if name in anchors)
+    for n in ns:
+        try:
+            current = n.input(0)
+            target = None
+            reason = ""
+            if strategy == "name":
+                k = n.knob("anchor_id")
+                a_id = k.value() if k is not None else ""
+                a_name = n["anchor"].value()
+                target = ids.get(a_id) if a_id else None
+                if target is None:
+                    target = anchors.get(a_name)
+                    if target is None:
+                        target = wiredAnchor(n)  # Not in this context's map, i.e. a full node path.
+                    elif a_id and registry.anchor_id.get(a_name) not in ["", a_id]:
+                        target = None
+                if target is None:
+                    reason = "Anchor not found: {}".format(a_name)
+            elif strategy == "title":
+                title = n["title"].value()
+                matches = [anchors[name] for name in registry.titles.get(title, ()) if name in anchors]
+                if len(matches) == 1:
+                    target = matches[0]
+                elif not matches:
+                    reason = "No Anchor titled '{}'".format(title)
+                elif anchor is not None and anchor in matches:
+                    target = anchor
+                else:
+                    reason = "{} Anchors titled '{}'".format(len(matches), title)
+            elif strategy == "selection":
+                target = anchor
+                if target is None:
+                    reason = "No Anchor selected"
+            if target is None:
+                plan.append({"wired": n, "current": current, "target": None, "strategy": strategy, "reason": reason})
+                continue
+            if current != target:
+                reason = "Connected to {}".format(current.name()) if current is not None else "Disconnected"
+            elif not wiredLinkedTo(n, target) or n["anchor"].value() != target.name():
+                reason = "Link to {} out of date".format(target.name())
+            elif strategy == "selection" and n["title"].value() != target["title"].value():
+                reason = "Title out of date"
+            elif n["note_font_color"].value() == Stamps_BrokenColor:
+                reason = "Styled as broken"
+            else:
+                continue
+            plan.append({"wired": n, "current": current, "target": target, "strategy": strategy, "reason": reason})
+        except Exception as e:
+            plan.append({"wired": n, "current": None, "target": None, "strategy": strategy, "reason": str(e)})
+    return plan
 
 
-def wiredReconnectAll():
+def applyReconnectPlan(plan, undo_name="Reconnect Stamps"):
     """
-    Reconnect all wired nodes in the script.
+    Apply a plan made by planReconnect in a single batch, so it can be undone in one step.
+
+    Args:
+        plan (list): As returned by planReconnect.
+        undo_name (str): Name of the undo step.
+
+    Returns:
+        dict: {"reconnected": [nodes], "failed": [(node, reason)]}
     """
-    for node in nuke.allNodes():
-        if isWired(node):
-            reconnectErrors = 0
+    result = {"reconnected": [], "failed": []}
+    with batch(undo_name):
+        for change in plan:
+            n = change["wired"]
+            a = change["target"]
             try:
-                node.knob("reconnect_this").execute()
-            except Exception:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
+                if a is None:
+                    result["failed"].append((n, change["reason"]))
+                    if n["note_font_color"].value() != Stamps_BrokenColor:
+                        wiredStyle(n, 1)
+                    continue
+                if not wiredLinkedTo(n, a) or n["anchor"].value() != a.name():
+                    wiredSetAnchor(n, a)
+                if change["strategy"] == "selection" and n["title"].value() != a["title"].value():
+                    n["title"].setValue(a["title"].value())
+                if n.input(0) != a:
+                    n.setInput(0, a)
+                wiredStyle(n, 0)
+                result["reconnected"].append(n)
+            except Exception as e:
+                result["failed"].append((n, str(e)))
+    return result
 
 
-def wiredReconnectByTitle(title=""):
+def reconnectStamps(ns=None):
     """
-    Reconnect the current node based on matching title with anchor nodes.
+    Reconnect many wired stamps to their stored Anchors in one pass, and restyle the ones whose state changes.
+
+    Args:
+        ns (list): The wired stamps. Defaults to all the wired stamps in the current context.
+
+    Returns:
+        dict: {"reconnected": [nodes], "ok": [nodes already connected], "failed": [(node, reason)]}
+    """
+    if ns is None:
+        ns = allWireds()
+    result = applyReconnectPlan(planReconnect(ns))
+    changed = set(n.name() for n in result["reconnected"]) | set(n.name() for n, _ in result["failed"])
+    result["ok"] = [n for n in ns if n.name() not in changed]
+    return result
+
+
+def reconnectPlanCost(plan):
+    """
+    Summarize what applying a reconnection plan involves.
+
+    Args:
+        plan (list): As returned by planReconnect.
+
+    Returns:
+        dict: {"changes", "reconnects", "relinks", "failures", "cost"}, where cost is as in estimateCost.
+    """
+    failures = len([c for c in plan if c["target"] is None])
+    reconnects = len([c for c in plan if c["target"] is not None and c["current"] != c["target"]])
+    relinks = len(plan) - failures - reconnects
+    return {"changes": len(plan), "reconnects": reconnects, "relinks": relinks, "failures": failures,
+            "cost": estimateCost(reconnects=reconnects + relinks)}
+
+
+def reconnectPlanToJson(plan):
+    """
+    Return a reconnection plan as a JSON string, with node names instead of nodes.
+
+    Args:
+        plan (list): As returned by planReconnect.
+
+    Returns:
+        str: The JSON document.
+    """
+    def name(n):
+        return n.fullName() if n is not None else None
+    changes = [{"wired": name(c["wired"]), "current": name(c["current"]), "target": name(c["target"]),
+                "strategy": c["strategy"], "reason": c["reason"]} for c in plan]
+    return json.dumps({"script": _usageScript(), "cost": reconnectPlanCost(plan), "changes": changes}, indent=2)
+
+
+def estimateCost(nodes=0, dialogs=0, reconnects=0):
+    """
+    Roughly estimate the cost of a bulk operation, in units of one node creation.
+    A dialog the user has to go through counts as 10 node creations, and reconnecting a stamp as a tenth of one.
+
+    Args:
+        nodes (int): Nodes to create.
+        dialogs (int): Dialogs to show.
+        reconnects (int): Stamps to reconnect or relink.
+
+    Returns:
+        float: The cost.
+    """
+    return nodes + dialogs * 10 + reconnects * 0.1
+
+
+def confirmCost(cost, message):
+    """
+    Ask the user to confirm an operation whose estimated cost is above STAMPS_CONFIRM_COST.
+
+    Args:
+        cost (float): As returned by estimateCost.
+        message (str): What the operation will do.
+
+    Returns:
+        bool: True if the operation should go on.
+    """
+    if cost <= STAMPS_CONFIRM_COST:
+        return True
+    return nuke.ask("{}\nDo you want to continue?".format(message))
+
+
+def previewReconnect(ns=None, strategy="name", anchor=None):
+    """
+    Show the changes a reconnection would make in a table, and apply them if the user accepts.
+
+    Args:
+        ns (list): The wired stamps. Defaults to all the wired stamps in the current context.
+        strategy (str): "name", "title" or "selection", see planReconnect.
+        anchor (nuke.Node): The Anchor for the "title" and "selection" strategies. Defaults to the selected one.
+    """
+    if anchor is None and strategy in ["title", "selection"]:
+        anchor = StampQuery().anchors().selected().first()
+    plan = planReconnect(ns, strategy, anchor)
+    if not plan:
+        nuke.message("Nothing to reconnect: all the Stamps are connected to their Anchors.")
+        return
+    global stamps_reconnectPlan_panel
+    stamps_reconnectPlan_panel = ReconnectPlanPanel(plan)
+    if stamps_reconnectPlan_panel.exec_():
+        reconnectMessage(applyReconnectPlan(plan))
+
+
+def reconnectMessage(result, prefix="Stamps reconnected."):
+    """
+    Show a single summary dialog for a reconnectStamps result, if anything failed, and select the failed stamps.
+
+    Args:
+        result (dict): As returned by reconnectStamps.
+        prefix (str): First line of the message.
+    """
+    failed = result["failed"]
+    if not failed:
+        return
+    for i in nuke.selectedNodes():
+        i.setSelected(False)
+    for n, _ in failed:
+        try:
+            n.setSelected(True)
+        except Exception:
+            pass
+    lines = ["{}: {}".format(n.name(), reason) for n, reason in failed[:20]]
+    if len(failed) > 20:
+        lines.append("...")
+    nuke.message("{0} Couldn't reconnect {1} node/s:\n\n{2}".format(prefix, len(failed), "\n".join(lines)))
+
+
+def reconnectByStrategy(ns, strategy, anchor=None, undo_name="Reconnect Stamps"):
+    """
+    Plan and apply the reconnection of many wired stamps in a single batch, and report the ones that
+    couldn't be reconnected, which are left as they are, in a single dialog.
+
+    Args:
+        ns (list): The wired stamps.
+        strategy (str): "name", "title" or "selection", see planReconnect.
+        anchor (nuke.Node): The Anchor for the "title" and "selection" strategies.
+        undo_name (str): Name of the undo step.
+
+    Returns:
+        dict: {"reconnected": [nodes], "failed": [(node, reason)]}
+    """
+    with batch(undo_name):
+        plan = planReconnect(ns, strategy, anchor)
+        result = applyReconnectPlan([c for c in plan if c["target"] is not None], undo_name)
+    result["failed"] += [(c["wired"], c["reason"]) for c in plan if c["target"] is None]
+    reconnectMessage(result)
+    return result
 
-    If exactly one match is found, connect to that anchor.
-    If multiple matches are found, require the user to select one.
-    If no matches are found, display a message.
+
+def wiredReconnectSimilar(anchor_name=""):
+    """
+    Reconnect similar wired nodes that share the same anchor.
+
+    Args:
+        anchor_name (str): The anchor node name. Defaults to the current node's anchor value if not provided.
+    """
+    if anchor_name == "":
+        anchor_name = wiredAnchorName(nuke.thisNode())
+    reconnectMessage(reconnectStamps(wiredsByAnchorName(anchor_name)))
+
+
+def wiredReconnectAll():
+    """
+    Reconnect all wired nodes in the script.
+    """
+    plan = planReconnect(allWireds())
+    cost = reconnectPlanCost(plan)
+    if not confirmCost(cost["cost"], "This will reconnect {} Stamps.".format(cost["changes"])):
+        return
+    reconnectMessage(applyReconnectPlan(plan))
+
+
+def wiredTitleAnchor(n, title):
+    """
+    Find the Anchor that wired stamps with the given title would connect to, telling the user why if there's none.
+
+    If exactly one Anchor has the title, that's the one.
+    If several have it, the selected Anchor is used, if it's one of them.
+
+    Args:
+        n (nuke.Node): A node in the context to search.
+        title (str): The title to match.
+
+    Returns:
+        nuke.Node: The Anchor, or None.
+    """
+    matches = stampRegistry(n).anchorsByTitle(title)
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        nuke.message("No Anchor Stamps with title '{}' found in the script.".format(title))
+        return None
+    ns = nuke.selectedNodes()
+    if len(ns) == 1 and isAnchor(ns[0]):
+        if ns[0] in matches:
+            return ns[0]
+        return None
+    nuke.message("More than one Anchor Stamp found with the same title. Please select the one you like in the Node Graph and click this button again.")
+    return None
+
+
+def selectedAnchor():
+    """
+    Return the only selected node if it's an Anchor Stamp, telling the user what to select otherwise.
+
+    Returns:
+        nuke.Node: The Anchor, or None.
+    """
+    ns = nuke.selectedNodes()
+    if not ns:
+        nuke.message("Please select an Anchor Stamp first.")
+    elif len(ns) > 1:
+        nuke.message("Multiple nodes selected, please select only one Anchor Stamp.")
+    elif not isAnchor(ns[0]):
+        nuke.message("Please select an Anchor Stamp.")
+    else:
+        return ns[0]
+    return None
+
+
+def wiredReconnectByTitle(title=""):
+    """
+    Reconnect the current node based on matching title with anchor nodes.
+
+    If exactly one match is found, connect to that anchor.
+    If multiple matches are found, require the user to select one.
+    If no matches are found, display a message.
 
     Args:
         title (str): The title to match. Defaults to the current node's title if not provided.
@@ -568,27 +1154,9 @@ def wiredReconnectByTitle(title=""):
     n = nuke.thisNode()
     if title == "":
         title = n.knob("title").value()
-    matches = []
-    for node in nuke.allNodes():
-        if isAnchor(node) and node.knob("title").value() == title:
-            matches.append(node)
-
-    num_matches = len(matches)
-    if num_matches == 1:  # One match -> Connect
-        anchor = matches[0]
-        n["anchor"].setValue(anchor.name())
-        n.setInput(0, anchor)
-    elif num_matches > 1:
-        ns = nuke.selectedNodes()
-        if ns and len(ns) == 1 and isAnchor(ns[0]):
-            if ns[0].knob("title").value() == title:
-                n["anchor"].setValue(ns[0].name())
-                n.setInput(0, ns[0])
-                n.knob("reconnect_this").execute()
-        else:
-            nuke.message("More than one Anchor Stamp found with the same title. Please select the one you like in the Node Graph and click this button again.")
-    elif num_matches == 0:
-        nuke.message("No Anchor Stamps with title '{}' found in the script.".format(title))
+    anchor = wiredTitleAnchor(n, title)
+    if anchor is not None:
+        reconnectByStrategy([n], "selection", anchor, "Reconnect Stamp")
 
 
 def wiredReconnectByTitleSimilar(title=""):
@@ -601,112 +1169,41 @@ def wiredReconnectByTitleSimilar(title=""):
     n = nuke.thisNode()
     if title == "":
         title = n.knob("title").value()
-    matches = []
-    for node in allAnchors():
-        if node.knob("title").value() == title:
-            matches.append(node)
-
-    num_matches = len(matches)
-    if num_matches == 0:
-        nuke.message("No Anchor Stamps with title '{}' found in the script.".format(title))
-        return
-
-    anchor_name = n.knob("anchor").value()
-    siblings = [node for node in nuke.allNodes() if isWired(node) and node.knob("anchor").value() == anchor_name]
-
-    if num_matches == 1:  # One match -> Connect
-        anchor = matches[0]
-        for s in siblings:
-            s["anchor"].setValue(anchor.name())
-            s.setInput(0, anchor)
-            wiredStyle(s, 0)
-            s.knob("reconnect_this").execute()
-    elif num_matches > 1:
-        ns = nuke.selectedNodes()
-        if ns and len(ns) == 1 and isAnchor(ns[0]):
-            if ns[0].knob("title").value() == title:
-                for s in siblings:
-                    s["anchor"].setValue(ns[0].name())
-                    s.setInput(0, ns[0])
-                    wiredStyle(s, 0)
-                    s.knob("reconnect_this").execute()
-        else:
-            nuke.message("More than one Anchor Stamp found with the same title. Please select the one you like in the Node Graph and click this button again.")
+    anchor = wiredTitleAnchor(n, title)
+    if anchor is not None:
+        reconnectByStrategy(wiredsByAnchorName(wiredAnchorName(n)), "selection", anchor)
 
 
 def wiredReconnectByTitleSelected():
     """
     Reconnect selected wired nodes based on matching title with anchor nodes.
-    Only processes wired nodes.
+    Only processes wired nodes. Stamps whose title is shared by several Anchors connect to the selected
+    Anchor, if it's one of them. The ones left unresolved are reported at the end, in a single dialog.
     """
     ns = nuke.selectedNodes()
+    anchors = [node for node in ns if isAnchor(node)]
     ns = [node for node in ns if isWired(node)]
-
-    for n in ns:
-        title = n.knob("title").value()
-        matches = []
-        for node in allAnchors():
-            if node.knob("title").value() == title:
-                matches.append(node)
-
-        if len(matches) == 1:  # One match -> Connect
-            anchor = matches[0]
-            n["anchor"].setValue(anchor.name())
-            n.setInput(0, anchor)
-            wiredStyle(n, 0)
-            n.knob("reconnect_this").execute()
+    reconnectByStrategy(ns, "title", anchors[0] if len(anchors) == 1 else None)
 
 
 def wiredReconnectBySelection():
     """
     Reconnect the current node using a selected Anchor Stamp.
     """
-    global Stamps_LockCallbacks
     n = nuke.thisNode()
-    ns = nuke.selectedNodes()
-
-    if not ns:
-        nuke.message("Please select an Anchor Stamp first.")
-    elif len(ns) > 1:
-        nuke.message("Multiple nodes selected, please select only one Anchor Stamp.")
-    else:
-        if not isAnchor(ns[0]):
-            nuke.message("Please select an Anchor Stamp.")
-        else:
-            Stamps_LockCallbacks = True
-            n["anchor"].setValue(ns[0].name())
-            n["title"].setValue(ns[0]["title"].value())
-            n.setInput(0, ns[0])
-            wiredGetStyle(n)
-            Stamps_LockCallbacks = False
-            n.knob("reconnect_this").execute()
+    anchor = selectedAnchor()
+    if anchor is not None:
+        reconnectByStrategy([n], "selection", anchor, "Reconnect Stamp")
 
 
 def wiredReconnectBySelectionSimilar():
     """
     Reconnect similar wired nodes using a selected Anchor Stamp.
     """
-    global Stamps_LockCallbacks
     n = nuke.thisNode()
-    ns = nuke.selectedNodes()
-
-    if not ns:
-        nuke.message("Please select an Anchor Stamp first.")
-    elif len(ns) > 1:
-        nuke.message("Multiple nodes selected, please select only one Anchor Stamp.")
-    elif not isAnchor(ns[0]):
-        nuke.message("Please select an Anchor Stamp.")
-    else:
-        anchor_name = n.knob("anchor").value()
-        siblings = [node for node in nuke.allNodes() if isWired(node) and node.knob("anchor").value() == anchor_name]
-        for s in siblings:
-            Stamps_LockCallbacks = True
-            s["anchor"].setValue(ns[0].name())
-            s["title"].setValue(ns[0]["title"].value())
-            s.setInput(0, ns[0])
-            wiredStyle(s, 0)
-            Stamps_LockCallbacks = False
-            s.knob("reconnect_this").execute()
+    anchor = selectedAnchor()
+    if anchor is not None:
+        reconnectByStrategy(wiredsByAnchorName(wiredAnchorName(n)), "selection", anchor)
 
 
 def wiredReconnectBySelectionSelected():
@@ -714,39 +1211,24 @@ def wiredReconnectBySelectionSelected():
     Reconnect multiple wired nodes to a selected Anchor Stamp.
     Requires one Anchor plus one or more Stamps to be selected.
     """
-    global Stamps_LockCallbacks
-    n = nuke.thisNode()
     ns = nuke.selectedNodes()
 
     if not ns:
         nuke.message("Please select one Anchor plus one or more Stamps first.")
         return
 
-    anchors = []
-    stamps = []
-    for node in ns:
-        if isAnchor(node):
-            anchors.append(node)
-        if isWired(node):
-            stamps.append(node)
+    anchors = [node for node in ns if isAnchor(node)]
+    stamps = [node for node in ns if isWired(node)]
 
     if len(anchors) != 1:
         nuke.message("Please select one Anchor, plus one or more Stamps.")
         return
-    else:
-        anchor = anchors[0]
 
     if not stamps:
         nuke.message("Please, also select one or more Stamps that you want to reconnect to the selected Anchor.")
+        return
 
-    for s in stamps:
-        Stamps_LockCallbacks = True
-        s["anchor"].setValue(anchor.name())
-        s["title"].setValue(anchor["title"].value())
-        s.setInput(0, anchor)
-        wiredStyle(s, 0)
-        Stamps_LockCallbacks = False
-        s.knob("reconnect_this").execute()
+    reconnectByStrategy(stamps, "selection", anchors[0])
 
 
 def anchorReconnectWired(anchor=""):
@@ -758,17 +1240,7 @@ def anchorReconnectWired(anchor=""):
     """
     if anchor == "":
         anchor = nuke.thisNode()
-    anchor_name = anchor.name()
-    for node in allWireds():
-        if node.knob("anchor").value() == anchor_name:
-            reconnectErrors = 0
-            try:
-                node.setInput(0, anchor)
-            except Exception:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
+    reconnectMessage(reconnectStamps(anchorWireds(anchor)))
 
 
 def wiredZoomNext(anchor_name=""):
@@ -780,19 +1252,16 @@ def wiredZoomNext(anchor_name=""):
         anchor_name (str): The anchor node name. Defaults to the current node's anchor value if not provided.
     """
     if anchor_name == "":
-        anchor_name = nuke.thisNode().knob("anchor").value()
+        anchor_name = wiredAnchorName(nuke.thisNode())
     anchor = nuke.toNode(anchor_name)
     showing_knob = anchor.knob("showing")
     showing_value = showing_knob.value()
-    i = 0
-    for node in allWireds():
-        if node.knob("anchor").value() == anchor_name:
-            if i == showing_value:
-                center = [node.xpos() + node.screenWidth() / 2, node.ypos() + node.screenHeight() / 2]
-                nuke.zoom(1.5, center)
-                showing_knob.setValue(i + 1)
-                return
-            i += 1
+    for i, node in enumerate(anchorWireds(anchor)):
+        if i == showing_value:
+            center = [node.xpos() + node.screenWidth() / 2, node.ypos() + node.screenHeight() / 2]
+            nuke.zoom(1.5, center)
+            showing_knob.setValue(i + 1)
+            return
     showing_knob.setValue(0)
     nuke.message("Couldn't find any more similar wired stamps.")
 
@@ -830,15 +1299,36 @@ def anchorWireds(anchor=""):
         except Exception:
             return []
     if isAnchor(anchor):
+        registry = stampRegistry(anchor)
+        keys = [anchorId(anchor), anchor.name()]
         try:
-            nn = anchor["prev_name"].value()
+            keys.append(anchor["prev_name"].value())
         except Exception:
-            nn = anchor.name()
-        children = [node for node in allWireds() if node.knob("anchor").value() == nn]
+            pass
+        children = []
+        for key in filter(None, dict.fromkeys(keys)):
+            children += registry.wiredsOf(key)
         return children
     return []
 
 
+# Stamps' own knobs, which stay visible when the built-in ones are hidden.
+WIRED_KNOBS = frozenset([
+    'wired_tab', 'identifier', 'lockCallbacks', 'toReconnect', 'title', 'prev_title',
+    'tags', 'backdrops', 'anchor', 'anchor_id', 'line1', 'anchor_label', 'show_anchor', 'zoom_anchor',
+    'stamps_label', 'zoomNext', 'selectSimilar', 'space_1', 'reconnect_label', 'reconnect_this',
+    'reconnect_similar', 'reconnect_all', 'space_2', 'advanced_reconnection',
+    'reconnect_by_title_label', 'reconnect_by_title_this', 'reconnect_by_title_similar',
+    'reconnect_by_title_selected', 'reconnect_by_selection_label', 'reconnect_by_selection_this',
+    'reconnect_by_selection_similar', 'reconnect_by_selection_selected', 'auto_reconnect_by_title',
+    'advanced_reconnection', 'line2', 'buttonHelp', 'version', 'postageStamp_show'
+])
+ANCHOR_KNOBS = frozenset([
+    'anchor_tab', 'identifier', 'title', 'prev_title', 'prev_name', 'anchor_id', 'showing',
+    'tags', 'stamps_label', 'selectStamps', 'reconnectStamps', 'zoomNext',
+    'createStamp', 'buttonHelp', 'line1', 'line2', 'version'
+])
+
 # Code snippets used for onCreate and reconnection actions.
 wiredOnCreate_code = """if nuke.GUI:
     try:
@@ -859,15 +1349,15 @@ except Exception:
 """
 
 wiredReconnect_code = """n = nuke.thisNode()
-try:
-    n.setInput(0, nuke.toNode(n.knob("anchor").value()))
-except Exception:
-    nuke.message("Unable to reconnect.")
 try:
     import stamps
-    stamps.wiredGetStyle(n)
-except Exception:
-    pass
+    if not stamps.wiredReconnect(n):
+        nuke.message("Unable to reconnect.")
+except ImportError:
+    try:
+        n.setInput(0, nuke.toNode(n.knob("anchor").value()))
+    except Exception:
+        nuke.message("Unable to reconnect.")
 """
 
 
@@ -888,16 +1378,36 @@ def anchor(title="", tags="", input_node="", node_type="2D"):
     Returns:
         nuke.Node: The created anchor node.
     """
-    try:
-        n = nuke.createNode(AnchorClassesAlt[node_type])
-    except Exception:
-        try:
-            n = nuke.createNode(StampClasses[node_type])
-        except Exception:
-            n = nuke.createNode("NoOp")
+    stampLoadCheck()
     name = getAvailableName("Anchor", rand=True)
-    n["name"].setValue(name)
+    a_id = newAnchorId()
+    n = stampFromTemplate("anchor", node_type, {"name": name, "title": title, "tags": tags, "anchor_id": a_id})
+    if n is None:
+        for node_class in stampClassCandidates("anchor", node_type):
+            try:
+                n = nuke.createNode(node_class)
+                break
+            except Exception:
+                pass
+        n["name"].setValue(name)
+        anchorKnobs(n, title, tags, name, a_id, node_type)
+    registerStamp(n)
 
+    return n
+
+
+def anchorKnobs(n, title, tags, name, anchor_id, node_type):
+    """
+    Set the default values of a new Anchor and build its UI knobs, one by one.
+
+    Args:
+        n (nuke.Node): The new node.
+        title (str): The display title.
+        tags (str): Comma-separated tags.
+        name (str): The node name.
+        anchor_id (str): The Anchor's unique id.
+        node_type (str): The type of node.
+    """
     # Set default knob values.
     for knob_name, value in anchor_defaults.items():
         try:
@@ -925,12 +1435,15 @@ def anchor(title="", tags="", input_node="", node_type="2D"):
     prev_title_knob.setVisible(False)
     prev_name_knob = nuke.Text_Knob('prev_name', '', name)
     prev_name_knob.setVisible(False)
+    anchor_id_knob = nuke.Text_Knob('anchor_id', '', anchor_id)
+    anchor_id_knob.setVisible(False)
     showing_knob = nuke.Int_Knob('showing', '', 0)
     showing_knob.setVisible(False)
     tags_knob = nuke.String_Knob('tags', 'Tags', tags)
     tags_knob.setTooltip("Comma-separated tags to help find this Anchor via the Stamp Selector.")
 
-    for knob in [anchorTab_knob, identifier_knob, title_knob, prev_title_knob, prev_name_knob, showing_knob, tags_knob]:
+    for knob in [anchorTab_knob, identifier_knob, title_knob, prev_title_knob, prev_name_knob, anchor_id_knob,
+                 showing_knob, tags_knob]:
         n.addKnob(knob)
 
     n.addKnob(nuke.Text_Knob("line1", "", ""))  # Separator line.
@@ -965,32 +1478,67 @@ def anchor(title="", tags="", input_node="", node_type="2D"):
         n.addKnob(knob)
     n["help"].setValue(STAMPS_HELP)
 
-    return n
-
 
-def wired(anchor):
+def wired(anchor, name=None, place=True):
     """
     Create a Wired Stamp node linked to the supplied Anchor.
 
     Args:
         anchor (nuke.Node): The anchor node to which this wired stamp is connected.
+        name (str): The node name. Defaults to the next available "Stamp" name.
+        place (bool): If True, create it like Nuke creates nodes from the menus, next to the selection.
+                      If False, leave the selection and the Properties Bin alone, and let the caller place it.
 
     Returns:
         nuke.Node: The created wired stamp node.
     """
     global Stamps_LastCreated
     Stamps_LastCreated = anchor.name()
+    stampLoadCheck()
 
     node_type = nodeType(realInput(anchor))
-    try:
-        n = nuke.createNode(StampClassesAlt[node_type])
-    except Exception:
-        try:
-            n = nuke.createNode(StampClasses[node_type])
-        except Exception:
-            n = nuke.createNode("NoOp")
-    n["name"].setValue(getAvailableName("Stamp"))
+    name = name or getAvailableName("Stamp")
+    title = anchor["title"].value()
+    a_id = anchorId(anchor)
+    n = stampFromTemplate("wired", node_type, {"name": name, "title": title, "anchor": anchor.name(), "anchor_id": a_id},
+                          place)
+    if n is None:
+        for node_class in stampClassCandidates("wired", node_type):
+            try:
+                n = nuke.createNode(node_class) if place else getattr(nuke.nodes, node_class)()
+                break
+            except Exception:
+                pass
+        n["name"].setValue(name)
+        wiredKnobs(n, title, anchor.name(), a_id, node_type)
 
+    # Adjust input node position without affecting node layout.
+    x, y = n.xpos(), n.ypos()
+    nw = n.screenWidth()
+    aw = anchor.screenWidth()
+    n.setInput(0, anchor)
+    n["hide_input"].setValue(True)
+    n["xpos"].setValue(x - nw / 2 + aw / 2)
+    n["ypos"].setValue(y)
+
+    registerStamp(n)
+    usageRecord(anchor)
+
+    return n
+    Stamps_LastCreated = anchor.name()
+
+
+def wiredKnobs(n, title, anchor_name, anchor_id, node_type):
+    """
+    Set the default values of a new Wired stamp and build its UI knobs, one by one.
+
+    Args:
+        n (nuke.Node): The new node.
+        title (str): The display title, same as its Anchor's.
+        anchor_name (str): The name of its Anchor.
+        anchor_id (str): The unique id of its Anchor.
+        node_type (str): The type of node.
+    """
     # Set default knob values.
     for knob_name, value in wired_defaults.items():
         try:
@@ -1013,23 +1561,27 @@ def wired(anchor):
     lock_knob.setVisible(False)
     toReconnect_knob = nuke.Boolean_Knob("toReconnect")
     toReconnect_knob.setVisible(False)
-    title_knob = nuke.String_Knob('title', 'Title:', anchor["title"].value())
+    title_knob = nuke.String_Knob('title', 'Title:', title)
     title_knob.setTooltip("Displayed name on the Node Graph for this Stamp and its Anchor.")
-    prev_title_knob = nuke.Text_Knob('prev_title', '', anchor["title"].value())
+    prev_title_knob = nuke.Text_Knob('prev_title', '', title)
     prev_title_knob.setVisible(False)
     tags_knob = nuke.Text_Knob('tags', 'Tags:', " ")
     tags_knob.setTooltip("Tags of this stamp's Anchor. Click 'show anchor' to change them.")
     backdrops_knob = nuke.Text_Knob('backdrops', 'Backdrops:', " ")
     backdrops_knob.setTooltip("Labels of backdrop nodes that contain this stamp's Anchor.")
+    for knob in [tags_knob, backdrops_knob]:
+        knob.setFlag(nuke.DO_NOT_WRITE)  # Only shown on the panel, from the Anchor.
     postageStamp_knob = nuke.Boolean_Knob("postageStamp_show", "postage stamp")
     postageStamp_knob.setTooltip("Enable the postage stamp thumbnail for this node.")
     postageStamp_knob.setFlag(nuke.STARTLINE)
     postageStamp_knob.setVisible("postage_stamp" in n.knobs() and nodeType(n) == "2D")
 
-    anchor_knob = nuke.String_Knob('anchor', 'Anchor', anchor.name())
+    anchor_knob = nuke.String_Knob('anchor', 'Anchor', anchor_name)
+    anchor_id_knob = nuke.Text_Knob('anchor_id', '', anchor_id)
+    anchor_id_knob.setVisible(False)
 
     for knob in [wiredTab_knob, identifier_knob, lock_knob, toReconnect_knob, title_knob, prev_title_knob, tags_knob,
-                 backdrops_knob]:
+                 backdrops_knob, anchor_id_knob]:
         n.addKnob(knob)
 
     wiredTab_knob.setFlag(0)  # Open the tab.
@@ -1137,21 +1689,7 @@ def wired(anchor):
     version_knob.setTooltip(VERSION_TOOLTIP)
     for knob in [line_knob, buttonHelp, version_knob]:
         n.addKnob(knob)
-
-    # Adjust input node position without affecting node layout.
-    x, y = n.xpos(), n.ypos()
-    nw = n.screenWidth()
-    aw = anchor.screenWidth()
-    n.setInput(0, anchor)
-    n["hide_input"].setValue(True)
-    n["xpos"].setValue(x - nw / 2 + aw / 2)
-    n["ypos"].setValue(y)
-
     n["help"].setValue(STAMPS_HELP)
-    wiredTagsAndBackdrops(n)
-
-    return n
-    Stamps_LastCreated = anchor.name()
 
 
 def getAvailableName(name="Untitled", rand=False):
@@ -1165,46 +1703,371 @@ def getAvailableName(name="Untitled", rand=False):
     Returns:
         str: An available node name that does not currently exist.
     """
+    if not rand:
+        return getAvailableNames(name, 1)[0]
     import random
-    i = 1
+    registry = stampRegistry()
     while True:
-        if not rand:
-            available_name = name + str(i)
-        else:
-            available_name = name + str('_%09x' % random.randrange(9 ** 12))
-        if not nuke.exists(available_name):
+        available_name = name + str('_%09x' % random.randrange(9 ** 12))
+        if not registry.exists(available_name):
             return available_name
-        i += 1
 
 
-#################################
-### CLASSES
-#################################
-
-class AnchorSelector(QtWidgets.QDialog):
+def getAvailableNames(name="Untitled", count=1):
     """
-    Panel to select one or more anchors, displaying dropdowns grouped by tags and backdrops.
+    Returns several unique sequential node names starting with the given base name.
 
-    TODO:
-      - Display three columns similar to an asset loader (with optional border colours).
-      - Add the ability to show/hide backdrops (either by toggling their visibility or 'bookmarking').
+    Only the first call for a base name scans the script; later ones reuse the suffixes of deleted stamps,
+    and then continue from the highest suffix found.
+
+    Args:
+        name (str): The base name.
+        count (int): How many names to return.
+
+    Returns:
+        list: Available node names that do not currently exist.
     """
+    return stampRegistry().allocateNames(name, count)
 
-    def __init__(self):
-        super(AnchorSelector, self).__init__()
-        self.setWindowTitle("Stamps: Select an Anchor.")
-        self.chosen_anchors = []
-        self.initUI()
-        # Set focus on the custom anchors line edit.
-        self.custom_anchors_lineEdit.setFocus()
 
-    def initUI(self):
-        # Find all anchors and collect their tags/backdrops.
-        self.findAnchorsAndTags()  # Generates: {"Camera1": ["Camera", "New", "Custom1"], "Read": ["2D", "New"]}
-        self.custom_chosen = False  # Tracks whether the custom line edit OK was clicked.
+def reserveNames(name="Untitled", count=1):
+    """
+    Reserve names for a batch of nodes, so that getAvailableName hands them out without rescanning the script.
 
-        # Header setup.
-        self.headerTitle = QtWidgets.QLabel("Anchor Stamp Selector")
+    Args:
+        name (str): The base name.
+        count (int): How many names to reserve.
+    """
+    registry = stampRegistry()
+    for reserved in registry.allocateNames(name, count):
+        registry.freeName(reserved)
+
+
+def releaseNames(name="Untitled"):
+    """
+    Give back the names reserved for a batch and not used, so they're handed out next.
+
+    Args:
+        name (str): The base name.
+    """
+    stampRegistry().trimNames(name)
+
+
+#################################
+### STAMP TEMPLATES
+#################################
+
+# Node scripts of the stamps' own knobs, as anchorKnobs and wiredKnobs build them, to paste stamps in one go.
+# The %(field)s placeholders are knob values: each instance's title, tags, name, anchor and anchor_id,
+# and the version, tooltip, code and tab group values, filled in as quoted TCL words. See stampTemplate.
+ANCHOR_TEMPLATE = """\
+ addUserKnob {20 anchor_tab l "Anchor Stamp"}
+ addUserKnob {26 identifier l identifier +INVISIBLE T anchor}
+ addUserKnob {1 title l Title: t "Displayed name on the Node Graph for this Stamp and its Anchor.\\nIMPORTANT: This is only for display purposes, and is different from the internal node name."}
+ title %(title)s
+ addUserKnob {26 prev_title l "" +INVISIBLE T %(title)s}
+ addUserKnob {26 prev_name l "" +INVISIBLE T %(name)s}
+ addUserKnob {26 anchor_id l "" +INVISIBLE T %(anchor_id)s}
+ addUserKnob {3 showing l "" +INVISIBLE}
+ addUserKnob {1 tags l Tags t "Comma-separated tags to help find this Anchor via the Stamp Selector."}
+ tags %(tags)s
+ addUserKnob {26 line1 l ""}
+ addUserKnob {26 stamps_label l Stamps: +STARTLINE T " "}
+ addUserKnob {22 createStamp l new t "Create a new Stamp for this Anchor." T "stamps.stampCreateWired(nuke.thisNode())"}
+ addUserKnob {22 selectStamps l select t "Select all of this Anchor's Stamps." T "stamps.wiredSelectSimilar(nuke.thisNode().name())"}
+ addUserKnob {22 reconnectStamps l reconnect t "Reconnect all of this Anchor's Stamps." T "stamps.anchorReconnectWired()"}
+ addUserKnob {22 zoomNext l "zoom next" t "Navigate to this Anchor's next Stamp on the Node Graph." T "stamps.wiredZoomNext(nuke.thisNode().name())"}
+ addUserKnob {26 line2 l ""}
+ addUserKnob {22 buttonHelp l Help T "stamps.showHelp()"}
+ addUserKnob {26 version l " " t %(version_tooltip)s -STARTLINE T %(version)s}
+"""
+
+WIRED_TEMPLATE = """\
+ addUserKnob {20 wired_tab l "Wired Stamp"}
+ addUserKnob {26 identifier l identifier +INVISIBLE T wired}
+ addUserKnob {3 lockCallbacks l "" +INVISIBLE}
+ addUserKnob {6 toReconnect +INVISIBLE}
+ addUserKnob {1 title l Title: t "Displayed name on the Node Graph for this Stamp and its Anchor."}
+ title %(title)s
+ addUserKnob {26 prev_title l "" +INVISIBLE T %(title)s}
+ addUserKnob {26 tags l Tags: t "Tags of this stamp's Anchor. Click 'show anchor' to change them." +DO_NOT_WRITE T " "}
+ addUserKnob {26 backdrops l Backdrops: t "Labels of backdrop nodes that contain this stamp's Anchor." +DO_NOT_WRITE T " "}
+ addUserKnob {26 anchor_id l "" +INVISIBLE T %(anchor_id)s}
+ addUserKnob {26 line1 l ""}
+ addUserKnob {6 postageStamp_show l "postage stamp" t "Enable the postage stamp thumbnail for this node." +STARTLINE +INVISIBLE}
+ addUserKnob {26 anchor_label l Anchor: +STARTLINE T " "}
+ addUserKnob {22 show_anchor l " show anchor " t "Show the properties panel for this Stamp's Anchor." -STARTLINE T "stamps.wiredShowAnchor()"}
+ addUserKnob {22 zoom_anchor l "zoom anchor" t "Navigate to this Stamp's Anchor on the Node Graph." T "stamps.wiredZoomAnchor()"}
+ addUserKnob {26 stamps_label l Stamps: +STARTLINE T " "}
+ addUserKnob {22 zoomNext l " zoom next " t "Navigate to this Stamp's next sibling on the Node Graph." -STARTLINE T "stamps.wiredZoomNext()"}
+ addUserKnob {22 selectSimilar l " select similar " t "Select all similar Stamps to this one on the Node Graph." -STARTLINE T "stamps.wiredSelectSimilar()"}
+ addUserKnob {26 space_1 l "" +STARTLINE T " "}
+ addUserKnob {26 reconnect_label l Reconnect: t "Reconnect by the stored Anchor name." +STARTLINE T " "}
+ addUserKnob {22 reconnect_this l this t "Reconnect this Stamp to its Anchor using the stored Anchor name." T %(reconnect_code)s}
+ addUserKnob {22 reconnect_similar l similar t "Reconnect this Stamp and similar ones using the stored anchor name." T "stamps.wiredReconnectSimilar()"}
+ addUserKnob {22 reconnect_all l all t "Reconnect all Stamps to their Anchors using the stored names." T "stamps.wiredReconnectAll()"}
+ addUserKnob {26 space_2 l "" +STARTLINE T " "}
+ addUserKnob {20 advanced_reconnection l "Advanced Reconnection" n %(closed_group)s}
+ addUserKnob {26 reconnect_by_title_label l "<font color=gold>By Title:" t "Reconnect by searching for a matching title." +STARTLINE T " "}
+ addUserKnob {22 reconnect_by_title_this l this t "Find an Anchor that shares this Stamp's title and connect to it." T "stamps.wiredReconnectByTitle()"}
+ addUserKnob {22 reconnect_by_title_similar l similar t "Find an Anchor by title and reconnect this Stamp and similar ones to it." T "stamps.wiredReconnectByTitleSimilar()"}
+ addUserKnob {22 reconnect_by_title_selected l selected t "For each selected Stamp, reconnect using an Anchor that shares its title." T "stamps.wiredReconnectByTitleSelected()"}
+ addUserKnob {26 reconnect_by_selection_label l "<font color=orangered>By Selection:" t "Force reconnect to a selected Anchor." +STARTLINE T " "}
+ addUserKnob {22 reconnect_by_selection_this l this t "Force reconnect this Stamp to a selected Anchor." T "stamps.wiredReconnectBySelection()"}
+ addUserKnob {22 reconnect_by_selection_similar l similar t "Force reconnect this Stamp and similar ones to a selected Anchor." T "stamps.wiredReconnectBySelectionSimilar()"}
+ addUserKnob {22 reconnect_by_selection_selected l selected t "Force reconnect all selected Stamps to the selected Anchor." T "stamps.wiredReconnectBySelectionSelected()"}
+ addUserKnob {1 anchor l Anchor}
+ anchor %(anchor)s
+ addUserKnob {6 auto_reconnect_by_title l "<font color=#ED9977>&nbsp; auto-reconnect by title" t "On copy-paste, auto-reconnect by title instead of stored Anchor name; turns off automatically." +STARTLINE}
+ addUserKnob {20 advanced_reconnection l "Advanced Reconnection" n -1}
+ addUserKnob {26 line2 l ""}
+ addUserKnob {22 buttonHelp l Help T "stamps.showHelp()"}
+ addUserKnob {26 version l " " t %(version_tooltip)s -STARTLINE T %(version)s}
+"""
+
+# Built-in knobs that every node class has, so their default values can go in a template.
+# Other defaults (i.e. from a custom style) are set on each instance once pasted.
+TEMPLATE_NODE_KNOBS = frozenset([
+    "tile_color", "gl_color", "label", "note_font", "note_font_size", "note_font_color", "hide_input",
+    "autolabel", "knobChanged", "onCreate", "help",
+])
+
+
+def stampClassCandidates(role, node_type):
+    """
+    Return the node classes to try, in order, for a new stamp.
+
+    Args:
+        role (str): "anchor" or "wired".
+        node_type (str): The type of node.
+
+    Returns:
+        list: Node class names.
+    """
+    alt_classes = AnchorClassesAlt if role == "anchor" else StampClassesAlt
+    return [c for c in [alt_classes.get(node_type), StampClasses.get(node_type), "NoOp"] if c]
+
+
+def tclQuote(value):
+    """
+    Quote a string as a TCL word, so that it reads back unchanged from a node script.
+
+    Args:
+        value (str): The string.
+
+    Returns:
+        str: The quoted string.
+    """
+    if not isinstance(value, (str, unicode)):
+        value = str(value)
+    value = re.sub(r'([\\"$\[\]{}])', r'\\\1', value)
+    return '"' + value.replace("\n", "\\n") + '"'
+
+
+def stampTemplate(role, node_type):
+    """
+    Return the node script template of a stamp, compiling it the first time in the session.
+
+    The template is ANCHOR_TEMPLATE or WIRED_TEMPLATE, after the node's default knob values, with the
+    session's constants filled in and split around the placeholders of each instance's values.
+
+    Args:
+        role (str): "anchor" or "wired".
+        node_type (str): The type of node.
+
+    Returns:
+        tuple: (node class, [(script, field or None)], {other default knob: value}), see templateScript.
+    """
+    key = (role, node_type)
+    if key in Stamps_Templates:
+        return Stamps_Templates[key]
+    if role == "anchor":
+        defaults, colors, text = dict(anchor_defaults), AnchorClassColors, ANCHOR_TEMPLATE
+    else:
+        defaults, colors, text = dict(wired_defaults), WiredClassColors, WIRED_TEMPLATE
+        defaults["onCreate"] = wiredOnCreate_code
+    if node_type in colors:
+        defaults["tile_color"] = colors[node_type]
+    defaults["help"] = STAMPS_HELP
+    constants = {
+        "version": '<a href="http://www.nukepedia.com/gizmos/other/stamps" style="color:#666;text-decoration: none;">'
+                   '<span style="color:#666"><big>Stamps {}</big></span></a>'.format(version),
+        "version_tooltip": VERSION_TOOLTIP,
+        "reconnect_code": wiredReconnect_code,
+        "closed_group": nuke.TABBEGINCLOSEDGROUP,
+    }
+    parts = []
+    script = "".join(" {} {}\n".format(k, tclQuote(v)) for k, v in sorted(defaults.items())
+                     if k in TEMPLATE_NODE_KNOBS)
+    for i, piece in enumerate(re.split(r"%\((\w+)\)s", text)):
+        if i % 2 == 0:
+            script += piece
+        elif piece in constants:
+            script += tclQuote(constants[piece])
+        else:
+            parts.append((script, piece))
+            script = ""
+    parts.append((script, None))
+    extra = dict((k, v) for k, v in defaults.items() if k not in TEMPLATE_NODE_KNOBS)
+    Stamps_Templates[key] = (stampClassCandidates(role, node_type)[0], parts, extra)
+    return Stamps_Templates[key]
+
+
+def stampFromTemplate(role, node_type, values, place=True):
+    """
+    Create a stamp with a single paste of its template, instead of building its knobs one by one.
+
+    Args:
+        role (str): "anchor" or "wired".
+        node_type (str): The type of node.
+        values (dict): The instance's values, by template field. Must include the "name".
+        place (bool): If True, paste it like Nuke creates nodes from the menus, next to (and connected to) the selection.
+                      If False, leave it unconnected and keep the selection.
+
+    Returns:
+        nuke.Node or None: The created node, or None if templates are disabled or unavailable.
+    """
+    if not STAMPS_NODE_TEMPLATES:
+        return None
+    template = stampTemplate(role, node_type)
+    if template is None:
+        return None
+    script = templateScript(template, values, place)
+
+    selection = [] if place else nuke.selectedNodes()
+    n = None
+    try:
+        nodesFromScript(script)
+        n = nuke.toNode(values["name"])
+    except Exception:
+        pass
+    if n is None:
+        # Its node class isn't available in this session: build this kind of stamp knob by knob from now on.
+        Stamps_Templates[(role, node_type)] = None
+    else:
+        for knob_name, value in template[2].items():
+            try:
+                n[knob_name].setValue(value)
+            except Exception:
+                pass
+        if role == "wired":
+            n["postageStamp_show"].setVisible("postage_stamp" in n.knobs() and nodeType(n) == "2D")
+    if not place:
+        if n is not None:
+            n.setSelected(False)
+        for i in selection:
+            i.setSelected(True)
+    return n
+
+
+def templateScript(template, values, place=True):
+    """
+    Return the node script of a stamp, filling a template with the instance's values.
+
+    Values only go where the template has knob values, quoted as TCL words, so they read back unchanged.
+
+    Args:
+        template (tuple): As returned by stampTemplate.
+        values (dict): The instance's values, by template field. Must include the "name".
+        place (bool): If True, the node takes the selected node as input when pasted. If False, it has no input.
+
+    Returns:
+        str: The node script.
+    """
+    node_class, parts = template[:2]
+    body = "".join(script + (tclQuote(values.get(field, "")) if field else "") for script, field in parts)
+    if place:
+        script = "set cut_paste_input [stack 0]\npush $cut_paste_input\n{} {{\n".format(node_class)
+    else:
+        script = "{} {{\n inputs 0\n".format(node_class)
+    return script + " name {}\n{}}}\n".format(tclQuote(values["name"]), body)
+
+
+def clearStampTemplates():
+    """
+    Forget the compiled stamp templates, so they're rebuilt with the current defaults and styles.
+    """
+    Stamps_Templates.clear()
+
+
+def benchmarkStampCreation(count=50):
+    """
+    Time the creation of Anchors and Wired stamps building their knobs one by one, and from templates.
+
+    Each method creates a number of Anchors and one Wired stamp per Anchor, which get deleted afterwards,
+    leaving the usage statistics as they were.
+
+    Args:
+        count (int): Anchors created per method.
+
+    Returns:
+        dict: Seconds per stamp, by method ("knobs", "template").
+    """
+    global STAMPS_NODE_TEMPLATES, Stamps_LastCreated
+    use_templates = STAMPS_NODE_TEMPLATES
+    last_created = Stamps_LastCreated
+    script = _usageScript()
+    usage = dict(usageLoad().get(script, {}))
+    selection = nuke.selectedNodes()
+    for i in selection:
+        i.setSelected(False)
+    results = {}
+    try:
+        for method, enabled in [("knobs", False), ("template", True)]:
+            STAMPS_NODE_TEMPLATES = enabled
+            if enabled:
+                # Compiling the templates is a one-off cost per session, kept out of the timing.
+                stampTemplate("anchor", "2D")
+                stampTemplate("wired", "2D")
+            created = []
+            start = time.time()
+            for i in range(count):
+                a = anchor(title="benchmark_{}".format(i))
+                a.setSelected(False)
+                created += [a, wired(a, place=False)]
+            results[method] = (time.time() - start) / max(len(created), 1)
+            for n in created:
+                nuke.delete(n)
+    finally:
+        STAMPS_NODE_TEMPLATES = use_templates
+        Stamps_LastCreated = last_created
+        if script:
+            usageLoad()[script] = usage
+        for i in selection:
+            i.setSelected(True)
+    nuke.tprint("Stamps creation benchmark, {} stamps per method: {}".format(2 * count, ", ".join(
+        "{} {:.2f} ms/stamp".format(method, results[method] * 1000) for method in ["knobs", "template"])))
+    return results
+
+
+#################################
+### CLASSES
+#################################
+
+class AnchorSelector(QtWidgets.QDialog):
+    """
+    Panel to select one or more anchors, displaying dropdowns grouped by tags and backdrops.
+
+    TODO:
+      - Display three columns similar to an asset loader (with optional border colours).
+      - Add the ability to show/hide backdrops (either by toggling their visibility or 'bookmarking').
+    """
+
+    def __init__(self):
+        super(AnchorSelector, self).__init__()
+        self.setWindowTitle("Stamps: Select an Anchor.")
+        self.chosen_anchors = []
+        self.initUI()
+        # Set focus on the custom anchors line edit.
+        self.custom_anchors_lineEdit.setFocus()
+
+    def initUI(self):
+        # Find all anchors and collect their tags/backdrops.
+        self.findAnchorsAndTags()  # Generates: {"Camera1": ["Camera", "New", "Custom1"], "Read": ["2D", "New"]}
+        self.custom_chosen = False  # Tracks whether the custom line edit OK was clicked.
+
+        # Header setup.
+        self.headerTitle = QtWidgets.QLabel("Anchor Stamp Selector")
         self.headerTitle.setStyleSheet("font-weight:bold;color:#CCCCCC;font-size:14px;")
         self.headerSubtitle = QtWidgets.QLabel(
             "Select an Anchor to make a Stamp for.<br/><b><small style='color:#CCC'>Right click on the OK buttons for multiple selection.</small></b>")
@@ -1279,24 +2142,11 @@ class AnchorSelector(QtWidgets.QDialog):
 
             anchors_dropdown = QtWidgets.QComboBox()
             anchors_dropdown.setMinimumWidth(200)
-            for i, cur_name in enumerate(self._all_anchors_names):
-                cur_title = self._all_anchors_titles[i]
-                title_repeated = self.titleRepeatedForTag(cur_title, tag, mode)
-                if mode == "tag":
-                    tag_dict = self._anchors_and_tags_tags
-                elif mode == "backdrop":
-                    tag_dict = self._anchors_and_tags_backdrops
+            for cur_name, cur_title in self._tag_members.get((mode, tag), []):
+                if self.titleRepeatedForTag(cur_title, tag, mode):
+                    anchors_dropdown.addItem("{0} ({1})".format(cur_title, cur_name), cur_name)
                 else:
-                    tag_dict = self._anchors_and_tags
-
-                if cur_name not in tag_dict:
-                    continue
-
-                if tag in tag_dict[cur_name]:
-                    if title_repeated:
-                        anchors_dropdown.addItem("{0} ({1})".format(cur_title, cur_name), cur_name)
-                    else:
-                        anchors_dropdown.addItem(cur_title, cur_name)
+                    anchors_dropdown.addItem(cur_title, cur_name)
 
             ok_btn = QtWidgets.QPushButton("OK")
             ok_btn.clicked.connect(partial(self.okPressed, dropdown=anchors_dropdown))
@@ -1316,9 +2166,12 @@ class AnchorSelector(QtWidgets.QDialog):
 
         all_tag_texts = []  # Display texts.
         all_tag_names = [i for i in self._all_anchors_names]  # Actual anchor names.
+        title_counts = {}
+        for cur_title in self._all_anchors_titles:
+            title_counts[cur_title] = title_counts.get(cur_title, 0) + 1
         for i, cur_name in enumerate(self._all_anchors_names):
             cur_title = self._all_anchors_titles[i]
-            title_repeated = self._all_anchors_titles.count(cur_title)
+            title_repeated = title_counts[cur_title]
             if title_repeated > 1:
                 all_tag_texts.append("{0} ({1})".format(cur_title, cur_name))
             else:
@@ -1343,21 +2196,27 @@ class AnchorSelector(QtWidgets.QDialog):
         popular_tag_label = QtWidgets.QLabel("<b>popular</b>: ")
         popular_tag_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
         self.popular_anchors_dropdown = QtWidgets.QComboBox()
-        all_tag_texts = []
-        all_tag_names = [i for i in self._all_anchors_names]
-        all_tag_count = [stampCount(i) for i in self._all_anchors_names]
+        # Rank by frecency (recent and frequent use), then by the current number of stamps.
+        registry = stampRegistry()
+        now = time.time()
+        usage_entries = usageLoad().get(_usageScript(), {})
+        all_tag_count = []
+        all_tag_score = []
+        for cur_name in self._all_anchors_names:
+            a = registry.anchors.get(cur_name)
+            all_tag_count.append(len(anchorWireds(a)) if a is not None else 0)
+            all_tag_score.append(usageScore(a, now, usage_entries) if a is not None else 0.0)
 
         popular_tag_texts = []
-        sorted_names_and_titles = [(x, y) for (_, x, y) in
-                                   sorted(list(zip(all_tag_count, self._all_anchors_names, self._all_anchors_titles)),
-                                          reverse=True)]
-        popular_anchors_names = [x for x, _ in sorted_names_and_titles]
-        popular_anchors_titles = [x for _, x in sorted_names_and_titles]
-        popular_anchors_count = sorted(all_tag_count, reverse=True)
+        popular_sorted = sorted(zip(all_tag_score, all_tag_count, self._all_anchors_names, self._all_anchors_titles),
+                                key=lambda i: (i[0], i[1]), reverse=True)
+        popular_anchors_names = [x for (_, _, x, _) in popular_sorted]
+        popular_anchors_titles = [x for (_, _, _, x) in popular_sorted]
+        popular_anchors_count = [x for (_, x, _, _) in popular_sorted]
 
         for i, cur_name in enumerate(popular_anchors_names):
             cur_title = popular_anchors_titles[i]
-            title_repeated = popular_anchors_titles.count(cur_title)
+            title_repeated = title_counts[cur_title]
             if title_repeated > 1:
                 popular_tag_texts.append("{0} ({1}) (x{2})".format(cur_title, cur_name, str(popular_anchors_count[i])))
             else:
@@ -1447,12 +2306,12 @@ class AnchorSelector(QtWidgets.QDialog):
         self._anchors_and_tags_tags = {}  # {anchor name: set(tags)}
         self._anchors_and_tags_backdrops = {}  # {anchor name: set(backdrop tags)}
 
-        for ni in allAnchors():
+        registry = stampRegistry()
+        for ni in registry.allAnchors():
             try:
                 title_value = ni["title"].value().strip()
                 name_value = ni.name()
-                tags_value = ni["tags"].value()
-                tags = re.split(" *, *", tags_value.strip())
+                tags = registry.anchorTags(name_value)
                 backdrop_tags = backdropTags(ni)
                 for t in backdrop_tags:
                     self._backdrop_item_count[t] = self._backdrop_item_count.get(t, 0) + 1
@@ -1476,6 +2335,18 @@ class AnchorSelector(QtWidgets.QDialog):
         titles_and_names.sort(key=lambda tup: tup[0].upper())
         self._all_anchors_titles = [x for x, y in titles_and_names]
         self._all_anchors_names = [y for x, y in titles_and_names]
+
+        # Members of each tag/backdrop dropdown, sorted by title, plus their title counts.
+        self._tag_members = {}  # {(mode, tag): [(anchor name, title)]}
+        self._tag_title_count = {}  # {(mode, tag): {title: count}}
+        for cur_title, cur_name in titles_and_names:
+            for mode, tag_dict in (("tag", self._anchors_and_tags_tags),
+                                   ("backdrop", self._anchors_and_tags_backdrops),
+                                   ("", self._anchors_and_tags)):
+                for tag in tag_dict.get(cur_name, ()):
+                    self._tag_members.setdefault((mode, tag), []).append((cur_name, cur_title))
+                    title_count = self._tag_title_count.setdefault((mode, tag), {})
+                    title_count[cur_title] = title_count.get(cur_title, 0) + 1
         return self._anchors_and_tags
 
     def titleRepeatedForTag(self, title, tag, mode=""):
@@ -1490,25 +2361,7 @@ class AnchorSelector(QtWidgets.QDialog):
         Returns:
             bool: True if the title appears more than once within anchors that have the tag; False otherwise.
         """
-        if self._all_anchors_titles.count(title) <= 1:
-            return False
-
-        names_with_tag = []
-        titles_with_tag = []
-        for i, name in enumerate(self._all_anchors_names):
-            if mode == "tag":
-                if tag in self._anchors_and_tags_tags.get(name, set()):
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
-            elif mode == "backdrop":
-                if tag in self._anchors_and_tags_backdrops.get(name, set()):
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
-            else:
-                if tag in self._anchors_and_tags.get(name, set()):
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
-        return titles_with_tag.count(title) > 1
+        return self._tag_title_count.get((mode, tag), {}).get(title, 0) > 1
 
     def okPressed(self, dropdown, close=True):
         """
@@ -1531,6 +2384,7 @@ class AnchorSelector(QtWidgets.QDialog):
         self.chosen_anchor_name = dropdown_data
         if match_anchor is not None:
             self.chosen_anchors.append(match_anchor)
+            usageRecord(match_anchor, weight=0.5)
             if close:
                 self.accept()
         else:
@@ -1571,6 +2425,7 @@ class AnchorSelector(QtWidgets.QDialog):
         self.chosen_anchor_name = found_data
         if match_anchor is not None:
             self.chosen_anchors.append(match_anchor)
+            usageRecord(match_anchor, weight=0.5)
             if close:
                 self.accept()
         else:
@@ -1619,7 +2474,9 @@ class TagsCompleter(QtWidgets.QCompleter):
     """
     insertText = QtCore.Signal(str)
 
-    def __init__(self, all_tags):
+    def __init__(self, all_tags=None):
+        if all_tags is None:
+            all_tags = allTags()
         super(TagsCompleter, self).__init__(all_tags)
         self.all_tags = set(all_tags)
         self.activated.connect(self.activated_text)
@@ -1788,6 +2645,146 @@ class AddTagsPanel(QtWidgets.QDialog):
         self.reject()
 
 
+class BulkAnchorPanel(QtWidgets.QDialog):
+    """
+    Panel to review and edit the titles and tags of the Anchors to create for many nodes at once.
+    """
+
+    def __init__(self, rows, parent=None):
+        super(BulkAnchorPanel, self).__init__(parent)
+        self.rows = rows
+        self.setWindowTitle("Stamps: New Stamps")
+        self.initUI()
+        self.resize(640, 420)
+
+    def initUI(self):
+        self.createWidgets()
+        self.createLayouts()
+
+    def createWidgets(self):
+        self.bulkTitle = QtWidgets.QLabel("New Stamps")
+        self.bulkTitle.setStyleSheet("font-weight:bold;color:#CCCCCC;font-size:14px;")
+        self.bulkSubtitle = QtWidgets.QLabel("Edit the title and tags (comma separated) of each new Anchor.")
+        self.bulkSubtitle.setStyleSheet("color:#999")
+        headers = ["Node", "Title", "Tags"]
+        self.bulkTable = QtWidgets.QTableWidget(len(self.rows), len(headers))
+        self.bulkTable.setHorizontalHeaderLabels(headers)
+        self.bulkTable.verticalHeader().setVisible(False)
+        for i, row in enumerate(self.rows):
+            node_item = QtWidgets.QTableWidgetItem(row["node"].name())
+            node_item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable)
+            node_item.setCheckState(QtCore.Qt.Checked if row["create"] else QtCore.Qt.Unchecked)
+            node_item.setToolTip("Uncheck to skip this node.")
+            self.bulkTable.setItem(i, 0, node_item)
+            self.bulkTable.setItem(i, 1, QtWidgets.QTableWidgetItem(row["title"]))
+            self.bulkTable.setItem(i, 2, QtWidgets.QTableWidgetItem(row["tags"]))
+        self.bulkTable.resizeColumnsToContents()
+        self.bulkTable.horizontalHeader().setStretchLastSection(True)
+        self.buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        self.buttonBox.accepted.connect(self.clickedOk)
+        self.buttonBox.rejected.connect(self.clickedCancel)
+
+    def createLayouts(self):
+        self.master_layout = QtWidgets.QVBoxLayout()
+        self.master_layout.addWidget(self.bulkTitle)
+        self.master_layout.addWidget(self.bulkSubtitle)
+        self.master_layout.addWidget(self.bulkTable)
+        self.master_layout.addWidget(self.buttonBox)
+        self.setLayout(self.master_layout)
+
+    def clickedOk(self):
+        """Store the edited titles and tags."""
+        for i, row in enumerate(self.rows):
+            row["create"] = self.bulkTable.item(i, 0).checkState() == QtCore.Qt.Checked
+            row["title"] = self.bulkTable.item(i, 1).text().strip()
+            row["tags"] = self.bulkTable.item(i, 2).text().strip()
+        self.accept()
+        return True
+
+    def clickedCancel(self):
+        """Abort the creation."""
+        self.reject()
+
+
+class ReconnectPlanPanel(QtWidgets.QDialog):
+    """
+    Panel to review the changes of a reconnection plan before applying them, or export them as JSON.
+    """
+
+    def __init__(self, plan, parent=None):
+        super(ReconnectPlanPanel, self).__init__(parent)
+        self.plan = plan
+        self.setWindowTitle("Stamps: Reconnect Stamps")
+        self.initUI()
+        self.resize(760, 420)
+
+    def initUI(self):
+        self.createWidgets()
+        self.createLayouts()
+
+    def createWidgets(self):
+        cost = reconnectPlanCost(self.plan)
+        self.planTitle = QtWidgets.QLabel("Reconnect Stamps")
+        self.planTitle.setStyleSheet("font-weight:bold;color:#CCCCCC;font-size:14px;")
+        self.planSubtitle = QtWidgets.QLabel(
+            "{changes} change/s: {reconnects} reconnection/s, {relinks} link or style update/s, "
+            "{failures} Stamp/s that can't be reconnected.".format(**cost))
+        self.planSubtitle.setStyleSheet("color:#999")
+        headers = ["Stamp", "Current input", "Target Anchor", "Strategy", "Reason"]
+        self.planTable = QtWidgets.QTableWidget(len(self.plan), len(headers))
+        self.planTable.setHorizontalHeaderLabels(headers)
+        self.planTable.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.planTable.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.planTable.verticalHeader().setVisible(False)
+        for row, change in enumerate(self.plan):
+            values = [change["wired"].name(),
+                      change["current"].name() if change["current"] is not None else "",
+                      "{} ({})".format(change["target"]["title"].value(), change["target"].name())
+                      if change["target"] is not None else "",
+                      change["strategy"], change["reason"]]
+            for column, value in enumerate(values):
+                self.planTable.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+        self.planTable.setSortingEnabled(True)
+        self.planTable.resizeColumnsToContents()
+        self.planTable.horizontalHeader().setStretchLastSection(True)
+        self.exportButton = QtWidgets.QPushButton("Export JSON...")
+        self.exportButton.clicked.connect(self.clickedExport)
+        self.buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Apply | QtWidgets.QDialogButtonBox.Cancel)
+        self.buttonBox.button(QtWidgets.QDialogButtonBox.Apply).clicked.connect(self.clickedApply)
+        self.buttonBox.rejected.connect(self.clickedCancel)
+
+    def createLayouts(self):
+        buttons_layout = QtWidgets.QHBoxLayout()
+        buttons_layout.addWidget(self.exportButton)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.buttonBox)
+        self.master_layout = QtWidgets.QVBoxLayout()
+        self.master_layout.addWidget(self.planTitle)
+        self.master_layout.addWidget(self.planSubtitle)
+        self.master_layout.addWidget(self.planTable)
+        self.master_layout.addLayout(buttons_layout)
+        self.setLayout(self.master_layout)
+
+    def clickedExport(self):
+        """Save the plan as a JSON file."""
+        path = QtWidgets.QFileDialog.getSaveFileName(self, "Export reconnection plan", "", "JSON (*.json)")[0]
+        if not path:
+            return
+        try:
+            with open(path, "w") as f:
+                f.write(reconnectPlanToJson(self.plan))
+        except Exception as e:
+            nuke.message("Couldn't export the plan:\n{}".format(e))
+
+    def clickedApply(self):
+        """Accept the plan."""
+        self.accept()
+
+    def clickedCancel(self):
+        """Abort the reconnection."""
+        self.reject()
+
+
 class RenameTagPanel(QtWidgets.QDialog):
     """
     Panel to rename a tag on selected (or all) nodes.
@@ -1872,129 +2869,2035 @@ class RenameTagPanel(QtWidgets.QDialog):
 
 
 #################################
-### FUNCTIONS
+### NODE CLASSIFICATION
 #################################
 
-def getDefaultTitle(node=None):
+def _stampRole(node):
     """
-    Determine the default title for a node based on its class and properties.
-
-    For a Camera node, if no NoOp exists with title 'cam', returns 'cam'.
-    For a Dot or NoOp node with a non-empty label, returns the label.
-    For Read nodes, attempts to extract a filename-derived title.
+    Read the stamp role of a node from its knobs.
 
     Args:
-        node (nuke.Node): The node for which to generate a default title.
+        node (nuke.Node): The node to check.
 
     Returns:
-        str or bool: The default title as a string, or False if node is None.
+        str or None: "anchor", "wired", or None if the node isn't a stamp.
     """
-    if node is None:
-        return False
-    title = str(node.name())
-
-    # Handle Camera nodes.
-    if "Camera" in node.Class():
-        try:
-            if not any(i.knob("title") and i["title"].value() == "cam" for i in nuke.allNodes("NoOp")):
-                return "cam"
-        except Exception:
-            pass
-
-    # Handle Dot/NoOp nodes with a label.
-    if node.Class() in ["Dot", "NoOp"]:
-        try:
-            label = node["label"].value().strip()
-            if label != "":
-                return label
-        except Exception:
-            pass
-
-    # Handle Read nodes by extracting a filename-based title.
     try:
-        file = node['file'].value()
-        if not (node.knob("read_from_file") and not node["read_from_file"].value()):
-            if file != "":
-                rawname = file.rpartition('/')[2].rpartition('.')[0]
-                if '.' in rawname:
-                    rawname = rawname.rpartition('.')[0]
-                # Option 1: Match a beauty pass pattern.
-                m = re.match(r"([\w]+)_v[\d]+_beauty", rawname)
-                if m:
-                    pre_version = m.groups()[0]
-                    title = "_".join(pre_version.split("_")[3:])
-                    return title
-                # Option 2: Generic extraction.
-                rawname = str(re.split("_v[0-9]*_", rawname)[-1]).replace("_render", "")
-                title = rawname
+        if not node.knob("title"):
+            return None
+        identifier = node.knob("identifier")
+        if not identifier:
+            return None
+        role = identifier.value()
     except Exception:
-        pass
-
-    return title
+        return None
+    return role if role in ["anchor", "wired"] else None
 
 
-def backdropTags(node=None):
+def stampRole(node):
     """
-    Extract a list of cleaned label tags from the backdrop nodes that contain the given node.
+    Return the stamp role of a node, memoized per node while the global callbacks keep the memo current.
 
     Args:
-        node (nuke.Node): The node for which to find associated backdrops.
+        node (nuke.Node): The node to check.
 
     Returns:
-        list: A list of tag strings derived from the labels of matching BackdropNodes.
+        str or None: "anchor", "wired", or None if the node isn't a stamp.
     """
-    backdrops = findBackdrops(node)
-    tags = []
-    for b in backdrops:
-        try:
-            # Check custom visibility if available.
-            if b.knob("visible_for_stamps"):
-                if not b["visible_for_stamps"].value():
-                    continue
-            elif not b["bookmark"].value():
-                continue
-            label = b["label"].value()
-            if label and len(label) < 50 and not label.startswith("\\"):
-                # Process the label: remove newlines, HTML tags, extra spaces, and trailing periods.
-                label = label.split("\n")[0].strip()
-                label = re.sub("<[^<>]*>", "", label)
-                label = re.sub("[\s]+", " ", label)
-                label = re.sub("\.$", "", label)
-                tags.append(label)
-        except Exception:
-            continue
-    return tags
+    if not STAMPS_CLASSIFICATION_CACHE or not Stamps_CallbacksLoaded:
+        return _stampRole(node)
+    try:
+        return Stamps_RoleCache[node]
+    except KeyError:
+        role = Stamps_RoleCache[node] = _stampRole(node)
+        return role
+    except Exception:  # Not hashable, or no longer attached to a node.
+        return _stampRole(node)
 
 
-def stampCreateAnchor(node=None, extra_tags=[], no_default_tag=False):
+def forgetStampRole(node):
     """
-    Create a new Anchor Stamp based on a given node, optionally appending extra tags.
+    Drop the memoized stamp role of a node, i.e. when its identifier knob is added or changed.
 
     Args:
-        node (nuke.Node): The node from which to derive the stamp.
-        extra_tags (list): Additional tags to be merged with default tags.
-        no_default_tag (bool): If True, override default tags completely.
-
-    Returns:
-        list or None: A list of extra tags (if creation succeeded) or None if cancelled.
+        node (nuke.Node): The node.
+    """
+    try:
+        Stamps_RoleCache.pop(node, None)
+    except Exception:
+        pass
+
+
+def clearClassificationCache():
+    """Forget every memoized node type and stamp role."""
+    Stamps_NodeTypeCache.clear()
+    Stamps_RoleCache.clear()
+
+
+def _nodeType(n, nodeClass):
+    """
+    Determine the node type from the node class and, for 3D nodes, from the node's knobs.
+
+    Args:
+        n (nuke.Node): The node to check.
+        nodeClass (str): Its class.
+
+    Returns:
+        str or bool: The node type or False if not determinable.
+    """
+    if nodeClass.startswith("Deep") and nodeClass not in DeepExceptionClasses:
+        return "Deep"
+    elif nodeClass.startswith("Particle") and nodeClass not in ParticleExceptionClasses:
+        return "Particle"
+    elif nodeClass.startswith("ScanlineRender"):
+        return False
+    elif nodeClass in ["Camera", "Camera2", "Camera3"]:
+        return "Camera"
+    elif nodeClass in ["Axis", "Axis2", "Axis3"]:
+        return "Axis"
+    elif (n.knob("render_mode") and n.knob("display")) or nodeClass in ["GeoNoOp", "EditGeo"]:
+        return "3D"
+    else:
+        return "2D"
+
+
+#################################
+### STAMP REGISTRY
+#################################
+
+class StampRegistry(object):
+    """
+    In-memory index of the Anchors and Wired stamps of one node graph context (root or a Group).
+
+    It is kept current by the stamp onCreate/knobChanged callbacks plus a global onDestroy hook,
+    and rebuilt lazily with a single scan of the context whenever it is found to be stale.
+    Without those callbacks (i.e. in terminal sessions) it's only trusted within a batch, see ensure.
+    """
+
+    def __init__(self, group=None):
+        self.group = group
+        self.stale = True
+        self.anchors = {}  # {anchor name: anchor node}
+        self.anchor_title = {}  # {anchor name: title}
+        self.anchor_id = {}  # {anchor name: anchor id}
+        self.ids = {}  # {anchor id: anchor name}, the first Anchor found with each id
+        self.id_names = {}  # {anchor id: {anchor name: None}}, insertion ordered, to find copies sharing an id
+        self.titles = {}  # {title: {anchor name: None}}, insertion ordered
+        self.anchor_tags = {}  # {anchor name: list of tags, as split from the tags knob}
+        self.tags = {}  # {tag: {anchor name: None}}, insertion ordered
+        self.wireds = {}  # {wired name: wired node}
+        self.wired_names = {}  # {wired node: wired name}, to re-key renamed Wired stamps
+        self.wired_key = {}  # {wired name: link key}, see wiredLinkKey
+        self.children = {}  # {link key: {wired name: None}}, insertion ordered
+        self.backdrop_index = None  # BackdropIndex, built on demand
+        self.name_counters = {}  # {name prefix: highest numeric suffix in use or handed out}
+        self.name_pool = {}  # {name prefix: [free suffixes up to its counter, lowest first]}, handed out first
+
+    def invalidate(self):
+        """Mark the registry as stale, so the next query rebuilds it."""
+        self.stale = True
+        self.backdrop_index = None
+        self.name_counters = {}
+        self.name_pool = {}
+
+    def rebuild(self):
+        """Scan the whole context once and rebuild every index."""
+        self.anchors = {}
+        self.anchor_title = {}
+        self.anchor_id = {}
+        self.ids = {}
+        self.id_names = {}
+        self.titles = {}
+        self.anchor_tags = {}
+        self.tags = {}
+        self.wireds = {}
+        self.wired_names = {}
+        self.wired_key = {}
+        self.children = {}
+        try:
+            nodes = self.group.nodes()
+        except Exception:
+            nodes = nuke.allNodes()
+        for n in nodes:
+            role = stampRole(n)
+            if role == "anchor":
+                self.addAnchor(n)
+            elif role == "wired":
+                self.addWired(n)
+        self.stale = False
+
+    def current(self):
+        """
+        Return True if the indexes can be used as they are.
+        Without the global callbacks (i.e. in terminal sessions) nothing keeps them current, so they're only
+        trusted within a batch, which marks every registry as stale when it starts. See StampBatch.
+        """
+        return not self.stale and (Stamps_CallbacksLoaded or Stamps_Batch is not None)
+
+    def ensure(self):
+        """
+        Rebuild the registry unless it's current.
+        """
+        if not self.current():
+            self.rebuild()
+
+    def backdrops(self):
+        """
+        Return the BackdropIndex of this context, building it if needed.
+        """
+        if self.backdrop_index is None or not self.current():
+            try:
+                nodes = nuke.allNodes("BackdropNode", self.group)
+            except Exception:
+                nodes = nuke.allNodes("BackdropNode")
+            self.backdrop_index = BackdropIndex(nodes)
+        return self.backdrop_index
+
+    def addAnchor(self, n):
+        name = n.name()
+        try:
+            title = n["title"].value()
+        except Exception:
+            title = ""
+        try:
+            tags = re.split(" *, *", n["tags"].value().strip())
+        except Exception:
+            tags = []
+        self.untitleAnchor(name)
+        self.untagAnchor(name)
+        self.unidAnchor(name)
+        a_id = anchorId(n)
+        if a_id:
+            self.anchor_id[name] = a_id
+            self.ids.setdefault(a_id, name)
+            self.id_names.setdefault(a_id, {})[name] = None
+        self.anchors[name] = n
+        self.anchor_title[name] = title
+        self.titles.setdefault(title, {})[name] = None
+        self.anchor_tags[name] = tags
+        for tag in tags:
+            if tag:
+                self.tags.setdefault(tag, {})[name] = None
+
+    def unidAnchor(self, name):
+        a_id = self.anchor_id.pop(name, None)
+        if a_id is None:
+            return
+        homonyms = self.id_names.get(a_id, {})
+        homonyms.pop(name, None)
+        if self.ids.get(a_id) == name:
+            del self.ids[a_id]
+            for other in homonyms:
+                self.ids[a_id] = other
+                break
+        if not homonyms:
+            self.id_names.pop(a_id, None)
+
+    def untagAnchor(self, name):
+        for tag in self.anchor_tags.pop(name, ()):
+            tagged = self.tags.get(tag)
+            if tagged is not None:
+                tagged.pop(name, None)
+                if not tagged:
+                    del self.tags[tag]
+
+    def untitleAnchor(self, name):
+        old_title = self.anchor_title.pop(name, None)
+        if old_title is not None:
+            homonyms = self.titles.get(old_title)
+            if homonyms is not None:
+                homonyms.pop(name, None)
+                if not homonyms:
+                    del self.titles[old_title]
+
+    def addWired(self, n):
+        name = n.name()
+        try:
+            key = wiredLinkKey(n)
+        except Exception:
+            key = ""
+        self.unlinkWired(name)
+        self.wireds[name] = n
+        self.wired_names[n] = name
+        self.wired_key[name] = key
+        self.children.setdefault(key, {})[name] = None
+
+    def unlinkWired(self, name):
+        old_key = self.wired_key.pop(name, None)
+        if old_key is not None:
+            siblings = self.children.get(old_key)
+            if siblings is not None:
+                siblings.pop(name, None)
+                if not siblings:
+                    del self.children[old_key]
+
+    def remove(self, name):
+        """Forget the node with the given name, whichever its role."""
+        if self.anchors.pop(name, None) is not None:
+            self.untitleAnchor(name)
+            self.untagAnchor(name)
+            self.unidAnchor(name)
+        n = self.wireds.pop(name, None)
+        if n is not None:
+            if self.wired_names.get(n) == name:
+                del self.wired_names[n]
+            self.unlinkWired(name)
+
+    def renameAnchor(self, old_name, n):
+        if old_name != n.name():
+            self.remove(old_name)
+        self.addAnchor(n)
+
+    def renameWired(self, n):
+        """Re-key a Wired stamp under its new name."""
+        old_name = self.wired_names.get(n)
+        if old_name is not None and old_name != n.name():
+            self.remove(old_name)
+        self.addWired(n)
+
+    def _valid(self, name, n, role):
+        try:
+            return n.name() == name and stampType(n) == role
+        except Exception:
+            return False
+
+    def allAnchors(self):
+        return self._all("anchor")
+
+    def allWireds(self):
+        return self._all("wired")
+
+    def _all(self, role):
+        """
+        Return every indexed node of a role. With the global callbacks, which keep the entries current
+        (onDestroy removes them, the name knobChanged re-keys them), they're returned without reading any knob.
+        Otherwise, within a batch, each entry is checked, and the registry rebuilt if any is out of date.
+        """
+        if not self.current():
+            self.rebuild()
+        elif not Stamps_CallbacksLoaded:
+            nodes = self.anchors if role == "anchor" else self.wireds
+            if not all(self._valid(name, n, role) for name, n in nodes.items()):
+                self.rebuild()
+        return list((self.anchors if role == "anchor" else self.wireds).values())
+
+    def wiredsOf(self, key):
+        """
+        Return the Wired stamps whose link key (stored anchor id, or anchor name if they have no id) is key.
+
+        Args:
+            key (str): The link key.
+
+        Returns:
+            list: Wired nodes.
+        """
+        self.ensure()
+        wireds = self._children(key)
+        if wireds is None:
+            self.rebuild()
+            wireds = self._children(key) or []
+        return wireds
+
+    def syncNameCounter(self, prefix):
+        """
+        Scan the context once to find the highest numeric suffix in use after the given name prefix.
+        """
+        pattern = re.compile(re.escape(prefix) + "([0-9]+)$")
+        highest = 0
+        try:
+            nodes = self.group.nodes()
+        except Exception:
+            nodes = nuke.allNodes()
+        for n in nodes:
+            m = pattern.match(n.name())
+            if m:
+                highest = max(highest, int(m.group(1)))
+        self.name_counters[prefix] = highest
+
+    def allocateNames(self, prefix, count=1):
+        """
+        Return count new node names made of the prefix and free numeric suffixes: the ones freed
+        since the counter was synced first, lowest first, and then the ones after the counter.
+
+        Args:
+            prefix (str): The base name.
+            count (int): How many names to allocate.
+
+        Returns:
+            list: The names, which are also marked as handed out.
+        """
+        if prefix not in self.name_counters:
+            self.syncNameCounter(prefix)
+        names = []
+        pool = self.name_pool.get(prefix, [])
+        while pool and len(names) < count:
+            name = prefix + str(pool.pop(0))
+            if not self.exists(name):
+                names.append(name)
+        i = self.name_counters[prefix]
+        while len(names) < count:
+            i += 1
+            name = prefix + str(i)
+            if not self.exists(name):
+                names.append(name)
+        self.name_counters[prefix] = i
+        return names
+
+    def freeName(self, name):
+        """
+        Make the numeric suffix of a name available again, i.e. once its node is deleted or a reserved name isn't used.
+        Only names whose prefix is being allocated, and below its counter, are kept.
+
+        Args:
+            name (str): The node name.
+        """
+        m = re.match(r"^(.*?)([1-9][0-9]*)$", name)
+        if not m or m.group(1) not in self.name_counters:
+            return
+        i = int(m.group(2))
+        pool = self.name_pool.setdefault(m.group(1), [])
+        if i <= self.name_counters[m.group(1)] and i not in pool:
+            bisect.insort(pool, i)
+
+    def trimNames(self, prefix):
+        """
+        Lower the counter of a prefix past the free suffixes at the top of its pool, so they're handed out again
+        as the next ones instead of the counter growing further.
+        """
+        pool = self.name_pool.get(prefix)
+        while pool and pool[-1] == self.name_counters.get(prefix):
+            pool.pop()
+            self.name_counters[prefix] -= 1
+
+    def exists(self, name):
+        """Check whether a node with the given name exists in this context."""
+        try:
+            return self.group.node(name) is not None
+        except Exception:
+            return nuke.exists(name)
+
+    def anchorById(self, a_id):
+        """
+        Return the Anchor with the given persistent id, or None.
+
+        Args:
+            a_id (str): The anchor id.
+
+        Returns:
+            nuke.Node or None: The Anchor.
+        """
+        self.ensure()
+        for _ in range(2):
+            name = self.ids.get(a_id)
+            if name is None:
+                return None
+            n = self.anchors.get(name)
+            if self._valid(name, n, "anchor") and anchorId(n) == a_id:
+                return n
+            self.rebuild()
+        return None
+
+    def anchorsWithId(self, a_id):
+        """
+        Return every Anchor that has the given persistent id, in the order they were found.
+        There should be one at most, but copies of an Anchor share its id until they get their own.
+
+        Args:
+            a_id (str): The anchor id.
+
+        Returns:
+            list: Anchor nodes.
+        """
+        self.ensure()
+        for _ in range(2):
+            anchors = []
+            for name in self.id_names.get(a_id, ()):
+                n = self.anchors.get(name)
+                if not self._valid(name, n, "anchor") or anchorId(n) != a_id:
+                    break
+                anchors.append(n)
+            else:
+                return anchors
+            self.rebuild()
+        return anchors
+
+    def anchorsByTitle(self, title):
+        """
+        Return the Anchors whose title is exactly the given one.
+
+        Args:
+            title (str): The title to look up.
+
+        Returns:
+            list: Anchor nodes.
+        """
+        self.ensure()
+        anchors = self._homonyms(title)
+        if anchors is None:
+            self.rebuild()
+            anchors = self._homonyms(title) or []
+        return anchors
+
+    def allTags(self):
+        """
+        Return a sorted list of the non-empty tags used by any Anchor.
+        """
+        self.allAnchors()
+        return sorted(self.tags, key=str.lower)
+
+    def tagCounts(self):
+        """
+        Return the number of Anchors using each tag, as {tag: count}.
+        """
+        self.allAnchors()
+        return dict((tag, len(tagged)) for tag, tagged in self.tags.items())
+
+    def anchorTags(self, name):
+        """
+        Return the list of tags of the Anchor with the given name, as split from its tags knob.
+        """
+        self.ensure()
+        return list(self.anchor_tags.get(name, []))
+
+    def anchorsWithTag(self, tag):
+        """
+        Return the Anchors that use the given tag.
+        """
+        self.allAnchors()
+        return [self.anchors[name] for name in self.tags.get(tag, ())]
+
+    def _homonyms(self, title):
+        anchors = []
+        for name in self.titles.get(title, ()):
+            n = self.anchors.get(name)
+            try:
+                if not self._valid(name, n, "anchor") or n["title"].value() != title:
+                    return None
+            except Exception:
+                return None
+            anchors.append(n)
+        return anchors
+
+    def _children(self, key):
+        wireds = []
+        for name in self.children.get(key, ()):
+            n = self.wireds.get(name)
+            try:
+                if not self._valid(name, n, "wired") or wiredLinkKey(n) != key:
+                    return None
+            except Exception:
+                return None
+            wireds.append(n)
+        return wireds
+
+
+class BackdropIndex(object):
+    """
+    Spatial index over the rectangles of the BackdropNodes of a context.
+
+    Backdrops are bucketed in a grid of fixed-size cells, so a containment query only tests
+    the few backdrops that overlap the cell of the queried node instead of every backdrop.
+    """
+    cell_size = 512
+
+    def __init__(self, backdrops=[]):
+        self.cells = {}  # {(cell x, cell y): [(left, top, right, bottom, backdrop, label tag)]}
+        cs = self.cell_size
+        for b in backdrops:
+            try:
+                bx = int(b['xpos'].value())
+                by = int(b['ypos'].value())
+                br = int(b['bdwidth'].value()) + bx
+                bt = int(b['bdheight'].value()) + by
+            except Exception:
+                continue
+            entry = (bx, by, br, bt, b, backdropLabelTag(b))
+            for cx in range(bx // cs, br // cs + 1):
+                for cy in range(by // cs, bt // cs + 1):
+                    self.cells.setdefault((cx, cy), []).append(entry)
+
+    def entries(self, node):
+        """
+        Return the index entries of the backdrops that fully contain the given node.
+        """
+        x = node.xpos()
+        y = node.ypos()
+        w = node.screenWidth()
+        h = node.screenHeight()
+        cell = self.cells.get((x // self.cell_size, y // self.cell_size), [])
+        return [e for e in cell if x >= e[0] and (x + w) <= e[2] and y > e[1] and (y + h) <= e[3]]
+
+
+class NodeGrid(object):
+    """
+    Spatial hash of the rectangles taken by nodes in the Node Graph, to find free room for new nodes.
+    """
+
+    CELL = 256
+
+    def __init__(self, nodes=[], margin=10):
+        """
+        Args:
+            nodes (list): Nodes whose rectangles are taken. BackdropNodes are ignored.
+            margin (int): Space to keep around every rectangle.
+        """
+        self.cells = {}  # {(cx, cy): [(left, top, right, bottom)]}
+        self.margin = margin
+        for n in nodes:
+            try:
+                if n.Class() != "BackdropNode":
+                    self.add(n.xpos(), n.ypos(), n.screenWidth(), n.screenHeight())
+            except Exception:
+                pass
+
+    def _cells(self, left, top, right, bottom):
+        for cx in range(int(left // self.CELL), int(right // self.CELL) + 1):
+            for cy in range(int(top // self.CELL), int(bottom // self.CELL) + 1):
+                yield cx, cy
+
+    def add(self, x, y, w, h):
+        """Mark a rectangle as taken."""
+        rect = (x - self.margin, y - self.margin, x + w + self.margin, y + h + self.margin)
+        for cell in self._cells(*rect):
+            self.cells.setdefault(cell, []).append(rect)
+
+    def free(self, x, y, w, h):
+        """Check whether a rectangle doesn't overlap any taken one."""
+        for cell in self._cells(x, y, x + w, y + h):
+            for left, top, right, bottom in self.cells.get(cell, ()):
+                if x < right and x + w > left and y < bottom and y + h > top:
+                    return False
+        return True
+
+    def place(self, x, y, w, h, step_x, step_y, columns):
+        """
+        Find the first free spot for a rectangle, trying rows of positions from (x, y), and mark it as taken.
+
+        Args:
+            x, y (int): First position to try.
+            w, h (int): Size of the rectangle.
+            step_x, step_y (int): Distance between consecutive positions and rows.
+            columns (int): Positions per row.
+
+        Returns:
+            tuple: (x, y) of the free spot.
+        """
+        i = 0
+        while True:
+            px = x + (i % columns) * step_x
+            py = y + (i // columns) * step_y
+            if self.free(px, py, w, h):
+                self.add(px, py, w, h)
+                return px, py
+            i += 1
+
+
+def backdropKnobChanged():
+    """
+    Global knobChanged callback for BackdropNodes: drops the backdrop index when a backdrop is moved,
+    resized or relabelled, so it gets rebuilt on the next query.
+    """
+    if nuke.thisKnob().name() in ["xpos", "ypos", "bdwidth", "bdheight", "label", "bookmark", "visible_for_stamps"]:
+        backdropsChanged()
+
+
+def backdropsChanged():
+    """
+    Global onCreate/onDestroy callback for BackdropNodes: drops the backdrop index of their context.
+    """
+    try:
+        stampRegistry(nuke.thisNode()).backdrop_index = None
+    except Exception:
+        pass
+    tagsChanged()
+
+
+def _registryContext(node=None):
+    try:
+        return node.parent() if node is not None else nuke.thisGroup()
+    except Exception:
+        return nuke.root()
+
+
+def stampRegistry(node=None):
+    """
+    Return the StampRegistry for the context of the given node, or for the current context.
+
+    Args:
+        node (nuke.Node): Optional node whose parent context should be used.
+
+    Returns:
+        StampRegistry: The registry for that context.
+    """
+    group = _registryContext(node)
+    try:
+        key = group.fullName()
+    except Exception:
+        key = "root"
+    registry = Stamps_Registries.get(key)
+    if registry is None:
+        registry = Stamps_Registries[key] = StampRegistry(group)
+    return registry
+
+
+def invalidateRegistries():
+    """Mark every StampRegistry as stale, and forget the memoized stamp roles."""
+    for registry in Stamps_Registries.values():
+        registry.invalidate()
+    clearClassificationCache()
+    tagsChanged()
+
+
+def registerStamp(n):
+    """
+    Add an Anchor or Wired stamp to its registry, unless the registry is due for a rebuild anyway.
+
+    Args:
+        n (nuke.Node): The stamp node.
+    """
+    forgetStampRole(n)  # Its knobs may have just been added.
+    registry = stampRegistry(n)
+    if registry.stale:
+        return
+    role = stampType(n)
+    if role == "anchor":
+        registry.addAnchor(n)
+    elif role == "wired":
+        registry.addWired(n)
+
+
+def newAnchorId():
+    """
+    Return a new unique id for an Anchor.
+    """
+    return uuid.uuid4().hex
+
+
+def anchorId(anchor):
+    """
+    Return the persistent unique id of an Anchor, stored on its hidden anchor_id knob.
+
+    Args:
+        anchor (nuke.Node): The Anchor.
+
+    Returns:
+        str: The id, or "" if the Anchor was created before ids existed and hasn't been upgraded yet.
+    """
+    k = anchor.knob("anchor_id")
+    if k is not None:
+        return k.value()
+    return ""
+
+
+def giveAnchorId(anchor):
+    """
+    Give an Anchor a new persistent id: Anchors created before ids existed, and copies of an Anchor.
+
+    The Wired stamps that referenced the Anchor by its name, or by its former id along with its name,
+    are linked to the new id.
+
+    Args:
+        anchor (nuke.Node): The Anchor.
+
+    Returns:
+        str: The new id.
+    """
+    registry = stampRegistry(anchor)
+    old_id = anchorId(anchor)
+    name = anchor.name()
+    children = [w for w in registry.wiredsOf(name)]
+    if old_id:
+        children += [w for w in registry.wiredsOf(old_id) if w["anchor"].value() == name]
+    k = anchor.knob("anchor_id")
+    if k is None:
+        k = nuke.Text_Knob('anchor_id', '', "")
+        k.setVisible(False)
+        anchor.addKnob(k)
+    k.setValue(newAnchorId())
+    registerStamp(anchor)
+    for w in children:
+        wiredSetAnchor(w, anchor)
+    return k.value()
+
+
+def checkAnchorId(anchor, keep_first=False):
+    """
+    Make sure an Anchor has a persistent id of its own, giving it a new one if it has none yet
+    or if another Anchor in its context has the same one.
+
+    Args:
+        anchor (nuke.Node): The Anchor.
+        keep_first (bool): If True, the first Anchor found with a shared id keeps it (i.e. on script load).
+                           If False, the given Anchor always gets a new one (i.e. a pasted copy).
+
+    Returns:
+        bool: True if the Anchor got a new id.
+    """
+    a_id = anchorId(anchor)
+    if a_id:
+        owners = stampRegistry(anchor).anchorsWithId(a_id)
+        name = anchor.name()
+        if keep_first:
+            if not owners or owners[0].name() == name:
+                return False
+        elif not [a for a in owners if a.name() != name]:
+            return False
+    giveAnchorId(anchor)
+    return True
+
+
+def wiredLinkKey(n):
+    """
+    Return the key that links a wired stamp to its Anchor: the stored anchor id or,
+    for stamps made before ids existed, the stored anchor name.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+
+    Returns:
+        str: The link key.
+    """
+    k = n.knob("anchor_id")
+    if k is not None and k.value():
+        return k.value()
+    return n["anchor"].value()
+
+
+def wiredAnchor(n):
+    """
+    Resolve the Anchor of a wired stamp: by its stored anchor id first, then by the stored anchor name.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+
+    Returns:
+        nuke.Node or None: The Anchor, or None if it can't be found.
+    """
+    k = n.knob("anchor_id")
+    a_id = k.value() if k is not None else ""
+    if a_id:
+        a = stampRegistry(n).anchorById(a_id)
+        if a is not None:
+            return a
+    try:
+        a = nuke.toNode(n["anchor"].value())
+    except Exception:
+        return None
+    if a is None or (a_id and anchorId(a) not in ["", a_id]):
+        return None
+    return a
+
+
+def wiredAnchorName(n):
+    """
+    Return the current name of the Anchor of a wired stamp, or its stored anchor name if it can't be resolved.
+    """
+    a = wiredAnchor(n)
+    if a is not None:
+        return a.name()
+    return n["anchor"].value()
+
+
+def wiredLinkedTo(n, anchor):
+    """
+    Check whether a wired stamp references the given Anchor, by id if both have one or else by name.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+        anchor (nuke.Node): The Anchor.
+
+    Returns:
+        bool: True if the wired stamp belongs to the Anchor.
+    """
+    k = n.knob("anchor_id")
+    a_id = anchorId(anchor)
+    if k is not None and k.value() and a_id:
+        return k.value() == a_id
+    return n["anchor"].value() == anchor.name()
+
+
+def wiredsByAnchorName(anchor_name):
+    """
+    Return the wired stamps of the Anchor with the given name, or those storing that name if there's no such Anchor.
+    """
+    a = nuke.toNode(anchor_name) if anchor_name else None
+    if isAnchor(a):
+        return anchorWireds(a)
+    return stampRegistry().wiredsOf(anchor_name)
+
+
+def wiredSetAnchor(n, anchor):
+    """
+    Link a wired stamp to an Anchor by storing the Anchor's name and id, keeping the registry in sync.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+        anchor (nuke.Node): The Anchor.
+    """
+    n["anchor"].setValue(anchor.name())
+    k = n.knob("anchor_id")
+    if k is None:
+        k = nuke.Text_Knob('anchor_id', '', "")
+        k.setVisible(False)
+        n.addKnob(k)
+    k.setValue(anchorId(anchor))
+    registerStamp(n)
+
+
+def stampOnDestroy():
+    """
+    Global onDestroy callback that removes deleted stamps from the registry.
+    """
+    if STAMPS_TELEMETRY:
+        telemetryCall("stampOnDestroy", "", _stampOnDestroy, nuke.thisNode())
+    else:
+        _stampOnDestroy(nuke.thisNode())
+
+
+def _stampOnDestroy(n):
+    forgetStampRole(n)
+    if not Stamps_Registries:
+        return
+    try:
+        name = n.name()
+        registry = Stamps_Registries.get(_registryContext(n).fullName())
+    except Exception:
+        return
+    if registry is not None and (name in registry.anchors or name in registry.wireds):
+        registry.remove(name)
+    if registry is not None:
+        registry.freeName(name)
+
+
+def stampAddCallbacks():
+    """
+    Register the global callbacks that keep the stamp registry up to date.
+    """
+    global Stamps_CallbacksLoaded
+    if not Stamps_CallbacksLoaded:
+        Stamps_CallbacksLoaded = True
+        nuke.addOnDestroy(stampOnDestroy)
+        nuke.addOnCreate(backdropsChanged, nodeClass="BackdropNode")
+        nuke.addOnDestroy(backdropsChanged, nodeClass="BackdropNode")
+        nuke.addKnobChanged(backdropKnobChanged, nodeClass="BackdropNode")
+        nuke.addOnScriptLoad(invalidateRegistries)
+        nuke.addOnCreate(stampLoadBegin, nodeClass="Root")
+        nuke.addOnScriptLoad(stampLoadEnd)
+        nuke.addOnScriptClose(stampLoadClose)
+        nuke.addOnScriptClose(invalidateRegistries)
+        nuke.addOnScriptSave(usageSave)
+        nuke.addOnScriptClose(usageSave)
+
+
+#################################
+### STAMP QUERIES
+#################################
+
+class StampQuery(object):
+    """
+    Chainable, lazily evaluated query over the Anchors and Wired stamps of a node graph context.
+
+    Every filter returns a new query, so partial queries can be reused, and chained filters must all match.
+    Filters run with set semantics against the StampRegistry indexes: the indexed ones (anchor, title, tag,
+    name, selection) narrow the candidates before the ones that depend on node positions or connections
+    (backdrop, type, broken) are checked, node by node, as the query is iterated.
+    Filters on Anchor properties (anchor, title, tag, type) match Wired stamps through the Anchor they're linked to.
+
+    Example:
+        stamps.StampQuery().anchors().tag("plates").backdrop("FG").type("Deep")
+        stamps.StampQuery().wireds().selected().broken().nodes()
+    """
+
+    def __init__(self, node=None):
+        """
+        Args:
+            node (nuke.Node): A node in the context to query. Defaults to the current context.
+        """
+        self.node = node
+        self.roles = ("anchor", "wired")
+        self.filters = []  # [(kind, args)]
+
+    def _with(self, kind=None, args=(), roles=None):
+        q = StampQuery(self.node)
+        q.roles = self.roles if roles is None else tuple(r for r in self.roles if r in roles)
+        q.filters = self.filters + ([(kind, args)] if kind else [])
+        return q
+
+    # Filters.
+    def anchors(self):
+        """Keep only Anchors."""
+        return self._with(roles=("anchor",))
+
+    def wireds(self):
+        """Keep only Wired stamps."""
+        return self._with(roles=("wired",))
+
+    def anchor(self, *anchors):
+        """Keep the given Anchors (nodes or names) and the Wired stamps linked to them."""
+        return self._with("anchor", [a.name() if hasattr(a, "name") else a for a in anchors])
+
+    def title(self, *titles):
+        """Keep the stamps of Anchors with any of the given titles."""
+        return self._with("title", titles)
+
+    def tag(self, *tags):
+        """Keep the stamps of Anchors with any of the given tags."""
+        return self._with("tag", tags)
+
+    def name(self, *names):
+        """Keep the stamps with any of the given node names."""
+        return self._with("name", names)
+
+    def among(self, nodes):
+        """Keep the stamps that are in the given list of nodes."""
+        return self._with("among", list(nodes))
+
+    def selected(self):
+        """Keep the stamps that are selected when the query is evaluated."""
+        return self._with("selected", ())
+
+    def backdrop(self, *labels):
+        """Keep the stamps inside a BackdropNode with any of the given labels (as tags) or names."""
+        return self._with("backdrop", labels)
+
+    def type(self, *types):
+        """Keep the stamps of Anchors whose input is of any of the given node types (i.e. "2D", "Deep", "3D")."""
+        return self._with("type", types)
+
+    def broken(self):
+        """Keep the Wired stamps that aren't connected to the Anchor they're linked to."""
+        return self._with("broken", ())
+
+    # Results.
+    def __iter__(self):
+        registry = stampRegistry(self.node)
+        registry.allAnchors()  # Validate the indexes, rebuilding them if needed.
+        registry.allWireds()
+
+        # 1. Indexed filters on the Anchors.
+        anchor_names = None  # Ordered list of candidate Anchor names, or None for any.
+        for kind, args in self.filters:
+            if kind == "anchor":
+                matched = [name for name in args if name in registry.anchors]
+            elif kind == "title":
+                matched = [name for t in args for name in registry.titles.get(t, ())]
+            elif kind == "tag":
+                matched = [name for t in args for name in registry.tags.get(t, ())]
+            else:
+                continue
+            if anchor_names is None:
+                anchor_names = list(dict.fromkeys(matched))
+            else:
+                matched = set(matched)
+                anchor_names = [name for name in anchor_names if name in matched]
+
+        # 2. Indexed filters on the stamps themselves.
+        stamp_names = None  # Ordered list of candidate stamp names, or None for any.
+        for kind, args in self.filters:
+            if kind == "name":
+                matched = list(args)
+            elif kind in ["among", "selected"]:
+                matched = []
+                for n in (nuke.selectedNodes() if kind == "selected" else args):
+                    try:
+                        name = n.name()
+                        if registry.anchors.get(name) == n or registry.wireds.get(name) == n:
+                            matched.append(name)
+                    except Exception:
+                        pass
+            else:
+                continue
+            if stamp_names is None:
+                stamp_names = list(dict.fromkeys(matched))
+            else:
+                matched = set(matched)
+                stamp_names = [name for name in stamp_names if name in matched]
+
+        # 3. Type filters, resolved for the candidate Anchors at once so the input memo isn't held across yields.
+        types = [args for kind, args in self.filters if kind == "type"]
+        if types:
+            memo_started = startInputMemo()
+            try:
+                anchor_names = [name for name in (registry.anchors if anchor_names is None else anchor_names)
+                                if name in registry.anchors and
+                                all(nodeType(realInput(registry.anchors[name])) in t for t in types)]
+            finally:
+                if memo_started:
+                    stopInputMemo()
+
+        # 4. Filters checked node by node.
+        checks = [(kind, args) for kind, args in self.filters if kind in ["backdrop", "broken"]]
+
+        def stampMatches(n, role):
+            for kind, args in checks:
+                if kind == "broken":
+                    if role != "wired" or not wiredIsBroken(n):
+                        return False
+                elif kind == "backdrop":
+                    if not any(e[5] in args or e[4].name() in args for e in registry.backdrops().entries(n)):
+                        return False
+            return True
+
+        anchor_set = None if anchor_names is None else set(anchor_names)
+        stamp_set = None if stamp_names is None else set(stamp_names)
+        if "anchor" in self.roles:
+            if stamp_names is not None:
+                candidates = [name for name in stamp_names if name in registry.anchors and
+                              (anchor_set is None or name in anchor_set)]
+            else:
+                candidates = anchor_names if anchor_names is not None else list(registry.anchors)
+            for name in candidates:
+                n = registry.anchors.get(name)
+                if n is not None and stampMatches(n, "anchor"):
+                    yield n
+
+        if "wired" in self.roles:
+            if stamp_names is not None:
+                candidates = [name for name in stamp_names if name in registry.wireds]
+                if anchor_set is not None:
+                    candidates = [name for name in candidates
+                                  if self._linkedAnchorName(registry, name) in anchor_set]
+            elif anchor_names is not None:
+                candidates = []
+                for a in anchor_names:
+                    for key in filter(None, dict.fromkeys([registry.anchor_id.get(a), a])):
+                        candidates += registry.children.get(key, ())
+                candidates = list(dict.fromkeys(candidates))
+            else:
+                candidates = list(registry.wireds)
+            for name in candidates:
+                n = registry.wireds.get(name)
+                if n is not None and stampMatches(n, "wired"):
+                    yield n
+
+    @staticmethod
+    def _linkedAnchorName(registry, name):
+        key = registry.wired_key.get(name)
+        if key in registry.ids:
+            return registry.ids[key]
+        return key if key in registry.anchors else None
+
+    def nodes(self):
+        """Return the matching stamps as a list of nodes."""
+        return list(self)
+
+    def names(self):
+        """Return the node names of the matching stamps."""
+        return [n.name() for n in self]
+
+    def first(self):
+        """Return the first matching stamp, or None, without evaluating the rest."""
+        for n in self:
+            return n
+        return None
+
+    def count(self):
+        """Return the number of matching stamps."""
+        return sum(1 for _ in self)
+
+    def __len__(self):
+        return self.count()
+
+
+#################################
+### BATCH MODE
+#################################
+
+class StampBatch(object):
+    """
+    Context manager for bulk operations on stamps. Use it through batch().
+
+    While it's active, the stamps' knobChanged callbacks skip their reconnect and restyle work, and the
+    stamps that need restyling are collected instead, to be restyled once on exit, also when leaving on an
+    error. Everything is wrapped in a single undo step, or without an undo name, not recorded for undo at all and
+    without marking the script as modified.
+    In terminal sessions, the registries are rebuilt once per batch instead of on every query.
+    Nested batches join the outermost one.
+    """
+
+    def __init__(self, undo_name="Stamps"):
+        self.undo_name = undo_name
+        self.wireds = {}  # {wired node: None}, to restyle
+        self.outer = None
+        self.locked = False
+        self.undo = None
+        self.modified = None  # The script's modified state to restore, when not recording undo.
+
+    def __enter__(self):
+        global Stamps_Batch, Stamps_LockCallbacks
+        self.outer = Stamps_Batch
+        self.locked = Stamps_LockCallbacks
+        if self.outer is None:
+            if self.undo_name is None:
+                self.modified = nuke.root().modified()
+                nuke.Undo.disable()
+            else:
+                try:
+                    self.undo = nuke.Undo()
+                    self.undo.begin(self.undo_name)
+                except Exception:
+                    self.undo = None
+            if not Stamps_CallbacksLoaded:
+                # Nothing kept the registries current since the last batch: rebuild them once for this one.
+                for registry in Stamps_Registries.values():
+                    registry.invalidate()
+            Stamps_Batch = self
+        Stamps_LockCallbacks = True
+        return Stamps_Batch
+
+    def __exit__(self, exc_type, exc_value, tb):
+        global Stamps_Batch, Stamps_LockCallbacks
+        if self.outer is not None:
+            Stamps_LockCallbacks = self.locked
+            return False
+        Stamps_Batch = None
+        try:
+            self.flush()
+        finally:
+            Stamps_LockCallbacks = self.locked
+            if self.undo is not None:
+                try:
+                    self.undo.end()
+                except Exception:
+                    pass
+            if self.undo_name is None:
+                nuke.Undo.enable()
+                nuke.root().setModified(self.modified)
+        return False
+
+    def flush(self):
+        """
+        Restyle the Wired stamps collected.
+        """
+        for n in self.wireds:
+            try:
+                wiredGetStyle(n)
+            except Exception:
+                pass
+        self.wireds = {}
+
+
+def batch(undo_name="Stamps"):
+    """
+    Return a context manager to run many stamp operations as one, i.e.:
+
+        with stamps.batch("Reconnect Stamps"):
+            for n in ns:
+                n.setInput(0, a)
+                stamps.wiredGetStyle(n)
+
+    Args:
+        undo_name (str): Name of the undo step. None to leave the changes out of the undo history and keep
+                         the script's modified state, for work that isn't an edit of the user's.
+
+    Returns:
+        StampBatch: The context manager.
+    """
+    return StampBatch(undo_name)
+
+
+#################################
+### LONG OPERATIONS
+#################################
+
+class StampJob(object):
+    """
+    Cooperative, cancellable long operation on nodes that runs from the Qt event loop in time slices.
+
+    Each tick processes chunks of nodes for about STAMPS_JOB_BUDGET seconds, reports through a
+    nuke.ProgressTask and gives control back to the UI. The first chunk is a single node, timed to size
+    the next ones from the measured time per node. Nodes deleted while the job runs are skipped, so the
+    work function always gets live nodes and should work out what to do with them when it's called,
+    not beforehand. Without a GUI, the nodes are processed in one go.
+
+    Each tick is a single undo step, so a cancelled job stops between consistent states and what it
+    did can be undone tick by tick. Jobs that aren't undoable run without recording undo and leave the
+    script's modified state as it was. Jobs that aren't cancellable process the remaining items in one go
+    when cancelled. Jobs started while another one runs are queued behind it.
+    """
+
+    def __init__(self, title, items, work, done=None, undoable=True, cancellable=True):
+        """
+        Args:
+            title (str): Title of the progress task and undo steps.
+            items (list): Nodes to process.
+            work (callable): Called with a list of nodes. Its return values are collected in self.results.
+            done (callable): Called with the job when it finishes or is cancelled.
+            undoable (bool): If False, the work isn't recorded for undo and doesn't mark the script as modified.
+            cancellable (bool): If False, cancelling finishes the work at once instead of stopping it.
+        """
+        self.title = title
+        self.items = list(items)
+        self.work = work
+        self.done = done
+        self.undo_name = title if undoable else None
+        self.cancellable = cancellable
+        self.results = []
+        self.position = 0
+        self.per_item = None  # Measured seconds per item, once a chunk has run.
+        self.cancelled = False
+        self.error = None
+        self.task = None
+
+    def start(self):
+        """Start processing the items, or queue the job if another one is running, and return the job."""
+        if not nuke.GUI or not self.items:
+            self.finishNow()
+            return self
+        Stamps_Jobs.append(self)
+        if len(Stamps_Jobs) == 1:
+            self.run()
+        return self
+
+    def run(self):
+        self.task = nuke.ProgressTask(self.title)
+        QtCore.QTimer.singleShot(0, self.tick)
+
+    def tick(self):
+        """Process chunks for the time budget as one undo step, and schedule the next tick."""
+        if self.task.isCancelled():
+            if self.cancellable:
+                self.cancelled = True
+                self.finish()
+            else:
+                self.finishNow()
+            return
+        tick_start = time.time()
+        try:
+            with batch(self.undo_name):
+                ran = False
+                while self.position < len(self.items):
+                    remaining = STAMPS_JOB_BUDGET - (time.time() - tick_start)
+                    if self.per_item is None:
+                        size = 1
+                    elif ran and remaining < self.per_item:
+                        break
+                    else:
+                        size = max(1, int(remaining / max(self.per_item, 1e-6)))
+                    ran = True
+                    chunk = self.items[self.position:self.position + size]
+                    start = time.time()
+                    self.results.append(self.work(self.liveItems(chunk)))
+                    self.per_item = (time.time() - start) / len(chunk)
+                    self.position += len(chunk)
+        except Exception as e:
+            self.error = e
+            self.finish()
+            return
+        self.task.setProgress(int(100 * self.position / len(self.items)))
+        self.task.setMessage("{} of {}".format(self.position, len(self.items)))
+        if self.position < len(self.items):
+            QtCore.QTimer.singleShot(0, self.tick)
+        else:
+            self.finish()
+
+    def finishNow(self):
+        """Process all the remaining items in one go, and finish."""
+        try:
+            with batch(self.undo_name):
+                self.results.append(self.work(self.liveItems(self.items[self.position:])))
+            self.position = len(self.items)
+        except Exception as e:
+            self.error = e
+        self.finish()
+
+    @staticmethod
+    def liveItems(nodes):
+        """Return the nodes that haven't been deleted."""
+        alive = []
+        for n in nodes:
+            try:
+                n.name()
+                alive.append(n)
+            except Exception:
+                pass
+        return alive
+
+    def finish(self):
+        """Close the progress task, call the done callback and start the next job queued."""
+        self.task = None
+        queued = self in Stamps_Jobs
+        if queued:
+            Stamps_Jobs.remove(self)
+        try:
+            if self.done is not None:
+                self.done(self)
+        finally:
+            if queued and Stamps_Jobs:
+                Stamps_Jobs[0].run()
+
+
+def runJob(title, items, work, done=None, undoable=True, cancellable=True):
+    """
+    Run a long operation in time slices, see StampJob.
+
+    Args:
+        title (str): Title of the progress task and undo steps.
+        items (list): Nodes to process.
+        work (callable): Called with each chunk of live nodes.
+        done (callable): Called with the job when it finishes or is cancelled.
+        undoable (bool): If False, the work isn't recorded for undo and doesn't mark the script as modified.
+        cancellable (bool): If False, cancelling finishes the work at once instead of stopping it.
+
+    Returns:
+        StampJob: The job.
+    """
+    return StampJob(title, items, work, done, undoable, cancellable).start()
+
+
+def jobStatus(job):
+    """
+    Return a line to append to a job's final message if it was cancelled or failed.
+    """
+    if job.error is not None:
+        return "\n\nStopped by an error after {} of {} items:\n{}".format(job.position, len(job.items), job.error)
+    if job.cancelled:
+        return "\n\nCancelled after {} of {} items.".format(job.position, len(job.items))
+    return ""
+
+
+#################################
+### SCRIPT LOADING
+#################################
+
+def stampLoadBegin():
+    """
+    Root onCreate callback: when a script is opened, defer the onCreate work of its stamps
+    until it's loaded, to initialize them all in one pass. See stampLoadEnd.
+
+    The Root of a new, empty script (at startup or from File > New) has no script name, and is left alone.
+    """
+    global Stamps_Loading
+    if not nuke.GUI:
+        return
+    stampLoadCheck()
+    try:
+        if not nuke.thisNode()["name"].value():
+            return
+    except Exception:
+        return
+    Stamps_Loading = []
+    invalidateRegistries()
+
+
+def stampLoadCheck():
+    """
+    End the deferral left by a script that failed to load, before its onScriptLoad callback, if any.
+
+    Only loading a script creates stamps while it's armed, so it's over by the time Stamps creates a stamp
+    or a stamp's panel gets opened. The stamps deferred so far are initialized, and the next ones run their
+    own onCreate work again.
+    """
+    if Stamps_Loading is not None:
+        stampLoadEnd()
+
+
+def stampLoadClose():
+    """
+    onScriptClose callback: forget the stamps of a script closed while they were deferred.
+    """
+    global Stamps_Loading
+    Stamps_Loading = None
+
+
+def stampLoadEnd():
+    """
+    onScriptLoad callback, once the nodes of the script exist: initialize the stamps created
+    while it loaded, in time slices.
+    """
+    global Stamps_Loading
+    ns = Stamps_Loading
+    Stamps_Loading = None
+    if ns:
+        invalidateRegistries()  # The registries get built once, when first needed.
+        # Part of opening the script: not an edit to undo, and stamps left uninitialized would misbehave.
+        runJob("Initializing Stamps", ns, initStamps, undoable=False, cancellable=False)
+
+
+def initStamps(ns):
+    """
+    Do the onCreate work of many stamps at once, leaving the registries to be rebuilt in one go.
+
+    Args:
+        ns (list): Anchor and Wired stamp nodes.
+
+    Returns:
+        int: The number of stamps initialized.
+    """
+    count = 0
+    for n in ns:
+        try:
+            if isWired(n):
+                n["toReconnect"].setValue(1)
+                hideBuiltinKnobs(n, WIRED_KNOBS)
+                wiredSetDisplay(n, [("tags", ""), ("backdrops", "")])  # Drop copies saved by older versions.
+            elif isAnchor(n):
+                hideBuiltinKnobs(n, ANCHOR_KNOBS)
+                checkAnchorId(n, keep_first=True)  # Upgrade Anchors without an id, and split duplicated ones.
+                n["prev_name"].setValue(n.name())
+            else:
+                continue
+            count += 1
+        except Exception:
+            pass  # Deleted since.
+    return count
+
+
+def benchmarkScriptLoad(anchors=2000, wireds=20000):
+    """
+    Time the creation of a synthetic script's stamps, running their onCreate work node by node as before,
+    and deferred to a single initialization pass as when loading a script.
+
+    The stamps are pasted from the stamp templates, which runs their onCreate code like loading does
+    (only in the GUI), and get deleted afterwards.
+
+    Args:
+        anchors (int): Number of Anchors.
+        wireds (int): Number of Wired stamps, spread evenly among the Anchors.
+
+    Returns:
+        dict: Seconds taken, by method ("per node", "batched"), or None if the templates are unavailable.
+    """
+    global Stamps_Loading
+    a_template = stampTemplate("anchor", "2D")
+    w_template = stampTemplate("wired", "2D")
+    if a_template is None or w_template is None:
+        nuke.message("Couldn't compile the stamp templates needed for the benchmark.")
+        return None
+    parts = []
+    for i in range(anchors):
+        a_id = newAnchorId()
+        a_name = "BenchmarkAnchor{}".format(i)
+        values = {"name": a_name, "title": "benchmark_{}".format(i), "tags": "", "anchor_id": a_id}
+        parts.append(templateScript(a_template, values, place=False))
+        for j in range(i, wireds, anchors):
+            values = {"name": "BenchmarkStamp{}".format(j), "title": values["title"], "anchor": a_name,
+                      "anchor_id": a_id}
+            parts.append(templateScript(w_template, values, place=False))
+    script = "".join(parts)
+
+    selection = nuke.selectedNodes()
+    results = {}
+    try:
+        for method, deferred in [("per node", False), ("batched", True)]:
+            start = time.time()
+            if deferred:
+                Stamps_Loading = []
+            try:
+                created = nodesFromScript(script) or []
+            finally:
+                ns, Stamps_Loading = Stamps_Loading, None
+            if deferred:
+                invalidateRegistries()
+                initStamps(ns)
+            results[method] = time.time() - start
+            with batch("Benchmark"):
+                for n in created:
+                    nuke.delete(n)
+    finally:
+        for i in selection:
+            i.setSelected(True)
+    nuke.tprint("Stamps load benchmark, {} Anchors and {} Wired stamps: {}".format(anchors, wireds, ", ".join(
+        "{} {:.2f} s".format(method, results[method]) for method in ["per node", "batched"])))
+    return results
+
+
+#################################
+### PASTE RECONCILIATION
+#################################
+
+def queuePastedStamp(n):
+    """
+    Queue a newly created wired stamp, to reconnect it along with the rest of the paste it came in.
+
+    Args:
+        n (nuke.Node): The wired stamp.
+    """
+    if not Stamps_Pasted:
+        # Runs as soon as Nuke's event loop is back, i.e. once the whole paste is done.
+        QtCore.QTimer.singleShot(0, stampPasteEnd)
+    Stamps_Pasted[n] = None
+
+
+def stampPasteEnd():
+    """
+    Reconnect the wired stamps pasted during the last event loop turn, and optionally summarize it.
+    """
+    ns = []
+    for n in list(Stamps_Pasted):
+        try:
+            if n.knob("toReconnect") is not None and n["toReconnect"].value():
+                ns.append(n)
+        except Exception:
+            pass  # Deleted since.
+    Stamps_Pasted.clear()
+    if not ns:
+        return
+    result = reconcilePasted(ns)
+    if STAMPS_PASTE_SUMMARY and (result["remapped"] or result["failed"]):
+        prefix = "Pasted {} Stamps, {} reconnected to another Anchor.".format(len(ns), len(result["remapped"]))
+        if result["failed"]:
+            reconnectMessage(result, prefix)
+        else:
+            nuke.message(prefix)
+
+
+def reconcilePasted(ns):
+    """
+    Reconnect many pasted wired stamps in one batch, resolving them all against the same Anchor maps.
+
+    Each stamp keeps the Anchor it was pasted connected to, if it has its title. Otherwise, if its
+    auto-reconnect by title is on, it connects to an Anchor with its title. Otherwise, it connects to
+    its stored Anchor, if that still has its title. Stamps that can't be resolved are styled as broken.
+
+    Args:
+        ns (list): The pasted wired stamps.
+
+    Returns:
+        dict: {"reconnected": [nodes], "remapped": [nodes linked to another Anchor than stored], "failed": [(node, reason)]}
+    """
+    plan = []
+    by_name = []
+    registry = stampRegistry(ns[0])
+    for n in ns:
+        title = n["title"].value()
+        current = n.input(0)
+        target = None
+        if current is not None and isAnchor(current) and current["title"].value() == title:
+            target = current
+        elif n.knob("auto_reconnect_by_title") and n["auto_reconnect_by_title"].value():
+            n["auto_reconnect_by_title"].setValue(False)  # It's a one-off.
+            target = (registry.anchorsByTitle(title) or [None])[0]
+        if target is None:
+            by_name.append(n)
+        else:
+            plan.append({"wired": n, "current": current, "target": target, "strategy": "title", "reason": "Pasted"})
+    for change in planReconnect(by_name, "name"):
+        n, a = change["wired"], change["target"]
+        if a is not None and a["title"].value() != n["title"].value():
+            change["target"] = None
+            change["reason"] = "Anchor {} has another title".format(a.name())
+        plan.append(change)
+    # The rest are connected and linked to their stored Anchor already.
+    planned = set(change["wired"] for change in plan)
+    unchanged = [n for n in by_name if n not in planned]
+
+    with batch("Paste Stamps"):
+        remapped = [change["wired"] for change in plan if change["target"] is not None
+                    and change["target"].name() != change["wired"]["anchor"].value()]
+        result = applyReconnectPlan(plan, "Paste Stamps")
+        for n, _ in result["failed"]:
+            try:
+                if n.input(0) is not None and not isAnchor(n.input(0)):
+                    n.setInput(0, None)
+            except Exception:
+                pass
+        for n in ns:
+            try:
+                n["toReconnect"].setValue(False)
+            except Exception:
+                pass
+    result["reconnected"] += unchanged
+    result["remapped"] = remapped
+    return result
+
+
+#################################
+### CALLBACK TELEMETRY
+#################################
+
+class CallbackStats(object):
+    """
+    Timings of a callback for one knob name, see telemetryCall.
+    """
+    SAMPLES = 1000  # Most recent timings kept for the percentiles.
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.reentrant = 0  # Calls made while the same callback was already running.
+        self.over_budget = 0
+        self.samples = collections.deque(maxlen=self.SAMPLES)
+
+    def add(self, duration, reentrant=False):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.reentrant += int(reentrant)
+        self.samples.append(duration)
+
+    def percentile(self, p):
+        """
+        Return the p-th percentile (nearest rank) of the recent timings, in seconds.
+        """
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, max(0, int(math.ceil(p / 100.0 * len(samples))) - 1))]
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p99": self.percentile(99),
+            "max": self.max,
+            "reentrant": self.reentrant,
+            "over_budget": self.over_budget,
+        }
+
+
+_clock = getattr(time, "perf_counter", time.time)
+
+
+def telemetryCall(callback, knob_name, func, *args):
+    """
+    Call a callback's work, recording its time under the callback and knob names, and warn if it's over budget.
+
+    Args:
+        callback (str): Name of the callback.
+        knob_name (str): Name of the changed knob, or "" for callbacks not about a knob.
+        func (callable): The work, or None if the callback returns right away for this knob.
+        *args: Arguments for func.
+
+    Returns:
+        The result of func.
+    """
+    depth = Stamps_CallbackDepth.get(callback, 0)
+    Stamps_CallbackDepth[callback] = depth + 1
+    start = _clock()
+    try:
+        if func is not None:
+            return func(*args)
+    finally:
+        duration = _clock() - start
+        Stamps_CallbackDepth[callback] = depth
+        stats = Stamps_Telemetry.get((callback, knob_name))
+        if stats is None:
+            stats = Stamps_Telemetry[(callback, knob_name)] = CallbackStats()
+        stats.add(duration, depth > 0)
+        if STAMPS_CALLBACK_BUDGET and duration > STAMPS_CALLBACK_BUDGET:
+            stats.over_budget += 1
+            try:
+                node_name = nuke.thisNode().fullName()
+            except Exception:
+                node_name = "?"
+            nuke.warning("Stamps: {} took {:.1f} ms on {}{}, over the {:.1f} ms budget.".format(
+                callback, duration * 1000, node_name, "." + knob_name if knob_name else "",
+                STAMPS_CALLBACK_BUDGET * 1000))
+
+
+def telemetryStats():
+    """
+    Return the recorded callback timings.
+
+    Returns:
+        dict: {callback: {knob name: {"count", "total", "mean", "p99", "max", "reentrant", "over_budget"}}},
+              times in seconds.
+    """
+    stats = {}
+    for (callback, knob_name), callback_stats in Stamps_Telemetry.items():
+        stats.setdefault(callback, {})[knob_name] = callback_stats.toDict()
+    return stats
+
+
+def telemetryToJson(path=None):
+    """
+    Return the recorded callback timings as JSON, to attach to a ticket, and optionally save them.
+
+    Args:
+        path (str): Optional file to write them to.
+
+    Returns:
+        str: The JSON text.
+    """
+    text = json.dumps({
+        "stamps_version": version,
+        "nuke_version": getattr(nuke, "NUKE_VERSION_STRING", ""),
+        "script": _usageScript(),
+        "budget": STAMPS_CALLBACK_BUDGET,
+        "callbacks": telemetryStats(),
+    }, indent=2, sort_keys=True)
+    if path:
+        with open(os.path.expanduser(path), "w") as f:
+            f.write(text)
+    return text
+
+
+def telemetryReset():
+    """Forget the recorded callback timings."""
+    Stamps_Telemetry.clear()
+
+
+def telemetrySave():
+    """
+    Ask for a file and save the recorded callback timings to it, see telemetryToJson.
+    """
+    if not Stamps_Telemetry:
+        nuke.message("No Stamps callback timings recorded.\n"
+                     "Set STAMPS_TELEMETRY = True in stamps_config.py to record them.")
+        return
+    path = nuke.getFilename("Save Stamps callback timings", "*.json")
+    if not path:
+        return
+    if not path.endswith(".json"):
+        path += ".json"
+    try:
+        telemetryToJson(path)
+    except Exception as e:
+        nuke.message("Couldn't save the callback timings:\n{}".format(e))
+
+
+#################################
+### USAGE STATISTICS
+#################################
+
+def _usageScript():
+    """Return the path of the current script, or "" if it hasn't been saved yet."""
+    try:
+        return nuke.root()["name"].value()
+    except Exception:
+        return ""
+
+
+def _usageKey(anchor):
+    return anchorId(anchor) or anchor.name()
+
+
+def usageLoad():
+    """
+    Return the usage statistics of every script, loading them from STAMPS_USAGE_FILE the first time.
+
+    Returns:
+        dict: {script: {anchor key: [frecency score, last use time]}}
+    """
+    global Stamps_Usage
+    if Stamps_Usage is None:
+        Stamps_Usage = {}
+        if STAMPS_USAGE_FILE:
+            try:
+                with open(os.path.expanduser(STAMPS_USAGE_FILE)) as f:
+                    Stamps_Usage = json.load(f)
+            except Exception:
+                pass
+            Stamps_Usage.pop("untitled", None)  # Shared by every unsaved script in earlier versions.
+    return Stamps_Usage
+
+
+def _lastUse(entries):
+    """Return the time of the most recent use among a script's usage entries, 0 if none."""
+    return max([i[1] for i in entries.values()] + [0])
+
+
+def usageSave():
+    """
+    Write the usage statistics to STAMPS_USAGE_FILE if they changed, keeping only the most recent entries.
+    """
+    global Stamps_UsageDirty
+    if not Stamps_UsageDirty or not STAMPS_USAGE_FILE or Stamps_Usage is None:
+        return
+    for script in sorted(Stamps_Usage, key=lambda i: _lastUse(Stamps_Usage[i]))[:-STAMPS_USAGE_MAX_SCRIPTS]:
+        del Stamps_Usage[script]
+    for script, entries in Stamps_Usage.items():
+        if len(entries) > STAMPS_USAGE_MAX_ANCHORS:
+            kept = sorted(entries, key=lambda i: entries[i][1])[-STAMPS_USAGE_MAX_ANCHORS:]
+            Stamps_Usage[script] = dict((i, entries[i]) for i in kept)
+    path = os.path.expanduser(STAMPS_USAGE_FILE)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(Stamps_Usage, f)
+        try:
+            os.replace(tmp_path, path)
+        except AttributeError:  # Python 2
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        Stamps_UsageDirty = False
+    except Exception:
+        pass
+
+
+def usageRecord(anchor, weight=1.0):
+    """
+    Record a use of an Anchor (a stamp created or the Anchor chosen in the selector) for the current script.
+    Nothing is recorded until the script is saved, as unsaved scripts have no path to tell them apart.
+
+    Args:
+        anchor (nuke.Node): The Anchor.
+        weight (float): How much this use counts.
+    """
+    global Stamps_UsageDirty
+    script = _usageScript()
+    if not script:
+        return
+    try:
+        key = _usageKey(anchor)
+    except Exception:
+        return
+    now = time.time()
+    entries = usageLoad().setdefault(script, {})
+    entries[key] = [usageScore(anchor, now, entries) + weight, now]
+    Stamps_UsageDirty = True
+
+
+def usageScore(anchor, now=None, entries=None):
+    """
+    Return the frecency score of an Anchor in the current script: every use counts 1 (times its weight)
+    and halves its value each STAMPS_USAGE_HALF_LIFE days.
+
+    Args:
+        anchor (nuke.Node): The Anchor.
+        now (float): Optional current time, to score many Anchors consistently.
+        entries (dict): Optional usage entries of the current script.
+
+    Returns:
+        float: The score, 0 if the Anchor was never used.
+    """
+    if entries is None:
+        script = _usageScript()
+        entries = usageLoad().get(script, {}) if script else {}
+    entry = entries.get(_usageKey(anchor))
+    if not entry:
+        return 0.0
+    if now is None:
+        now = time.time()
+    score, last_use = entry
+    return score * 0.5 ** (max(now - last_use, 0) / (STAMPS_USAGE_HALF_LIFE * 86400.0))
+
+
+#################################
+### FUNCTIONS
+#################################
+
+def getDefaultTitle(node=None):
+    """
+    Determine the default title for a node based on its class and properties.
+
+    For a Camera node, if no NoOp exists with title 'cam', returns 'cam'.
+    For a Dot or NoOp node with a non-empty label, returns the label.
+    For Read nodes, attempts to extract a filename-derived title.
+
+    Args:
+        node (nuke.Node): The node for which to generate a default title.
+
+    Returns:
+        str or bool: The default title as a string, or False if node is None.
+    """
+    if node is None:
+        return False
+    title = str(node.name())
+
+    # Handle Camera nodes.
+    if "Camera" in node.Class():
+        try:
+            if not any(i.knob("title") and i["title"].value() == "cam" for i in nuke.allNodes("NoOp")):
+                return "cam"
+        except Exception:
+            pass
+
+    # Handle Dot/NoOp nodes with a label.
+    if node.Class() in ["Dot", "NoOp"]:
+        try:
+            label = node["label"].value().strip()
+            if label != "":
+                return label
+        except Exception:
+            pass
+
+    # Handle Read nodes by extracting a filename-based title.
+    try:
+        file = node['file'].value()
+        if not (node.knob("read_from_file") and not node["read_from_file"].value()):
+            if file != "":
+                rawname = file.rpartition('/')[2].rpartition('.')[0]
+                if '.' in rawname:
+                    rawname = rawname.rpartition('.')[0]
+                # Option 1: Match a beauty pass pattern.
+                m = re.match(r"([\w]+)_v[\d]+_beauty", rawname)
+                if m:
+                    pre_version = m.groups()[0]
+                    title = "_".join(pre_version.split("_")[3:])
+                    return title
+                # Option 2: Generic extraction.
+                rawname = str(re.split("_v[0-9]*_", rawname)[-1]).replace("_render", "")
+                title = rawname
+    except Exception:
+        pass
+
+    return title
+
+
+def backdropTags(node=None):
+    """
+    Extract a list of cleaned label tags from the backdrop nodes that contain the given node.
+
+    Args:
+        node (nuke.Node): The node for which to find associated backdrops.
+
+    Returns:
+        list: A list of tag strings derived from the labels of matching BackdropNodes.
+    """
+    if node is None:
+        return []
+    return [e[5] for e in stampRegistry(node).backdrops().entries(node) if e[5]]
+
+
+def backdropLabelTag(b):
+    """
+    Return the cleaned label of a BackdropNode to be used as a Stamps tag, or None if it shouldn't be one.
+
+    Args:
+        b (nuke.Node): The BackdropNode.
+
+    Returns:
+        str or None: The tag.
+    """
+    try:
+        # Check custom visibility if available.
+        if b.knob("visible_for_stamps"):
+            if not b["visible_for_stamps"].value():
+                return None
+        elif not b["bookmark"].value():
+            return None
+        label = b["label"].value()
+        if label and len(label) < 50 and not label.startswith("\\"):
+            # Process the label: remove newlines, HTML tags, extra spaces, and trailing periods.
+            label = label.split("\n")[0].strip()
+            label = re.sub("<[^<>]*>", "", label)
+            label = re.sub("[\s]+", " ", label)
+            label = re.sub("\.$", "", label)
+            return label
+    except Exception:
+        pass
+    return None
+
+
+def anchorDefaults(node=None, extra_tags=[], no_default_tag=False):
+    """
+    Work out the default title, tags and node type of a new Anchor for a given node.
+
+    Args:
+        node (nuke.Node): The node from which to derive the stamp.
+        extra_tags (list): Additional tags to be merged with default tags.
+        no_default_tag (bool): If True, use the extra tags only.
+
+    Returns:
+        tuple: (title, comma-separated tags, node type, list of the tags proposed before adding the extra ones)
     """
-    ns = nuke.selectedNodes()
-    for n in ns:
-        n.setSelected(False)
-
     if node is not None:
-        node.setSelected(True)
         default_title = getDefaultTitle(realInput(node, stopOnLabel=True, mode="title"))
         default_tags = list(set([nodeType(realInput(node, mode="tags"))]))
         if node.Class() in ["ScanlineRender"]:
             default_tags += ["2D", "Deep"]
         node_type = nodeType(realInput(node))
-        window_title = "New Stamp: " + str(node.name())
     else:
         default_title = "Stamp"
         default_tags = ""
         node_type = ""
-        window_title = "New Stamp"
 
     try:
         custom_default_title = defaultTitle(node)
@@ -2022,6 +4925,31 @@ def stampCreateAnchor(node=None, extra_tags=[], no_default_tag=False):
         default_tags = list(filter(None, list(dict.fromkeys(default_tags + extra_tags))))
         default_tags = ", ".join(default_tags + [""])
 
+    return default_title, default_tags, node_type, default_default_tags
+
+
+def stampCreateAnchor(node=None, extra_tags=[], no_default_tag=False):
+    """
+    Create a new Anchor Stamp based on a given node, optionally appending extra tags.
+
+    Args:
+        node (nuke.Node): The node from which to derive the stamp.
+        extra_tags (list): Additional tags to be merged with default tags.
+        no_default_tag (bool): If True, override default tags completely.
+
+    Returns:
+        list or None: A list of extra tags (if creation succeeded) or None if cancelled.
+    """
+    ns = nuke.selectedNodes()
+    for n in ns:
+        n.setSelected(False)
+    if node is not None:
+        node.setSelected(True)
+        window_title = "New Stamp: " + str(node.name())
+    else:
+        window_title = "New Stamp"
+    default_title, default_tags, node_type, default_default_tags = anchorDefaults(node, extra_tags, no_default_tag)
+
     global new_anchor_panel
     new_anchor_panel = NewAnchorPanel(window_title, default_title, allTags(), default_tags)
 
@@ -2036,9 +4964,7 @@ def stampCreateAnchor(node=None, extra_tags=[], no_default_tag=False):
                 if not nuke.ask(
                         "There is already a Stamp titled " + anchor_title + ".\nDo you still want to use this title?"):
                     continue
-            na = anchor(title=anchor_title, tags=anchor_tags, input_node=node, node_type=node_type)
-            na.setYpos(na.ypos() + 20)
-            stampCreateWired(na)
+            stampCreateAnchorAndWired(node, anchor_title, anchor_tags, node_type)
             for n in ns:
                 n.setSelected(True)
                 node.setSelected(False)
@@ -2050,6 +4976,98 @@ def stampCreateAnchor(node=None, extra_tags=[], no_default_tag=False):
     return extra_tags
 
 
+def stampCreateAnchorAndWired(node, title, tags, node_type):
+    """
+    Create an Anchor under the selected node, plus a Wired Stamp under the Anchor.
+
+    Args:
+        node (nuke.Node): The node to stamp. It should be the only selected node.
+        title (str): The title of the Anchor.
+        tags (str): Comma-separated tags.
+        node_type (str): The node type, see nodeType.
+
+    Returns:
+        nuke.Node: The Anchor.
+    """
+    na = anchor(title=title, tags=tags, input_node=node, node_type=node_type)
+    na.setYpos(na.ypos() + 20)
+    stampCreateWired(na)
+    if node is not None and "Cryptomatte" in node.Class() and node.knob("matteOnly"):
+        node['matteOnly'].setValue(1)
+    return na
+
+
+def stampCreateAnchors(ns):
+    """
+    Create Anchors, with a Wired Stamp each, for many nodes at once, from a single table panel.
+
+    The titles and tags are proposed up front, and all the nodes are created in one batch with one undo step.
+
+    Args:
+        ns (list): The nodes to stamp.
+
+    Returns:
+        list or None: The Anchors created, or None if cancelled.
+    """
+    memo_started = startInputMemo()
+    try:
+        rows = []
+        for n in ns:
+            if n.knob("stamp_tags"):
+                defaults = anchorDefaults(n, n["stamp_tags"].value().split(","), no_default_tag=True)
+            else:
+                defaults = anchorDefaults(n)
+            rows.append({"node": n, "title": defaults[0] or "", "tags": defaults[1], "node_type": defaults[2],
+                         "create": True})
+    finally:
+        if memo_started:
+            stopInputMemo()
+
+    global bulk_anchor_panel
+    bulk_anchor_panel = BulkAnchorPanel(rows)
+    while True:
+        if not bulk_anchor_panel.exec_():
+            return None
+        rows = [row for row in bulk_anchor_panel.rows if row["create"]]
+        # Validate all the titles in one pass.
+        illegal = [row["node"].name() for row in rows if not titleIsLegal(row["title"])]
+        if illegal:
+            nuke.message("Please set a valid title for: {}".format(", ".join(illegal)))
+            continue
+        counts = {}
+        for row in rows:
+            counts[row["title"]] = counts.get(row["title"], 0) + 1
+        repeated = [t for t in counts if counts[t] > 1 or findAnchorsByTitle(t)]
+        if repeated and not nuke.ask("There are already Stamps titled {}.\nDo you still want to use these titles?".format(
+                ", ".join(sorted(repeated)))):
+            continue
+        break
+
+    selection = nuke.selectedNodes()
+    anchors = []
+    reserveNames("Stamp", len(rows))
+    try:
+        with batch("Make Stamps"):
+            for row in rows:
+                for i in nuke.selectedNodes():
+                    i.setSelected(False)
+                row["node"].setSelected(True)
+                try:
+                    anchors.append(stampCreateAnchorAndWired(row["node"], row["title"], row["tags"], row["node_type"]))
+                except Exception:
+                    pass
+    finally:
+        releaseNames("Stamp")
+        for i in nuke.selectedNodes():
+            i.setSelected(False)
+        for i in selection:
+            try:
+                i.setSelected(True)
+            except Exception:
+                pass
+    return anchors
+
+
 def stampSelectAnchors():
     """
     Display a panel to select an Anchor Stamp.
@@ -2057,11 +5075,7 @@ def stampSelectAnchors():
     Returns:
         list or None: A list of selected anchor nodes or None if cancelled.
     """
-    # 1. Get a temporary node's position to use as reference.
-    nodeForPos = nuke.createNode("NoOp")
-    childNodePos = [nodeForPos.xpos(), nodeForPos.ypos()]
-    nuke.delete(nodeForPos)
-    # 2. Retrieve existing anchors.
+    # Retrieve existing anchors.
     anchorList = [n.name() for n in allAnchors()]
     if not len(anchorList):
         nuke.message("Please create some stamps first...")
@@ -2072,56 +5086,147 @@ def stampSelectAnchors():
         if select_anchors_panel.exec_():
             chosen_anchors = select_anchors_panel.chosen_anchors
             if chosen_anchors:
+                usageSave()
                 return chosen_anchors
         return None
 
 
 def stampCreateWired(anchor=""):
     """
-    Create a Wired Stamp linked to a specified Anchor.
+    Create a Wired Stamp linked to a specified Anchor.
+
+    If no anchor is provided, prompts the user to select one.
+
+    Args:
+        anchor (nuke.Node or str): The anchor node to use.
+
+    Returns:
+        nuke.Node: The created wired stamp node.
+    """
+    global Stamps_LastCreated
+    nw = ""
+    nws = []
+    if anchor == "":
+        anchors = stampSelectAnchors()
+        if anchors is None:
+            return
+        if anchors:
+            nws = createWireds(anchors)
+            nw = nws[-1] if nws else ""
+    else:
+        nw = wired(anchor=anchor, place=False)
+        nww = nw.screenWidth()
+        nw.setXYpos(int(anchor.xpos() + anchor.screenWidth() / 2 - nww / 2), anchor.ypos() + 56)
+        nw.setSelected(True)
+        anchor.setSelected(False)
+    return nw
+
+
+def createWireds(anchors, near=None):
+    """
+    Create a Wired Stamp for each of the given Anchors in one batch, with one undo step.
+
+    They're laid out in rows from the given position, skipping any room already taken by other nodes.
+    The new Stamps end up selected.
+
+    Args:
+        anchors (list): The Anchor nodes.
+        near (nuke.Node or tuple): Node to place them under, or (x, y) position of the first one.
+                                   Defaults to where Nuke would place a new node.
+
+    Returns:
+        list: The new wired stamps.
+    """
+    anchors = [a for a in anchors if isAnchor(a)]
+    if not anchors:
+        return []
+    if near is None:
+        near = defaultNodePosition()
+    if hasattr(near, "xpos"):
+        x, y = near.xpos(), near.ypos() + near.screenHeight() + 30
+    else:
+        x, y = near
+    nws = []
+    names = getAvailableNames("Stamp", len(anchors))
+    with batch("Create Stamps"):
+        grid = NodeGrid(nuke.allNodes())
+        memo_started = startInputMemo()
+        try:
+            for anchor, name in zip(anchors, names):
+                nw = wired(anchor, name=name, place=False)
+                w, h = nw.screenWidth(), nw.screenHeight()
+                px, py = grid.place(x, y, w, h, w + 20, h + 40, STAMPS_ROW_LENGTH)
+                nw.setXYpos(int(px), int(py))
+                nws.append(nw)
+        finally:
+            if memo_started:
+                stopInputMemo()
+        for n in nuke.selectedNodes():
+            n.setSelected(False)
+        for nw in nws:
+            nw.setSelected(True)
+    return nws
+
+
+def nodeClassSize(node_class):
+    """
+    Return the screen size of a new node of a class, remembered for the session, to place nodes before they exist.
+    Existing nodes are measured with screenWidth and screenHeight.
+
+    It's learnt from the smallest existing node of that class, as labels and thumbnails only make nodes bigger,
+    instead of creating a throwaway node to measure. Classes not in the script yet get NodeClassSizes' guess.
+
+    Args:
+        node_class (str): The node class.
+
+    Returns:
+        tuple: (width, height)
+    """
+    size = Stamps_NodeSizes.get(node_class)
+    if size is None:
+        sizes = []
+        try:
+            sizes = [(n.screenWidth(), n.screenHeight()) for n in nuke.allNodes(node_class)]
+        except Exception:
+            pass
+        sizes = [i for i in sizes if i[0] > 0 and i[1] > 0]
+        if not sizes:
+            return NodeClassSizes.get(node_class, NodeClassSizes["default"])
+        size = Stamps_NodeSizes[node_class] = (min(i[0] for i in sizes), min(i[1] for i in sizes))
+    return size
+
+
+def insertionPoint(node_class="NoOp"):
+    """
+    Return the position where Nuke would create a new node, without creating one:
+    under the last selected node or, with nothing selected, at the center of the Node Graph.
+
+    Args:
+        node_class (str): The class of the node to place.
+
+    Returns:
+        tuple: (x, y)
+    """
+    w, h = nodeClassSize(node_class)
+    ns = nuke.selectedNodes()
+    if ns:
+        n = ns[-1]
+        return (int(n.xpos() + n.screenWidth() / 2 - w / 2), int(n.ypos() + n.screenHeight() + 30))
+    try:
+        cx, cy = nuke.center()
+    except Exception:
+        cx, cy = 0, 0
+    return (int(cx - w / 2), int(cy - h / 2))
 
-    If no anchor is provided, prompts the user to select one.
 
-    Args:
-        anchor (nuke.Node or str): The anchor node to use.
+def defaultNodePosition():
+    """
+    Return the position where Nuke would create a new node, i.e. under the selected one.
 
     Returns:
-        nuke.Node: The created wired stamp node.
+        tuple: (x, y)
     """
-    global Stamps_LastCreated
-    nw = ""
-    nws = []
-    if anchor == "":
-        anchors = stampSelectAnchors()
-        if anchors is None:
-            return
-        if anchors:
-            for i, anchor in enumerate(anchors):
-                nw = wired(anchor=anchor)
-                nw.setInput(0, anchor)
-                nws.append(nw)
-                if i > 0:
-                    nws[i].setXYpos(nws[i - 1].xpos() + 100, nws[i - 1].ypos())
-    else:
-        ns = nuke.selectedNodes()
-        for n in ns:
-            n.setSelected(False)
-        dot = nuke.nodes.Dot()
-        dot.setXYpos(anchor.xpos(), anchor.ypos())
-        dot.setInput(0, anchor)
-        nw = wired(anchor=anchor)
-        code = "dummy = nuke.nodes.{}()".format(nw.Class())
-        namespace = {}
-        exec(code, globals(), namespace)
-        dummy = namespace["dummy"]
-        nww = dummy.screenWidth()
-        nuke.delete(dummy)
-        nuke.delete(dot)
-        for n in ns:
-            n.setSelected(True)
-        nw.setXYpos(int(anchor.xpos() + anchor.screenWidth() / 2 - nww / 2), anchor.ypos() + 56)
-        anchor.setSelected(False)
-    return nw
+    return insertionPoint()
 
 
 def stampCreateByTitle(title=""):
@@ -2135,13 +5240,10 @@ def stampCreateByTitle(title=""):
         nuke.Node or None: The created wired stamp node, or None if no matching anchor is found.
     """
     global Stamps_LastCreated
-    anchor = None
-    for a in allAnchors():
-        if a.knob("title") and a["title"].value() == title:
-            anchor = a
-            break
-    if anchor is None:
+    matches = findAnchorsByTitle(title)
+    if not matches:
         return
+    anchor = matches[0]
     nw = wired(anchor=anchor)
     nw.setInput(0, anchor)
     return nw
@@ -2154,25 +5256,43 @@ def stampDuplicateWired(wired=""):
     Args:
         wired (nuke.Node): The wired stamp node to duplicate.
     """
+    stampDuplicateWireds([wired])
+
+
+def stampDuplicateWireds(wireds):
+    """
+    Duplicate wired stamps with a single copy and paste, placing each copy next to its original.
+
+    Args:
+        wireds (list): The wired stamp nodes to duplicate.
+
+    Returns:
+        list: The new wired stamps.
+    """
+    if not wireds:
+        return []
     ns = nuke.selectedNodes()
-    for n in ns:
-        n.setSelected(False)
-    wired.setSelected(True)
-
-    clipboard = QtWidgets.QApplication.clipboard()
-    ctext = clipboard.text()
-    nuke.nodeCopy("%clipboard%")
-    wired.setSelected(False)
-    new_wired = nuke.nodePaste("%clipboard%")
-    clipboard.setText(ctext)
-    new_wired.setXYpos(wired.xpos() - 110, wired.ypos() + 55)
-    try:
-        new_wired.setInput(0, wired.input(0))
-    except Exception:
-        pass
+    names = getAvailableNames("Stamp", len(wireds))
+    scr = renameScriptNodes(nodesToScript(wireds), dict(zip([w.name() for w in wireds], names)))
+    copies = []
+    with batch("Duplicate Stamps"):
+        nodesFromScript(scr)
+        for wired, name in zip(wireds, names):
+            new_wired = nuke.toNode(name)
+            if new_wired is None:
+                continue
+            new_wired.setXYpos(wired.xpos() - new_wired.screenWidth() - 30, wired.ypos() + 55)
+            try:
+                new_wired.setInput(0, wired.input(0))
+            except Exception:
+                pass
+            new_wired.setSelected(False)
+            copies.append(new_wired)
     for n in ns:
         n.setSelected(True)
-    wired.setSelected(False)
+    for wired in wireds:
+        wired.setSelected(False)
+    return copies
 
 
 def stampType(n=""):
@@ -2185,12 +5305,7 @@ def stampType(n=""):
     Returns:
         str or bool: "anchor", "wired", or False if neither.
     """
-    if isAnchor(n):
-        return "anchor"
-    elif isWired(n):
-        return "wired"
-    else:
-        return False
+    return stampRole(n) or False
 
 
 def nodeType(n=""):
@@ -2207,20 +5322,16 @@ def nodeType(n=""):
         nodeClass = n.Class()
     except Exception:
         return False
-    if nodeClass.startswith("Deep") and nodeClass not in DeepExceptionClasses:
-        return "Deep"
-    elif nodeClass.startswith("Particle") and nodeClass not in ParticleExceptionClasses:
-        return "Particle"
-    elif nodeClass.startswith("ScanlineRender"):
-        return False
-    elif nodeClass in ["Camera", "Camera2", "Camera3"]:
-        return "Camera"
-    elif nodeClass in ["Axis", "Axis2", "Axis3"]:
-        return "Axis"
-    elif (n.knob("render_mode") and n.knob("display")) or nodeClass in ["GeoNoOp", "EditGeo"]:
-        return "3D"
-    else:
-        return "2D"
+    if not STAMPS_CLASSIFICATION_CACHE:
+        return _nodeType(n, nodeClass)
+    try:
+        return Stamps_NodeTypeCache[nodeClass]
+    except KeyError:
+        pass
+    node_type = _nodeType(n, nodeClass)
+    if nodeClass != "Group":  # Groups can have any knobs, so they're checked one by one.
+        Stamps_NodeTypeCache[nodeClass] = node_type
+    return node_type
 
 
 def allAnchors(selection=""):
@@ -2233,12 +5344,9 @@ def allAnchors(selection=""):
     Returns:
         list: Anchor nodes.
     """
-    nodes = nuke.allNodes()
-    if selection == "":
-        anchors = [a for a in nodes if isAnchor(a)]
-    else:
-        anchors = [a for a in nodes if a in selection and isAnchor(a)]
-    return anchors
+    if selection != "":
+        return StampQuery().anchors().among(selection).nodes()
+    return stampRegistry().allAnchors()
 
 
 def allWireds(selection=""):
@@ -2251,12 +5359,9 @@ def allWireds(selection=""):
     Returns:
         list: Wired nodes.
     """
-    nodes = nuke.allNodes()
-    if selection == "":
-        wireds = [a for a in nodes if isWired(a)]
-    else:
-        wireds = [a for a in nodes if a in selection and isWired(a)]
-    return wireds
+    if selection != "":
+        return StampQuery().wireds().among(selection).nodes()
+    return stampRegistry().allWireds()
 
 
 def totalAnchors(selection=""):
@@ -2282,17 +5387,7 @@ def allTags(selection=""):
     Returns:
         list: Sorted list of tags.
     """
-    all_tags = set()
-    for ni in allAnchors():
-        try:
-            tags_value = ni["tags"].value()
-            tags = re.split(" *, *", tags_value.strip())
-            all_tags.update(tags)
-        except Exception:
-            pass
-    all_tags = [i for i in list(all_tags) if i]
-    all_tags.sort(key=str.lower)
-    return all_tags
+    return stampRegistry().allTags()
 
 
 def findAnchorsByTitle(title="", selection=""):
@@ -2308,11 +5403,9 @@ def findAnchorsByTitle(title="", selection=""):
     """
     if title == "":
         return None
-    if selection == "":
-        found_anchors = [a for a in allAnchors() if a.knob("title") and a.knob("title").value() == title]
-    else:
-        found_anchors = [a for a in selection if
-                         a in allAnchors() and a.knob("title") and a.knob("title").value() == title]
+    found_anchors = stampRegistry().anchorsByTitle(title)
+    if selection != "":
+        found_anchors = [a for a in found_anchors if a in selection]
     return found_anchors
 
 
@@ -2341,10 +5434,7 @@ def isAnchor(node=""):
     Returns:
         bool: True if the node is an Anchor, otherwise False.
     """
-    try:
-        return all(node.knob(i) for i in ["identifier", "title"]) and node["identifier"].value() == "anchor"
-    except Exception:
-        return False
+    return stampRole(node) == "anchor"
 
 
 def isWired(node=""):
@@ -2357,10 +5447,7 @@ def isWired(node=""):
     Returns:
         bool: True if the node is Wired, otherwise False.
     """
-    try:
-        return all(node.knob(i) for i in ["identifier", "title"]) and node["identifier"].value() == "wired"
-    except Exception:
-        return False
+    return stampRole(node) == "wired"
 
 
 def findBackdrops(node=""):
@@ -2375,31 +5462,17 @@ def findBackdrops(node=""):
     """
     if node == "":
         return []
-    x = node.xpos()
-    y = node.ypos()
-    w = node.screenWidth()
-    h = node.screenHeight()
-
-    backdrops = []
-    for b in nuke.allNodes("BackdropNode"):
-        try:
-            bx = int(b['xpos'].value())
-            by = int(b['ypos'].value())
-            br = int(b['bdwidth'].value()) + bx
-            bt = int(b['bdheight'].value()) + by
-            if x >= bx and (x + w) <= br and y > by and (y + h) <= bt:
-                backdrops.append(b)
-        except Exception:
-            continue
-    return backdrops
+    return [e[4] for e in stampRegistry(node).backdrops().entries(node)]
 
 
 def realInput(node, stopOnLabel=False, mode=""):
     """
-    Recursively find the first input node that is not a Dot or a Stamp.
+    Find the first input node upstream that is not a Dot or a Stamp.
 
     If stopOnLabel is True, stops if a Dot/NoOp with a non-empty label is encountered.
     Mode can be "title" or "tags" to ignore certain classes.
+    The walk stops at the first node already visited if the inputs loop, and its results are
+    memoized while startInputMemo is in effect.
 
     Args:
         node (nuke.Node): The starting node.
@@ -2409,21 +5482,108 @@ def realInput(node, stopOnLabel=False, mode=""):
     Returns:
         nuke.Node: The resulting node.
     """
+    memo = Stamps_InputMemo
+    path = []
+    visited = set()
+    n = node
     try:
-        n = node
-        if stampType(n) or n.Class() in InputIgnoreClasses or \
-                (mode == "title" and n.Class() in TitleIgnoreClasses) or \
-                (mode == "tags" and n.Class() in TagsIgnoreClasses):
+        while True:
+            if memo is not None and (n, mode, stopOnLabel) in memo:
+                result = memo[(n, mode, stopOnLabel)]
+                break
+            if n in visited:
+                result = n
+                break
+            visited.add(n)
+            path.append(n)
+            nodeClass = n.Class()
+            if not (stampType(n) or nodeClass in InputIgnoreClasses or
+                    (mode == "title" and nodeClass in TitleIgnoreClasses) or
+                    (mode == "tags" and nodeClass in TagsIgnoreClasses)):
+                result = n
+                break
             if stopOnLabel and n.knob("label") and n["label"].value().strip() != "":
-                return n
-            if n.input(0):
-                return realInput(n.input(0), stopOnLabel, mode)
-            else:
-                return n
-        else:
-            return n
+                result = n
+                break
+            if not n.input(0):
+                result = n
+                break
+            n = n.input(0)
     except Exception:
         return node
+    if memo is not None:
+        for n in path:
+            memo[(n, mode, stopOnLabel)] = result
+    return result
+
+
+def startInputMemo():
+    """
+    Start memoizing realInput, so that upstream chains shared by several nodes are walked once.
+    Only meant for operations that don't rewire what's upstream of the nodes they process.
+
+    Returns:
+        bool: True if this call started the memo, so it has to call stopInputMemo afterwards.
+    """
+    global Stamps_InputMemo
+    if Stamps_InputMemo is not None:
+        return False
+    Stamps_InputMemo = {}
+    return True
+
+
+def stopInputMemo():
+    """Stop memoizing realInput and forget its results."""
+    global Stamps_InputMemo
+    Stamps_InputMemo = None
+
+
+def _scriptFile(script=""):
+    """Write a node script to a new temporary file, and return its path."""
+    fd, path = tempfile.mkstemp(prefix="stamps_", suffix=".nk")
+    with os.fdopen(fd, "wb") as f:
+        f.write(script.encode("utf-8") if isinstance(script, unicode) else script)
+    return path
+
+
+def _removeFile(path):
+    try:
+        os.remove(path)
+    except Exception:
+        pass
+
+
+def nodesToScript(nodes):
+    """
+    Export nodes to a TCL script string, like nodeCopy, through a temporary file instead of the clipboard.
+
+    All the nodes go in a single script, in one round trip, and the selection is left as it was.
+
+    Args:
+        nodes (list): The nodes to export, all in the current context.
+
+    Returns:
+        str: The nodes as a TCL script.
+    """
+    if not nodes:
+        return ""
+    orig_sel_nodes = nuke.selectedNodes()
+    for i in orig_sel_nodes:
+        i.setSelected(False)
+    for n in nodes:
+        n.setSelected(True)
+    path = _scriptFile()
+    try:
+        nuke.nodeCopy(path)
+        with open(path, "rb") as f:
+            script = f.read()
+        return script.decode("utf-8") if sys.version_info[0] >= 3 else script
+    finally:
+        _removeFile(path)
+        for n in nodes:
+            n.setSelected(False)
+        for i in orig_sel_nodes:
+            i.setSelected(True)
 
 
 def nodeToScript(node=""):
@@ -2436,43 +5596,167 @@ def nodeToScript(node=""):
     Returns:
         str: The node as a TCL script.
     """
-    orig_sel_nodes = nuke.selectedNodes()
     if node == "":
         node = nuke.selectedNode()
     if not node:
         return ""
-    for i in orig_sel_nodes:
-        i.setSelected(False)
-    node.setSelected(True)
-    clipboard = QtWidgets.QApplication.clipboard()
-    ctext = clipboard.text()
-    nuke.nodeCopy("%clipboard%")
-    node_as_script = clipboard.text()
-    clipboard.setText(ctext)
-    node.setSelected(False)
-    for i in orig_sel_nodes:
-        i.setSelected(True)
-    return node_as_script
+    return nodesToScript([node])
 
 
 def nodesFromScript(script=""):
     """
     Paste nodes from a given TCL script string, similar to nodePaste, without affecting the clipboard.
 
+    The pasted nodes are left selected, as with nodePaste. Wired stamps among them are registered,
+    but not queued to be reconnected like the ones the user pastes: the caller takes care of them.
+
     Args:
-        script (str): The TCL script containing node data.
+        script (str): The TCL script containing node data, of any number of nodes.
 
     Returns:
-        bool: True on success.
+        list: The pasted nodes.
     """
+    global Stamps_ScriptPaste
     if script == "":
         return
-    clipboard = QtWidgets.QApplication.clipboard()
-    ctext = clipboard.text()
-    clipboard.setText(script)
-    nuke.nodePaste("%clipboard%")
-    clipboard.setText(ctext)
-    return True
+    path = _scriptFile(script)
+    pasting = Stamps_ScriptPaste
+    Stamps_ScriptPaste = True
+    try:
+        nuke.nodePaste(path)
+    finally:
+        Stamps_ScriptPaste = pasting
+        _removeFile(path)
+    return nuke.selectedNodes()
+
+
+def renameScriptNodes(script, names):
+    """
+    Rename nodes in a TCL script string, so that they can be found by their new names once pasted.
+
+    Args:
+        script (str): The TCL script containing node data.
+        names (dict): {current name: new name}
+
+    Returns:
+        str: The script with the nodes renamed.
+    """
+    return re.sub(r"^( +name )(\S+)$", lambda m: m.group(1) + names.get(m.group(2), m.group(2)), script,
+                  flags=re.M)
+
+
+def tclSplit(script):
+    """
+    Split a TCL script, such as a node script, into its commands, each one a list of words.
+
+    Words keep their braces, quotes and escapes, and may span several lines,
+    so a command can be written back as " ".join(words).
+
+    Args:
+        script (str): The TCL script.
+
+    Returns:
+        list: The commands, as lists of words.
+    """
+    commands = []
+    words = []
+    i, size = 0, len(script)
+    while i < size:
+        c = script[i]
+        if c in "\n;":
+            if words:
+                commands.append(words)
+                words = []
+            i += 1
+        elif c in " \t\r":
+            i += 1
+        elif c == "\\" and script[i + 1:i + 2] == "\n":  # Line continuation.
+            i += 2
+        elif c == "#" and not words:  # Comment.
+            end = script.find("\n", i)
+            i = size if end < 0 else end
+        else:
+            end = _tclWordEnd(script, i)
+            words.append(script[i:end])
+            i = end
+    if words:
+        commands.append(words)
+    return commands
+
+
+def _tclWordEnd(script, i):
+    """Return the index right after the TCL word starting at index i."""
+    size = len(script)
+    if script[i] == "{":
+        depth = 0
+        while i < size:
+            c = script[i]
+            if c == "\\":
+                i += 2
+                continue
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+                if not depth:
+                    return i + 1
+            i += 1
+        return size
+    quoted = script[i] == '"'
+    if quoted:
+        i += 1
+    depth = 0  # Nested [commands].
+    while i < size:
+        c = script[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            depth += 1
+        elif c == "]" and depth:
+            depth -= 1
+        elif not depth and quoted and c == '"':
+            return i + 1
+        elif not depth and not quoted and c in " \t\r\n;":
+            return i
+        i += 1
+    return size
+
+
+# Script commands with a braced argument that aren't nodes.
+SCRIPT_COMMANDS = ["set", "push", "version", "define_window_layout_xml", "add_layer", "Root"]
+
+
+def noOpScript(script):
+    """
+    Turn every node in a TCL script string into a NoOp, keeping its basic knobs and callbacks, and all its user knobs.
+    The onCreate callback is left out, so that pasting the NoOps doesn't run it: see toNoOps.
+
+    Knobs are parsed as TCL commands, so values that span several lines are kept or dropped whole.
+    A node is a command whose last word is a braced body, whatever the words in between (i.e. "clone $C1 {").
+
+    Args:
+        script (str): The TCL script containing node data.
+
+    Returns:
+        str: The modified script.
+    """
+    basic_knobs = ["inputs", "help", "onDestroy", "knobChanged", "updateUI", "name", "autolabel",
+                   "tile_color", "gl_color", "note_font", "note_font_size", "note_font_color", "selected",
+                   "hide_input"]
+    commands = []
+    for words in tclSplit(script):
+        if len(words) >= 2 and words[-1].startswith("{") and words[0] not in SCRIPT_COMMANDS:
+            knobs = []
+            user_knobs = False  # Values after the first user knob belong to user knobs.
+            for knob in tclSplit(words[-1][1:-1]):
+                user_knobs = user_knobs or knob[0] == "addUserKnob"
+                if user_knobs or knob[0] in basic_knobs:
+                    knobs.append(" " + " ".join(knob))
+            commands.append("\n".join(["NoOp {"] + knobs + ["}"]))
+        else:
+            commands.append(" ".join(words))
+    return "\n".join(commands) + "\n"
 
 
 def stampCount(anchor_name=""):
@@ -2487,74 +5771,93 @@ def stampCount(anchor_name=""):
     """
     if anchor_name == "":
         return len(allWireds())
-    stamps = [s for s in allWireds() if s["anchor"].value() == anchor_name]
-    return len(stamps)
+    return len(wiredsByAnchorName(anchor_name))
 
 
 def toNoOp(node=""):
     """
     Convert a given node into a NoOp node while preserving its properties.
 
-    This function exports the node to script, modifies the script to create a NoOp, and then pastes it.
-
     Args:
         node (nuke.Node): The node to convert.
     """
-    global Stamps_LockCallbacks
-    Stamps_LockCallbacks = True
     if node == "":
         return
-    if node.Class() == "NoOp":
-        return
-    nsn = nuke.selectedNodes()
-    for i in nsn:
-        i.setSelected(False)
-    scr = nodeToScript(node)
-    scr = re.sub(r"\n[\s]*[\w]+[\s]*{\n", "\nNoOp {\n", scr)
-    scr = re.sub(r"^[\s]*[\w]+[\s]*{\n", "NoOp {\n", scr)
-
-    legal_starts = ["set", "version", "push", "NoOp", "help", "onCreate", "name", "knobChanged", "autolabel",
-                    "tile_color", "gl_color", "note_font", "selected", "hide_input"]
-    scr_split = scr.split("addUserKnob", 1)
-    scr_first = scr_split[0].split("\n")
-    for i, line in enumerate(scr_first):
-        if not any(line.startswith(x) or line.startswith(" " + x) for x in legal_starts):
-            scr_first[i] = ""
-    scr_first = "\n".join([i for i in scr_first if i] + [""])
-    scr_split[0] = scr_first
-    scr = "addUserKnob".join(scr_split)
-
-    node.setSelected(True)
-    xp = node.xpos()
-    yp = node.ypos()
-    xw = node.screenWidth() / 2
-    d = nuke.createNode("Dot")
-    d.setInput(0, node)
-    for i in nsn:
-        i.setSelected(True)
-    nuke.delete(node)
-    d.setSelected(False)
-    d.setSelected(True)
-    d.setXYpos(int(xp + xw - d.screenWidth() / 2), yp - 18)
-    nodesFromScript(scr)
-    n = nuke.selectedNode()
-    n.setXYpos(xp, yp)
-    nuke.delete(d)
-    for i in nsn:
-        try:
-            i.setSelected(True)
-        except Exception:
-            pass
-    Stamps_LockCallbacks = False
+    toNoOps([node])
+
+
+def toNoOps(nodes):
+    """
+    Convert nodes into NoOps, preserving their names, user knobs, positions and connections.
+
+    All the nodes are exported to a single script, which is modified to create NoOps and pasted back, in one go.
+    The NoOps get their onCreate callback back once pasted, without running it, as they're the same nodes:
+    converted stamps are registered here instead of being initialized and reconnected as new ones.
+
+    Args:
+        nodes (list): The nodes to convert.
+
+    Returns:
+        list: The new NoOp nodes.
+    """
+    nodes = [n for n in nodes if n.Class() != "NoOp"]
+    if not nodes:
+        return []
+    with batch("Convert to NoOp"):
+        nsn = nuke.selectedNodes()
+        scr = noOpScript(nodesToScript(nodes))
+        # Connections are restored by name, as the converted nodes keep theirs.
+        places = []
+        links = []
+        for node in nodes:
+            ni = node.input(0)
+            places.append((node.name(), ni.name() if ni is not None else None, node.xpos(), node.ypos(),
+                           node["onCreate"].value()))
+            for d in node.dependent(nuke.INPUTS | nuke.HIDDEN_INPUTS, False):
+                links += [(d.name(), i, node.name()) for i in range(d.inputs()) if d.input(i) == node]
+        for node in nodes:
+            nuke.delete(node)
+        nodesFromScript(scr)
+        converted = []
+        for name, input_name, xp, yp, on_create in places:
+            n = nuke.toNode(name)
+            if n is None:
+                continue
+            n["onCreate"].setValue(on_create)
+            n.setInput(0, nuke.toNode(input_name) if input_name else None)
+            n.setXYpos(xp, yp)
+            n.setSelected(False)
+            if isWired(n):
+                hideBuiltinKnobs(n, WIRED_KNOBS)
+                registerStamp(n)
+            elif isAnchor(n):
+                hideBuiltinKnobs(n, ANCHOR_KNOBS)
+                registerStamp(n)
+            converted.append(n)
+        for d_name, i, name in links:
+            d = nuke.toNode(d_name)
+            if d is not None:
+                d.setInput(i, nuke.toNode(name))
+        for i in nsn:
+            try:
+                i.setSelected(True)
+            except Exception:
+                pass
+    return converted
 
 
 def allToNoOp():
     """
     Convert all stamp nodes (Anchors and Wired) into NoOp nodes.
     """
-    for n in nuke.allNodes():
-        if stampType(n) and n.Class() != "NoOp":
-            toNoOp(n)
+    def work(ns):
+        return len(toNoOps(ns))
+
+    def done(job):
+        if job.cancelled or job.error is not None:
+            nuke.message("Converted {} Stamps to NoOp.{}".format(sum(job.results), jobStatus(job)))
+
+    runJob("Converting Stamps to NoOp", [n for n in allAnchors() + allWireds() if n.Class() != "NoOp"], work, done)
 
 
 def createWHotboxButtons():
@@ -2587,36 +5890,29 @@ def refreshStamps(ns=""):
     Args:
         ns (list, optional): A list of nodes to refresh. If empty, refreshes all wired stamps.
     """
-    stamps = allWireds(ns)
-    error_count = 0
-    failed = []
-    for s in stamps:
-        if not wiredReconnect(s):
-            error_count += 1
-            failed.append(s)
-        else:
-            try:
-                s["reconnect_this"].execute()
-            except Exception:
-                pass
-    failed_names = ", ".join([i.name() for i in failed])
-    if error_count == 0:
-        if ns == "":
-            nuke.message("All Stamps refreshed! No errors detected.")
-        else:
-            nuke.message("Selected Stamps refreshed! No errors detected.")
-    else:
-        # Deselect all, then select only the failed nodes.
-        for i in nuke.selectedNodes():
-            i.setSelected(False)
-        for i in failed:
-            i.setSelected(True)
-        if ns == "":
-            nuke.message(
-                "All Stamps refreshed. Found {0} connection error/s:\n\n{1}".format(str(error_count), failed_names))
+    wireds = allWireds(ns)
+    cost = reconnectPlanCost(planReconnect(wireds))
+    if not confirmCost(cost["cost"], "This will reconnect {} Stamps.".format(cost["changes"])):
+        return
+
+    def work(chunk):
+        # Planned chunk by chunk, as the graph can change between ticks.
+        return applyReconnectPlan(planReconnect(chunk))
+
+    def done(job):
+        result = {"reconnected": [], "failed": []}
+        for r in job.results:
+            result["reconnected"] += r["reconnected"]
+            result["failed"] += r["failed"]
+        scope = "All" if ns == "" else "Selected"
+        if not result["failed"] and not job.cancelled and job.error is None:
+            nuke.message("{} Stamps refreshed! No errors detected.".format(scope))
+        elif not result["failed"]:
+            nuke.message("{} Stamps refreshed.{}".format(scope, jobStatus(job)))
         else:
-            nuke.message("Selected Stamps refreshed. Found {0} connection error/s:\n\n{1}".format(str(error_count),
-                                                                                                  failed_names))
+            reconnectMessage(result, "{} Stamps refreshed.{}".format(scope, jobStatus(job)))
+
+    runJob("Refreshing Stamps", wireds, work, done)
 
 
 def addTags(ns=""):
@@ -2639,45 +5935,56 @@ def addTags(ns=""):
         all_nodes = stamps_addTags_panel.allNodes
         added_tags = stamps_addTags_panel.tags.strip()
         added_tags = re.split(r"[\s]*,[\s]*", added_tags)
-        count = 0
-        for n in ns:
-            # Determine which knob holds the tags
-            if isAnchor(n):
-                tags_knob = n.knob("tags")
-            elif isWired(n):
-                a_name = n.knob("anchor").value()
-                try:
-                    if nuke.exists(a_name):
-                        a = nuke.toNode(a_name)
-                        # Skip if the anchor is already selected or not a valid Anchor.
-                        if a in ns or not isAnchor(a):
+        ns_names = set(n.name() for n in ns)
+
+        def work(chunk):
+            count = 0
+            with batch("Add tags"):
+                for n in chunk:
+                    # Determine which knob holds the tags
+                    if isAnchor(n):
+                        tags_knob = n.knob("tags")
+                    elif isWired(n):
+                        try:
+                            a = wiredAnchor(n)
+                            if a is not None:
+                                # Skip if the anchor is already selected or not a valid Anchor.
+                                if a.name() in ns_names or not isAnchor(a):
+                                    continue
+                                tags_knob = a.knob("tags")
+                            else:
+                                continue
+                        except Exception:
                             continue
-                        tags_knob = a.knob("tags")
+                    elif n.Class() not in NodeExceptionClasses:
+                        tags_knob = n.knob("stamp_tags")
+                        if not tags_knob:
+                            tags_knob = nuke.String_Knob('stamp_tags', 'Stamp Tags', "")
+                            tags_knob.setTooltip(
+                                "Stamps: Comma-separated tags you can define for each Anchor, that will help you find it when invoking the Stamp Selector by pressing the Stamps shortkey with nothing selected.")
+                            n.addKnob(tags_knob)
                     else:
                         continue
-                except Exception:
-                    continue
-            elif n.Class() not in NodeExceptionClasses:
-                tags_knob = n.knob("stamp_tags")
-                if not tags_knob:
-                    tags_knob = nuke.String_Knob('stamp_tags', 'Stamp Tags', "")
-                    tags_knob.setTooltip(
-                        "Stamps: Comma-separated tags you can define for each Anchor, that will help you find it when invoking the Stamp Selector by pressing the Stamps shortkey with nothing selected.")
-                    n.addKnob(tags_knob)
-            else:
-                continue
-            try:
-                existing_tags = re.split(r"[\s]*,[\s]*", tags_knob.value().strip())
-            except Exception:
-                existing_tags = []
-            merged_tags = list(filter(None, list(set(existing_tags + added_tags))))
-            tags_knob.setValue(", ".join(merged_tags))
-            count += 1
-        if count > 0:
-            if all_nodes:
-                nuke.message("Added the specified tag/s to {} nodes.".format(str(count)))
-            else:
-                nuke.message("Added the specified tag/s to {} Anchor Stamps.".format(str(count)))
+                    try:
+                        existing_tags = re.split(r"[\s]*,[\s]*", tags_knob.value().strip())
+                    except Exception:
+                        existing_tags = []
+                    merged_tags = list(filter(None, list(set(existing_tags + added_tags))))
+                    tags_knob.setValue(", ".join(merged_tags))
+                    registerStamp(tags_knob.node())
+                    count += 1
+                tagsChanged()
+                return count
+
+        def done(job):
+            count = sum(job.results)
+            if count > 0 or job.cancelled or job.error is not None:
+                if all_nodes:
+                    nuke.message("Added the specified tag/s to {} nodes.{}".format(str(count), jobStatus(job)))
+                else:
+                    nuke.message("Added the specified tag/s to {} Anchor Stamps.{}".format(str(count), jobStatus(job)))
+
+        runJob("Adding tags", ns, work, done)
     return
 
 
@@ -2700,76 +6007,73 @@ def renameTag(ns=""):
             ns = nuke.allNodes()
         tag_to_rename = str(stamps_renameTag_panel.tag.strip())
         tag_replace = str(stamps_renameTag_panel.tagReplace.strip())
-        count = 0
-        for n in ns:
-            # Determine the knob that contains tags.
-            if isAnchor(n):
-                tags_knob = n.knob("tags")
-            elif isWired(n):
-                a_name = n.knob("anchor").value()
-                try:
-                    if nuke.exists(a_name):
-                        a = nuke.toNode(a_name)
-                        if a in ns or not isAnchor(a):
+        ns_names = set(n.name() for n in ns)
+
+        def work(chunk):
+            count = 0
+            with batch("Rename tag"):
+                for n in chunk:
+                    # Determine the knob that contains tags.
+                    if isAnchor(n):
+                        tags_knob = n.knob("tags")
+                    elif isWired(n):
+                        try:
+                            a = wiredAnchor(n)
+                            if a is not None:
+                                if a.name() in ns_names or not isAnchor(a):
+                                    continue
+                                tags_knob = a.knob("tags")
+                            else:
+                                continue
+                        except Exception:
+                            continue
+                    elif n.Class() not in NodeExceptionClasses:
+                        tags_knob = n.knob("stamp_tags")
+                        if not tags_knob:
                             continue
-                        tags_knob = a.knob("tags")
                     else:
                         continue
-                except Exception:
-                    continue
-            elif n.Class() not in NodeExceptionClasses:
-                tags_knob = n.knob("stamp_tags")
-                if not tags_knob:
-                    continue
-            else:
-                continue
 
-            existing_tags = list(filter(None, re.split(r"[\s]*,[\s]*", tags_knob.value())))
-            # Replace occurrences of the tag with the new tag.
-            merged_tags = [tag_replace if x == tag_to_rename else x for x in existing_tags]
-            merged_tags = [i for i in merged_tags if i]
-            if merged_tags != existing_tags:
-                tags_knob.setValue(", ".join(merged_tags))
-                count += 1
-        if count > 0:
-            nuke.message("Renamed the specified tag on {} nodes.".format(str(count)))
+                    existing_tags = list(filter(None, re.split(r"[\s]*,[\s]*", tags_knob.value())))
+                    # Replace occurrences of the tag with the new tag.
+                    merged_tags = [tag_replace if x == tag_to_rename else x for x in existing_tags]
+                    merged_tags = [i for i in merged_tags if i]
+                    if merged_tags != existing_tags:
+                        tags_knob.setValue(", ".join(merged_tags))
+                        registerStamp(tags_knob.node())
+                        count += 1
+                tagsChanged()
+                return count
+
+        def done(job):
+            count = sum(job.results)
+            if count > 0 or job.cancelled or job.error is not None:
+                nuke.message("Renamed the specified tag on {} nodes.{}".format(str(count), jobStatus(job)))
+
+        runJob("Renaming tag", ns, work, done)
     return
 
 
 def selectedReconnectByName():
     """
-    For each selected wired stamp, execute its 'reconnect_this' knob to reconnect by stored Anchor name.
+    Reconnect the selected wired stamps to their stored Anchors.
     """
-    ns = [n for n in nuke.selectedNodes() if isWired(n)]
-    for n in ns:
-        try:
-            n["reconnect_this"].execute()
-        except Exception:
-            pass
+    reconnectMessage(reconnectStamps(StampQuery().wireds().selected().nodes()))
 
 
 def selectedReconnectByTitle():
     """
-    For each selected wired stamp, execute its 'reconnect_by_title_this' knob to reconnect by title.
+    Reconnect the selected wired stamps to the Anchors with their titles, in a single batch.
+    Titles shared by several Anchors resolve to the selected Anchor, if it's one of them.
     """
-    ns = [n for n in nuke.selectedNodes() if isWired(n)]
-    for n in ns:
-        try:
-            n["reconnect_by_title_this"].execute()
-        except Exception:
-            pass
+    wiredReconnectByTitleSelected()
 
 
 def selectedReconnectBySelection():
     """
-    For each selected wired stamp, execute its 'reconnect_by_selection_this' knob to force reconnect by selection.
+    Reconnect the selected wired stamps to the selected Anchor, in a single batch.
     """
-    ns = [n for n in nuke.selectedNodes() if isWired(n)]
-    for n in ns:
-        try:
-            n["reconnect_by_selection_this"].execute()
-        except Exception:
-            pass
+    wiredReconnectBySelectionSelected()
 
 
 def selectedToggleAutorec():
@@ -2852,15 +6156,19 @@ def stampBuildMenus():
         m.addCommand('Edit/Stamps/Add tag\/s to selected nodes', 'stamps.addTags()')
         m.addCommand('Edit/Stamps/Rename Stamp tag', 'stamps.renameTag()')
         m.addCommand('Edit/Stamps/Refresh all Stamps', 'stamps.refreshStamps()')
+        m.addCommand('Edit/Stamps/Preview Refresh all Stamps', 'stamps.previewReconnect()')
         m.addCommand('Edit/Stamps/Selected/Reconnect by Name', 'stamps.selectedReconnectByName()')
         m.addCommand('Edit/Stamps/Selected/Reconnect by Title', 'stamps.selectedReconnectByTitle()')
         m.addCommand('Edit/Stamps/Selected/Reconnect by Selection', 'stamps.selectedReconnectBySelection()')
         m.menu('Edit').menu('Stamps').menu('Selected').addSeparator()
         m.addCommand('Edit/Stamps/Selected/Refresh', 'stamps.refreshStamps(nuke.selectedNodes())')
+        m.addCommand('Edit/Stamps/Selected/Preview Reconnect by Title',
+                     'stamps.previewReconnect(stamps.allWireds(nuke.selectedNodes()), "title")')
         m.addCommand('Edit/Stamps/Selected/Select Similar', 'stamps.selectedSelectSimilar()')
         m.addCommand('Edit/Stamps/Selected/Toggle auto-rec... by title ', 'stamps.selectedToggleAutorec()')
 
         m.addCommand('Edit/Stamps/Advanced/Convert all Stamps to NoOp', 'stamps.allToNoOp()')
+        m.addCommand('Edit/Stamps/Advanced/Save callback timings...', 'stamps.telemetrySave()')
         m.menu('Edit').menu('Stamps').addSeparator()
         m.addCommand('Edit/Stamps/GitHub', 'stamps.showInGithub()')
         m.addCommand('Edit/Stamps/Nukepedia', 'stamps.showInNukepedia()')
@@ -2923,28 +6231,41 @@ def goStamp(ns=""):
             return
     else:
         # Warn if the selection is too big.
-        if len(ns) > 10 and not nuke.ask("You have {} nodes selected.\nDo you want to make stamps for all of them?".format(len(ns))):
+        plain = [n for n in ns if not stampType(n) and n.Class() not in NodeExceptionClasses]
+        created = len(ns) + len(plain)  # A Stamp per selected stamp, an Anchor and a Stamp per other node.
+        if not confirmCost(estimateCost(nodes=created, dialogs=min(len(plain), 1)),
+                           "You have {} nodes selected.\nDo you want to make stamps for all of them?".format(len(ns))):
             return
         extra_tags = []
-        for n in ns:
-            try:
-                if n in NodeExceptionClasses:
-                    continue
-                elif isAnchor(n):
-                    stampCreateWired(n)  # Create a child stamp for the anchor.
-                elif isWired(n):
-                    stampDuplicateWired(n)  # Duplicate the wired stamp.
-                else:
-                    if n.knob("stamp_tags"):
-                        stampCreateAnchor(n, extra_tags=n.knob("stamp_tags").value().split(","), no_default_tag=True)
+        wireds = [n for n in ns if isWired(n)]
+        # Reserve the names of the wired stamps in one go, instead of looking them up one by one.
+        reserveNames("Stamp", len([n for n in ns if isAnchor(n)]))
+        memo_started = startInputMemo()
+        try:
+            for n in ns:
+                try:
+                    if n.Class() in NodeExceptionClasses or (len(plain) > 1 and n in plain) or n in wireds:
+                        continue
+                    elif isAnchor(n):
+                        stampCreateWired(n)  # Create a child stamp for the anchor.
                     else:
-                        extra_tags = stampCreateAnchor(n, extra_tags=extra_tags)
-                    if "Cryptomatte" in n.Class() and n.knob("matteOnly"):
-                        n['matteOnly'].setValue(1)
-            except Exception:
-                continue
+                        if n.knob("stamp_tags"):
+                            stampCreateAnchor(n, extra_tags=n.knob("stamp_tags").value().split(","), no_default_tag=True)
+                        else:
+                            extra_tags = stampCreateAnchor(n, extra_tags=extra_tags)
+                except Exception:
+                    continue
+        finally:
+            releaseNames("Stamp")
+            if memo_started:
+                stopInputMemo()
+        if wireds:
+            stampDuplicateWireds(wireds)  # Duplicate the wired stamps, with a single copy and paste.
+        if len(plain) > 1:
+            stampCreateAnchors(plain)  # One table for all of them, instead of a panel per node.
 
 if nuke.GUI:
     stampBuildMenus()
+    stampAddCallbacks()
 
 addIncludesPath()
@@ -106,6 +106,17 @@ DeepExceptionClasses = ["DeepToImage","DeepHoldout","DeepHoldout2"] # Nodes with
 NodeExceptionClasses = ["Viewer"] # Nodes that won't accept stamps
 ParticleExceptionClasses = ["ParticleToImage"] # Nodes with "Particle" in class and an input called "particles" that don't classify as particles.
 
+# Usage statistics for the "popular" list of the Stamp Selector, ranked by frecency (how often and how recently each Anchor is used).
+STAMPS_USAGE_FILE = "~/.nuke/stamps_usage.json" # Per-user file where they're kept, per script. None: don't keep them between sessions.
+STAMPS_USAGE_HALF_LIFE = 14 # Days after which a past use of an Anchor counts half.
+
+STAMPS_CONFIRM_COST = 100 # Bulk operations (i.e. making Stamps for many nodes) estimated to cost more than this many node creations ask for confirmation first.
+STAMPS_CLASSIFICATION_CACHE = True # Remember node types per class and which nodes are stamps. False: check them every time (for debugging).
+STAMPS_TELEMETRY = False # True: record how long the Stamps callbacks take (Edit/Stamps/Advanced/Save callback timings...), for bug reports about lag.
+STAMPS_CALLBACK_BUDGET = 0.05 # Seconds a recorded callback may take before logging a warning with its node and knob. None: don't warn.
+STAMPS_PASTE_SUMMARY = False # True: after pasting Stamps, tell which ones got connected to a different Anchor, or couldn't be reconnected.
+STAMPS_NODE_TEMPLATES = True # Create stamps by pasting a node script prepared once per session, which is much faster. False: build them knob by knob.
+
 # The next two constants define the node classes that will be ignored when looking for the title or tags of a node.
 # This means, it will look for the node's first input instead, recursively, until it finds a node that doesn't belong to these classes.
 TitleIgnoreClasses = ["NoOp", "Dot", "Reformat", "DeepReformat", "Crop"]
@@ -0,0 +1,95 @@
+"""
+Makes the stamps module importable by the tests, with or without Nuke.
+
+Only the parts of Stamps that don't need a running Nuke are tested. When Nuke's Python modules aren't
+available, minimal stand-ins for nuke, nukescripts and the Qt bindings are registered, just enough for
+stamps to be imported. Tests build node-like objects from FakeNode where they need them.
+"""
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stamps"))
+
+
+class _StandIn(types.ModuleType):
+    """Module whose unknown attributes are empty classes, so they can be called, subclassed or compared."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = type(name, (object,), {"__init__": lambda self, *args, **kwargs: None})
+        setattr(self, name, value)
+        return value
+
+
+def _standIn(name, **attrs):
+    module = _StandIn(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+try:
+    import nuke  # noqa: F401
+except ImportError:
+    _standIn("nuke", GUI=False, env={"nukex": False}, INPUTS=1, HIDDEN_INPUTS=2,
+             pluginAddPath=lambda *args, **kwargs: None)
+    _standIn("nukescripts")
+
+try:
+    import PySide2  # noqa: F401
+except ImportError:
+    try:
+        import PySide6  # noqa: F401
+    except ImportError:
+        qt = _standIn("PySide2")
+        qt.QtWidgets = _standIn("PySide2.QtWidgets")
+        qt.QtCore = _standIn("PySide2.QtCore")
+
+
+class FakeKnob(object):
+    """Knob holding a fixed value."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+
+class FakeNode(object):
+    """Node with a name, a position, a size, a class and the knobs given as keyword arguments."""
+
+    def __init__(self, name="", x=0, y=0, w=80, h=18, node_class="NoOp", **knobs):
+        self._name = name
+        self._x, self._y, self._w, self._h = x, y, w, h
+        self._class = node_class
+        self._knobs = dict((k, FakeKnob(v)) for k, v in knobs.items())
+
+    def name(self):
+        return self._name
+
+    def fullName(self):
+        return self._name
+
+    def Class(self):
+        return self._class
+
+    def xpos(self):
+        return self._x
+
+    def ypos(self):
+        return self._y
+
+    def screenWidth(self):
+        return self._w
+
+    def screenHeight(self):
+        return self._h
+
+    def knob(self, name):
+        return self._knobs.get(name)
+
+    def __getitem__(self, name):
+        return self._knobs[name]
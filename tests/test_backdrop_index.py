@@ -0,0 +1,62 @@
+import stamps
+from conftest import FakeNode
+
+
+def backdrop(name, x, y, w, h, label="", bookmark=True):
+    return FakeNode(name, x, y, 0, 0, xpos=x, ypos=y, bdwidth=w, bdheight=h, label=label, bookmark=bookmark)
+
+
+def contained(index, node):
+    return sorted(e[4].name() for e in index.entries(node))
+
+
+def test_backdrop_spanning_many_cells_is_found_from_any_of_them():
+    cs = stamps.BackdropIndex.cell_size
+    big = backdrop("Big", -cs - 100, -cs - 100, 3 * cs, 3 * cs)
+    index = stamps.BackdropIndex([big])
+    for x in range(-cs - 90, 2 * cs - 200, cs // 4):
+        for y in range(-cs - 90, 2 * cs - 200, cs // 4):
+            assert contained(index, FakeNode("n", x, y)) == ["Big"], (x, y)
+
+
+def test_nodes_at_cell_edges():
+    cs = stamps.BackdropIndex.cell_size
+    bd = backdrop("Bd", 0, 0, 2 * cs, 2 * cs)
+    index = stamps.BackdropIndex([bd])
+    for x, y in [(cs - 1, cs - 1), (cs, cs), (cs - 40, 10), (10, cs - 9), (2 * cs - 80, 2 * cs - 18)]:
+        assert contained(index, FakeNode("n", x, y)) == ["Bd"], (x, y)
+
+
+def test_only_fully_contained_nodes_match():
+    bd = backdrop("Bd", 0, 0, 200, 100)
+    index = stamps.BackdropIndex([bd])
+    assert contained(index, FakeNode("inside", 10, 10)) == ["Bd"]
+    assert contained(index, FakeNode("overlapping_right", 150, 10)) == []
+    assert contained(index, FakeNode("overlapping_bottom", 10, 90)) == []
+    assert contained(index, FakeNode("on_top_edge", 10, 0)) == []
+    assert contained(index, FakeNode("outside", 300, 300)) == []
+
+
+def test_nested_and_overlapping_backdrops():
+    outer = backdrop("Outer", 0, 0, 2000, 2000, label="FG")
+    inner = backdrop("Inner", 500, 500, 300, 300, label="plates")
+    other = backdrop("Other", 1500, 1500, 300, 300)
+    index = stamps.BackdropIndex([outer, inner, other])
+    assert contained(index, FakeNode("n", 550, 550)) == ["Inner", "Outer"]
+    assert contained(index, FakeNode("n", 1550, 1550)) == ["Other", "Outer"]
+    assert contained(index, FakeNode("n", 100, 1600)) == ["Outer"]
+    assert sorted(e[5] for e in index.entries(FakeNode("n", 550, 550))) == ["FG", "plates"]
+
+
+def test_matches_brute_force():
+    import random
+    rng = random.Random(4)
+    backdrops = [backdrop("B{}".format(i), rng.randrange(-3000, 3000), rng.randrange(-3000, 3000),
+                          rng.randrange(100, 2500), rng.randrange(100, 2500)) for i in range(40)]
+    index = stamps.BackdropIndex(backdrops)
+    for _ in range(500):
+        n = FakeNode("n", rng.randrange(-3500, 3500), rng.randrange(-3500, 3500))
+        expected = sorted(b.name() for b in backdrops
+                          if n.xpos() >= b.xpos() and n.xpos() + 80 <= b.xpos() + b["bdwidth"].value()
+                          and n.ypos() > b.ypos() and n.ypos() + 18 <= b.ypos() + b["bdheight"].value())
+        assert contained(index, n) == expected
@@ -0,0 +1,63 @@
+import stamps
+from conftest import FakeNode
+
+
+def node(x, y, w=80, h=18, node_class="NoOp"):
+    return FakeNode("", x, y, w, h, node_class)
+
+
+def overlap(a, b):
+    return a[0] < b[0] + b[2] and a[0] + a[2] > b[0] and a[1] < b[1] + b[3] and a[1] + a[3] > b[1]
+
+
+def test_empty_grid_places_at_the_start():
+    grid = stamps.NodeGrid()
+    assert grid.place(100, 200, 80, 18, 120, 60, 4) == (100, 200)
+
+
+def test_skips_taken_positions_along_the_row():
+    grid = stamps.NodeGrid([node(0, 0), node(120, 0)])
+    assert grid.place(0, 0, 80, 18, 120, 60, 4) == (240, 0)
+
+
+def test_wraps_to_the_next_row():
+    grid = stamps.NodeGrid([node(x, 0) for x in (0, 120, 240)])
+    assert grid.place(0, 0, 80, 18, 120, 60, 3) == (0, 60)
+
+
+def test_placed_rectangles_are_taken():
+    grid = stamps.NodeGrid()
+    spots = [grid.place(0, 0, 80, 18, 120, 60, 2) for _ in range(5)]
+    assert spots == [(0, 0), (120, 0), (0, 60), (120, 60), (0, 120)]
+
+
+def test_keeps_the_margin():
+    grid = stamps.NodeGrid([node(0, 0)], margin=10)
+    assert not grid.free(85, 0, 80, 18)
+    assert grid.free(90, 0, 80, 18)
+    assert grid.place(0, 0, 80, 18, 45, 60, 10) == (90, 0)
+
+
+def test_backdrops_are_ignored():
+    grid = stamps.NodeGrid([node(0, 0, 500, 500, node_class="BackdropNode")])
+    assert grid.place(10, 10, 80, 18, 120, 60, 4) == (10, 10)
+
+
+def test_rectangles_spanning_cells():
+    cell = stamps.NodeGrid.CELL
+    grid = stamps.NodeGrid([node(cell - 40, cell - 10, 3 * cell, 2 * cell)], margin=0)
+    x, y = grid.place(cell, cell, 80, 18, cell // 2, cell // 2, 8)
+    assert not overlap((x, y, 80, 18), (cell - 40, cell - 10, 3 * cell, 2 * cell))
+    assert (x, y) == (4 * cell, cell)
+
+
+def test_never_overlaps_random_nodes():
+    import random
+    rng = random.Random(16)
+    nodes = [node(rng.randrange(-1000, 1000), rng.randrange(-1000, 1000)) for _ in range(200)]
+    grid = stamps.NodeGrid(nodes, margin=0)
+    taken = [(n.xpos(), n.ypos(), 80, 18) for n in nodes]
+    for _ in range(50):
+        x, y = grid.place(-1000, -1000, 80, 18, 100, 40, 20)
+        assert not any(overlap((x, y, 80, 18), t) for t in taken)
+        taken.append((x, y, 80, 18))
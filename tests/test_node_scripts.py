@@ -0,0 +1,81 @@
+import pytest
+
+import stamps
+
+SCRIPT = r"""set cut_paste_input [stack 0]
+version 14.0 v5
+push $cut_paste_input
+Blur {
+ size 12
+ name Blur1
+ label "two\nlines {with} braces"
+ onCreate "print(\"created\")"
+ selected true
+ xpos 100
+ ypos -20
+}
+"""
+
+
+def test_split_commands_and_words():
+    assert stamps.tclSplit("a b c\nd {e f};g \"h i\"\n\n") == [["a", "b", "c"], ["d", "{e f}"], ["g", '"h i"']]
+
+
+def test_split_keeps_nested_braces_quotes_and_brackets():
+    commands = stamps.tclSplit('knob {a {b} "c"}\nother "x [y \\"z\\"] w" [cmd "q r"]\n')
+    assert commands == [["knob", '{a {b} "c"}'], ["other", '"x [y \\"z\\"] w"', '[cmd "q r"]']]
+
+
+def test_split_multiline_words_and_continuations():
+    assert stamps.tclSplit("a {\nb\n c}\nd \\\n e\n") == [["a", "{\nb\n c}"], ["d", "e"]]
+    assert stamps.tclSplit('a "line\\\nnext"') == [["a", '"line\\\nnext"']]
+
+
+def test_split_comments_and_escapes():
+    assert stamps.tclSplit("# comment\na b#c\n") == [["a", "b#c"]]
+    assert stamps.tclSplit("a \\{b \\}c") == [["a", "\\{b", "\\}c"]]
+
+
+def test_split_round_trips():
+    for words in stamps.tclSplit(SCRIPT):
+        assert stamps.tclSplit(" ".join(words)) == [words]
+
+
+@pytest.mark.parametrize("script, start, end", [
+    ("{a {b} c} d", 0, 9),
+    ('"a b" c', 0, 5),
+    ('"a \\" b" c', 0, 8),
+    ("abc def", 0, 3),
+    ("a[b c]d e", 0, 7),
+    ("x {unclosed", 2, 11),
+    ('{a "} b', 0, 5),
+])
+def test_word_end(script, start, end):
+    assert stamps._tclWordEnd(script, start) == end
+
+
+def test_noop_keeps_basic_and_user_knobs():
+    script = stamps.noOpScript(SCRIPT.replace(" ypos -20\n", " ypos -20\n addUserKnob {1 title l Title:}\n"
+                                                              " title \"a {b}\"\n size 4\n"))
+    nodes = [words for words in stamps.tclSplit(script) if words[0] == "NoOp"]
+    assert len(nodes) == 1
+    knobs = [words[0] for words in stamps.tclSplit(nodes[0][-1][1:-1])]
+    assert knobs == ["name", "selected", "addUserKnob", "title", "size"]
+    assert stamps.tclSplit(script)[:3] == stamps.tclSplit(SCRIPT)[:3]
+
+
+def test_noop_drops_on_create():
+    assert "onCreate" not in stamps.noOpScript(SCRIPT)
+    assert "onDestroy" in stamps.noOpScript(SCRIPT.replace("onCreate", "onDestroy"))
+
+
+@pytest.mark.parametrize("header", ["Blur {", "clone $C7f10 {", "Group 1 {", "\"My Gizmo\" {"])
+def test_noop_matches_any_node_header(header):
+    script = stamps.noOpScript(SCRIPT.replace("Blur {", header))
+    assert "\nNoOp {\n name Blur1\n" in script
+    assert header not in script
+
+
+def test_noop_leaves_script_commands_alone():
+    script = "add_layer {depth depth.Z}\nversion 14.0 v5\nset N1 [stack 0]\nNoOp {\n name N1\n}\n"
+    assert stamps.noOpScript(script) == script
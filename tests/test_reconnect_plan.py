@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import stamps
+from conftest import FakeNode
+
+
+@pytest.fixture
+def plan(monkeypatch):
+    monkeypatch.setattr(stamps, "_usageScript", lambda: "/shots/sh010/comp_v001.nk")
+    anchor, other = FakeNode("Anchor_plate"), FakeNode("Grade1")
+    return [
+        {"wired": FakeNode("Stamp1"), "current": None, "target": anchor, "strategy": "name", "reason": "Disconnected"},
+        {"wired": FakeNode("Stamp2"), "current": other, "target": anchor, "strategy": "name",
+         "reason": "Connected to Grade1"},
+        {"wired": FakeNode("Stamp3"), "current": anchor, "target": anchor, "strategy": "name",
+         "reason": "Link to Anchor_plate out of date"},
+        {"wired": FakeNode("Group1.Stamp4"), "current": None, "target": None, "strategy": "title",
+         "reason": "2 Anchors titled 'plate'"},
+    ]
+
+
+def test_json_uses_full_node_names(plan):
+    changes = json.loads(stamps.reconnectPlanToJson(plan))["changes"]
+    assert [c["wired"] for c in changes] == ["Stamp1", "Stamp2", "Stamp3", "Group1.Stamp4"]
+    assert changes[0] == {"wired": "Stamp1", "current": None, "target": "Anchor_plate", "strategy": "name",
+                          "reason": "Disconnected"}
+    assert changes[1]["current"] == "Grade1"
+    assert changes[3]["target"] is None
+    assert changes[3]["reason"] == "2 Anchors titled 'plate'"
+
+
+def test_json_includes_script_and_cost(plan):
+    document = json.loads(stamps.reconnectPlanToJson(plan))
+    assert document["script"] == "/shots/sh010/comp_v001.nk"
+    assert document["cost"] == stamps.reconnectPlanCost(plan)
+    assert document["cost"]["changes"] == 4
+    assert document["cost"]["reconnects"] == 2
+    assert document["cost"]["relinks"] == 1
+    assert document["cost"]["failures"] == 1
+
+
+def test_json_of_empty_plan():
+    document = json.loads(stamps.reconnectPlanToJson([]))
+    assert document["changes"] == []
+    assert document["cost"]["changes"] == 0
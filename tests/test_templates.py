@@ -0,0 +1,108 @@
+import re
+
+import pytest
+
+import stamps
+
+TITLES = ["plate", "my {plate}", "{", "}", "a}b{c", "$env(HOME)", "[exec rm -rf /]", "[", "]", 'say "hi"', "back\\slash",
+          "two\nlines", "%(name)s", "tags", ""]
+
+
+def unquote(word):
+    """Read back a TCL word as Nuke does for knob values."""
+    if word.startswith("{") and word.endswith("}"):
+        return word[1:-1]
+    if not word.startswith('"'):
+        return word
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), word[1:-1])
+
+
+def knobValues(script):
+    """Return {knob: value} of the value lines of the single node in a node script."""
+    node = [words for words in stamps.tclSplit(script) if words[-1].startswith("{")][0]
+    values = {}
+    for words in stamps.tclSplit(node[-1][1:-1]):
+        if words[0] == "addUserKnob":
+            knob = stamps.tclSplit(words[1][1:-1])[0]
+            if "T" in knob:
+                values.setdefault("T " + knob[1], unquote(knob[knob.index("T") + 1]))
+        else:
+            assert len(words) == 2, words
+            values[words[0]] = unquote(words[1])
+    return values
+
+
+@pytest.fixture(autouse=True)
+def templates(monkeypatch):
+    monkeypatch.setattr(stamps, "Stamps_Templates", {})
+    monkeypatch.setattr(stamps.nuke, "TABBEGINCLOSEDGROUP", 2, raising=False)
+
+
+def wiredScript(title, place=False):
+    values = {"name": "Stamp1", "title": title, "anchor": "Anchor_1", "anchor_id": "0123abcd"}
+    return stamps.templateScript(stamps.stampTemplate("wired", "2D"), values, place)
+
+
+def anchorScript(title, tags=""):
+    values = {"name": "Anchor_1", "title": title, "tags": tags, "anchor_id": "0123abcd"}
+    return stamps.templateScript(stamps.stampTemplate("anchor", "2D"), values, False)
+
+
+@pytest.mark.parametrize("title", TITLES)
+def test_wired_values_read_back_unchanged(title):
+    values = knobValues(wiredScript(title))
+    assert values["name"] == "Stamp1"
+    assert values["title"] == title
+    assert values["T prev_title"] == title
+    assert values["anchor"] == "Anchor_1"
+    assert values["T anchor_id"] == "0123abcd"
+
+
+@pytest.mark.parametrize("title", TITLES)
+def test_anchor_values_read_back_unchanged(title):
+    values = knobValues(anchorScript(title, tags=title))
+    assert values["title"] == title
+    assert values["tags"] == title
+    assert values["T prev_title"] == title
+    assert values["T prev_name"] == "Anchor_1"
+
+
+@pytest.mark.parametrize("title", TITLES)
+def test_values_dont_change_the_script_structure(title):
+    reference = stamps.tclSplit(wiredScript("plate"))
+    script = stamps.tclSplit(wiredScript(title))
+    assert [words[:-1] for words in script] == [words[:-1] for words in reference]
+    assert len(stamps.tclSplit(script[-1][-1][1:-1])) == len(stamps.tclSplit(reference[-1][-1][1:-1]))
+
+
+def test_placed_stamps_take_the_input():
+    script = wiredScript("plate", place=True)
+    assert stamps.tclSplit(script)[:2] == [["set", "cut_paste_input", "[stack 0]"], ["push", "$cut_paste_input"]]
+    assert "inputs" not in knobValues(script)
+    assert knobValues(wiredScript("plate"))["inputs"] == "0"
+
+
+def test_template_has_the_stamp_knobs():
+    knobs = set()
+    for words in stamps.tclSplit(wiredScript("plate").split("{", 1)[1]):
+        if words[0] == "addUserKnob":
+            knobs.add(stamps.tclSplit(words[1][1:-1])[0][1])
+    assert knobs == set(stamps.WIRED_KNOBS)
+    knobs = set()
+    for words in stamps.tclSplit(anchorScript("plate").split("{", 1)[1]):
+        if words[0] == "addUserKnob":
+            knobs.add(stamps.tclSplit(words[1][1:-1])[0][1])
+    assert knobs == set(stamps.ANCHOR_KNOBS)
+
+
+def test_default_knob_values(monkeypatch):
+    monkeypatch.setattr(stamps, "wired_defaults", dict(stamps.wired_defaults, custom_knob=3, note_font_size=42))
+    template = stamps.stampTemplate("wired", "Camera")
+    values = knobValues(stamps.templateScript(template, {"name": "Stamp1"}, False))
+    assert values["note_font_size"] == "42"
+    assert values["tile_color"] == str(stamps.WiredClassColors["Camera"])
+    assert values["onCreate"] == stamps.wiredOnCreate_code
+    assert "custom_knob" not in values
+    assert template[0] == stamps.stampClassCandidates("wired", "Camera")[0]
+    assert template[2]["custom_knob"] == 3
+    assert not set(template[2]) & stamps.TEMPLATE_NODE_KNOBS
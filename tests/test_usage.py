@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import stamps
+from conftest import FakeNode
+
+DAY = 86400.0
+
+
+def anchor(name, a_id=""):
+    return FakeNode(name, **({"anchor_id": a_id} if a_id else {}))
+
+
+@pytest.fixture
+def usage(monkeypatch, tmp_path):
+    monkeypatch.setattr(stamps, "Stamps_Usage", {})
+    monkeypatch.setattr(stamps, "Stamps_UsageDirty", False)
+    monkeypatch.setattr(stamps, "STAMPS_USAGE_FILE", str(tmp_path / "usage.json"))
+    monkeypatch.setattr(stamps, "_usageScript", lambda: "/shots/sh010/comp_v001.nk")
+    return stamps.Stamps_Usage
+
+
+def test_score_halves_every_half_life():
+    a = anchor("Anchor_a", "id_a")
+    now = 1000 * DAY
+    entries = {"id_a": [4.0, now]}
+    assert stamps.usageScore(a, now, entries) == 4.0
+    half_life = stamps.STAMPS_USAGE_HALF_LIFE * DAY
+    assert stamps.usageScore(a, now + half_life, entries) == pytest.approx(2.0)
+    assert stamps.usageScore(a, now + 3 * half_life, entries) == pytest.approx(0.5)
+
+
+def test_score_of_unused_anchor_and_future_timestamps():
+    a = anchor("Anchor_a", "id_a")
+    assert stamps.usageScore(a, 0.0, {}) == 0.0
+    # A clock going backwards never inflates the score.
+    assert stamps.usageScore(a, 10.0, {"id_a": [3.0, 20.0]}) == 3.0
+
+
+def test_anchors_without_id_are_keyed_by_name():
+    a = anchor("Anchor_legacy")
+    assert stamps.usageScore(a, 5.0, {"Anchor_legacy": [1.5, 5.0]}) == 1.5
+
+
+def test_frequent_old_use_vs_recent_single_use():
+    now = 1000 * DAY
+    half_life = stamps.STAMPS_USAGE_HALF_LIFE * DAY
+    entries = {"old": [8.0, now - 4 * half_life], "new": [1.0, now]}
+    old, new = anchor("A1", "old"), anchor("A2", "new")
+    assert stamps.usageScore(old, now, entries) == pytest.approx(0.5)
+    assert stamps.usageScore(new, now, entries) > stamps.usageScore(old, now, entries)
+
+
+def test_record_accumulates_decayed_score(usage, monkeypatch):
+    a = anchor("Anchor_a", "id_a")
+    clock = [100 * DAY]
+    monkeypatch.setattr(stamps.time, "time", lambda: clock[0])
+    stamps.usageRecord(a)
+    stamps.usageRecord(a)
+    entries = usage["/shots/sh010/comp_v001.nk"]
+    assert entries["id_a"] == [2.0, clock[0]]
+    clock[0] += stamps.STAMPS_USAGE_HALF_LIFE * DAY
+    stamps.usageRecord(a, weight=0.5)
+    assert entries["id_a"][0] == pytest.approx(1.5)
+    assert stamps.Stamps_UsageDirty
+
+
+def test_unsaved_scripts_record_nothing(usage, monkeypatch):
+    monkeypatch.setattr(stamps, "_usageScript", lambda: "")
+    a = anchor("Anchor_a", "id_a")
+    stamps.usageRecord(a)
+    assert usage == {}
+    assert not stamps.Stamps_UsageDirty
+    assert stamps.usageScore(a) == 0.0
+
+
+def test_save_keeps_most_recent_scripts_and_anchors(usage, monkeypatch, tmp_path):
+    monkeypatch.setattr(stamps, "STAMPS_USAGE_MAX_SCRIPTS", 2)
+    monkeypatch.setattr(stamps, "STAMPS_USAGE_MAX_ANCHORS", 2)
+    usage.update({
+        "/a.nk": {"x": [1.0, 10.0]},
+        "/b.nk": {"x": [1.0, 30.0], "y": [1.0, 5.0], "z": [1.0, 40.0]},
+        "/c.nk": {"x": [1.0, 20.0]},
+    })
+    monkeypatch.setattr(stamps, "Stamps_UsageDirty", True)
+    stamps.usageSave()
+    with open(str(tmp_path / "usage.json")) as f:
+        saved = json.load(f)
+    assert sorted(saved) == ["/b.nk", "/c.nk"]
+    assert sorted(saved["/b.nk"]) == ["x", "z"]
+    assert not stamps.Stamps_UsageDirty
+
+
+def test_load_drops_the_shared_unsaved_bucket(monkeypatch, tmp_path):
+    path = tmp_path / "usage.json"
+    path.write_text(json.dumps({"untitled": {"x": [1.0, 1.0]}, "/a.nk": {"x": [1.0, 1.0]}}))
+    monkeypatch.setattr(stamps, "Stamps_Usage", None)
+    monkeypatch.setattr(stamps, "STAMPS_USAGE_FILE", str(path))
+    assert list(stamps.usageLoad()) == ["/a.nk"]